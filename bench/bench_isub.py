@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+Benchmark segmentlist subtraction.  A dense list of short vetoes is
+subtracted from a list of long science segments, so that nearly every
+veto cuts a science segment in two.  The original in-place algorithm,
+which deletes from and inserts into the list as it goes, is compared with
+the single-pass algorithm used by segmentlist.__isub__() and, when the C
+extension is available, with segmentlist.__isub__() itself.  The
+in-place algorithm is quadratic in this case, the others are linear, so
+the time per segment should grow with n for the first column only.
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import gc
+import random
+from timeit import default_timer
+
+
+from segments import segments
+
+
+def isub_inplace(self, other):
+	"""
+	The original segmentlist.__isub__() algorithm.
+	"""
+	if not other:
+		return self
+	if other is self:
+		del self[:]
+		return self
+	i = j = 0
+	other_lo, other_hi = other[j]
+	while i < len(self):
+		self_lo, self_hi = self[i]
+		while other_hi <= self_lo:
+			j += 1
+			if j >= len(other):
+				return self
+			other_lo, other_hi = other[j]
+		if self_hi <= other_lo:
+			i += 1
+		elif other_lo <= self_lo:
+			if other_hi >= self_hi:
+				del self[i]
+			else:
+				self[i] = segments.segment(other_hi, self_hi)
+		else:
+			self[i] = segments.segment(self_lo, other_lo)
+			i += 1
+			if other_hi < self_hi:
+				self.insert(i, segments.segment(other_hi, self_hi))
+	return self
+
+
+def isub_single_pass(self, other):
+	"""
+	The single-pass algorithm of the pure-Python segmentlist.
+	"""
+	if other:
+		self[:] = segments._difference(self, other)
+	return self
+
+
+def make_lists(n):
+	"""
+	Return a science list of n / 10 long segments and a veto list of n
+	short segments.
+	"""
+	science = segments.segmentlist(segments.segment(100 * i, 100 * i + 90) for i in range(n // 10))
+	vetoes = segments.segmentlist()
+	t = 0.
+	while len(vetoes) < n:
+		t += random.uniform(1., 19.)
+		vetoes.append(segments.segment(t, t + random.uniform(0., 1.)))
+	return science, vetoes
+
+
+def time_it(func, science, vetoes):
+	"""
+	Return the time taken by func() to subtract vetoes from a copy of
+	science.
+	"""
+	science = segments.segmentlist(science)
+	gc.collect()
+	gc.disable()
+	try:
+		start = default_timer()
+		func(science, vetoes)
+		return default_timer() - start
+	finally:
+		gc.enable()
+
+
+parser = argparse.ArgumentParser(description = __doc__.strip().split("\n")[0])
+parser.add_argument("--min", type = int, default = 1000, help = "Smallest number of vetoes (default 1000).")
+parser.add_argument("--max", type = int, default = 256000, help = "Largest number of vetoes (default 256000).")
+parser.add_argument("--max-inplace", type = int, default = 64000, help = "Largest number of vetoes to time the in-place algorithm with (default 64000).")
+args = parser.parse_args()
+
+columns = [("in-place", isub_inplace), ("single pass", isub_single_pass)]
+if segments.segmentlist.__module__ != segments.__name__:
+	columns.append(("C __isub__", segments.segmentlist.__isub__))
+
+print("microseconds per veto")
+print("%10s" % "n" + "".join("%14s" % name for name, func in columns))
+n = args.min
+while n <= args.max:
+	science, vetoes = make_lists(n)
+	row = "%10d" % n
+	for name, func in columns:
+		if func is isub_inplace and n > args.max_inplace:
+			row += "%14s" % "-"
+			continue
+		row += "%14.3f" % (time_it(func, science, vetoes) / n * 1e6)
+	print(row)
+	n *= 2
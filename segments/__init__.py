@@ -18,6 +18,11 @@
 """
 
 from .segments import *
+try:
+	from .arrays import segmentarray
+except ImportError:
+	# numpy is not available
+	pass
 from ._version import get_versions
 
 __author__ = "Kipp Cannon <kipp.cannon@ligo.org>"
@@ -0,0 +1,451 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+
+
+"""
+This module defines the segmentarray object, a segmentlist work-alike
+that stores its segment boundaries in contiguous numpy arrays instead of
+as a list of segment objects.  This module requires numpy.
+
+See also:
+
+segments.segments
+"""
+
+
+import numpy
+
+from . import segments
+
+
+#
+# =============================================================================
+#
+#                                  Utilities
+#
+# =============================================================================
+#
+
+
+def _tonumber(x):
+	"""
+	Map the infinity objects to IEEE infinities, leave everything else
+	alone.
+	"""
+	if x is segments.PosInfinity:
+		return float("+inf")
+	if x is segments.NegInfinity:
+		return float("-inf")
+	return x
+
+
+def _fromnumber(x):
+	"""
+	Inverse of _tonumber().
+	"""
+	if x == float("+inf"):
+		return segments.PosInfinity
+	if x == float("-inf"):
+		return segments.NegInfinity
+	return x
+
+
+def _asbounds(bounds):
+	"""
+	Return an (n, 2) array of boundaries with either int64 or float64
+	dtype.  Arrays that are already of the correct shape and type are
+	returned as-is, not copied.
+	"""
+	bounds = numpy.asarray(bounds)
+	if bounds.dtype.kind in "biu":
+		bounds = bounds.astype(numpy.int64, copy = False)
+	else:
+		bounds = bounds.astype(numpy.float64, copy = False)
+	if bounds.size == 0:
+		bounds = bounds.reshape((0, 2))
+	if bounds.ndim != 2 or bounds.shape[1] != 2:
+		raise ValueError("boundary array must have shape (n, 2)")
+	return bounds
+
+
+def _frombounds(lo, hi):
+	"""
+	Assemble an (n, 2) boundary array from separate arrays of lower
+	and upper bounds.
+	"""
+	return numpy.column_stack((lo, hi)) if len(lo) else numpy.empty((0, 2), dtype = numpy.result_type(lo, hi))
+
+
+def _coalesce(lo, hi):
+	"""
+	Vectorized equivalent of segmentlist.coalesce().  Returns the
+	sorted, disjoint, lower and upper bounds.
+	"""
+	if not len(lo):
+		return lo, hi
+	order = numpy.lexsort((hi, lo))
+	lo = lo[order]
+	hi = numpy.maximum.accumulate(hi[order])
+	# a new segment starts wherever a lower bound is above every upper
+	# bound that precedes it
+	start = numpy.empty(len(lo), dtype = bool)
+	start[0] = True
+	numpy.greater(lo[1:], hi[:-1], out = start[1:])
+	start = numpy.flatnonzero(start)
+	lo = lo[start]
+	hi = hi[numpy.append(start[1:], len(hi)) - 1]
+	keep = lo != hi
+	return lo[keep], hi[keep]
+
+
+def _overlaps(alo, ahi, blo, bhi):
+	"""
+	For each segment in a, return the index of the first and one past
+	the last segment in b that it intersects.  Both lists must be
+	coalesced.
+	"""
+	return numpy.searchsorted(bhi, alo, side = "right"), numpy.searchsorted(blo, ahi, side = "left")
+
+
+def _intersection(alo, ahi, blo, bhi):
+	"""
+	Vectorized intersection of two coalesced lists.  Returns the lower
+	and upper bounds of the result.
+	"""
+	first, last = _overlaps(alo, ahi, blo, bhi)
+	counts = numpy.maximum(last - first, 0)
+	total = counts.sum()
+	ia = numpy.repeat(numpy.arange(len(alo)), counts)
+	ib = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts - first, counts)
+	lo = numpy.maximum(alo[ia], blo[ib])
+	hi = numpy.minimum(ahi[ia], bhi[ib])
+	keep = lo < hi
+	return lo[keep], hi[keep]
+
+
+def _difference(alo, ahi, blo, bhi):
+	"""
+	Vectorized difference of two coalesced lists.  The complement of b
+	is bounded by the extent of a and b, so no infinities are required
+	and integer boundaries are preserved.
+	"""
+	if not (len(alo) and len(blo)):
+		return alo, ahi
+	clo = numpy.append(min(alo[0], blo[0]), bhi)
+	chi = numpy.append(blo, max(ahi[-1], bhi[-1]))
+	keep = clo < chi
+	return _intersection(alo, ahi, clo[keep], chi[keep])
+
+
+#
+# =============================================================================
+#
+#                                segmentarray
+#
+# =============================================================================
+#
+
+
+class segmentarray(object):
+	"""
+	The segmentarray class is an array-backed work-alike of the
+	segmentlist class.  Instead of a list of segment objects, the
+	boundaries are stored as an (n, 2) numpy array of int64 or float64
+	values, available as the .bounds attribute, which requires an order
+	of magnitude less memory and allows the arithmetic operations to be
+	evaluated as vectorized loops over machine numbers.
+
+	A segmentarray can be constructed from a segmentlist or any other
+	iterable of segments, or from an (n, 2) array of boundaries.
+	Integer boundaries are stored as int64, all others as float64, and
+	the infinity objects are stored as IEEE infinities.  Iterating over
+	a segmentarray yields segment objects, so a segmentarray is
+	converted back to a segmentlist with segmentlist(x), and the
+	conversion in both directions is lossless for lists of int or float
+	boundaries.
+
+	As with segmentlist, most methods require the segmentarray to be
+	coalesced, and all arithmetic operations return coalesced results.
+	The boundary array is never modified in place;  methods that modify
+	the segmentarray replace the array, so it is safe for several
+	segmentarray objects to share the same, possibly read-only, array.
+
+	Example:
+
+	>>> x = segmentarray(segments.segmentlist([segments.segment(-10, 10)]))
+	>>> x |= segmentarray([(20, 30)])
+	>>> x -= segmentarray([(-5, 5)])
+	>>> print(x)
+	[segment(-10, -5), segment(5, 10), segment(20, 30)]
+	>>> print(~x)
+	[segment(-infinity, -10.0), segment(-5.0, 5.0), segment(10.0, 20.0), segment(30.0, infinity)]
+	>>> segments.segmentlist(x)
+	[segment(-10, -5), segment(5, 10), segment(20, 30)]
+	"""
+	__slots__ = ["bounds"]
+
+	def __init__(self, segs = ()):
+		if isinstance(segs, segmentarray):
+			self.bounds = segs.bounds
+		elif isinstance(segs, numpy.ndarray):
+			self.bounds = _asbounds(segs)
+		else:
+			segs = [(_tonumber(lo), _tonumber(hi)) for lo, hi in segs]
+			if all(type(lo) is int and type(hi) is int for lo, hi in segs):
+				self.bounds = _asbounds(numpy.array(segs, dtype = numpy.int64))
+			else:
+				self.bounds = _asbounds(numpy.array(segs, dtype = numpy.float64))
+
+	@classmethod
+	def _new(cls, lo, hi):
+		self = cls.__new__(cls)
+		self.bounds = _frombounds(lo, hi)
+		return self
+
+	@property
+	def _lo(self):
+		return self.bounds[:, 0]
+
+	@property
+	def _hi(self):
+		return self.bounds[:, 1]
+
+	def __reduce__(self):
+		return self.__class__, (self.bounds,)
+
+	def __copy__(self):
+		return self.__class__(self)
+
+	# container methods
+
+	def __len__(self):
+		return len(self.bounds)
+
+	def __iter__(self):
+		for lo, hi in self.bounds.tolist():
+			yield segments.segment(_fromnumber(lo), _fromnumber(hi))
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return self.__class__(self.bounds[i])
+		lo, hi = self.bounds[i].tolist()
+		return segments.segment(_fromnumber(lo), _fromnumber(hi))
+
+	def __eq__(self, other):
+		if isinstance(other, segmentarray):
+			return numpy.array_equal(self.bounds, other.bounds)
+		try:
+			return list(self) == list(other)
+		except TypeError:
+			return NotImplemented
+
+	def __ne__(self, other):
+		result = self.__eq__(other)
+		if result is NotImplemented:
+			return result
+		return not result
+
+	__hash__ = None
+
+	def __repr__(self):
+		return "segmentarray(%s)" % repr(list(self))
+
+	def __str__(self):
+		return str(list(self))
+
+	def __contains__(self, item):
+		"""
+		Returns True if the given object is wholly contained within
+		the segments in self.  item can be a scalar, a segment, or a
+		segmentlist or segmentarray in which case each of its
+		segments must be contained in self.  Requires self to be
+		coalesced.
+		"""
+		if isinstance(item, (segmentarray, segments.segmentlist)):
+			item = segmentarray(item)
+			if not len(item):
+				return True
+			if not len(self):
+				return False
+			i = numpy.searchsorted(self._lo, item._lo, side = "right") - 1
+			return bool(((i >= 0) & (item._hi <= self._hi[i])).all())
+		item = _tonumber(item)
+		try:
+			lo, hi = item
+		except TypeError:
+			i = numpy.searchsorted(self._lo, item, side = "right") - 1
+			return bool(i >= 0 and item < self._hi[i])
+		lo, hi = _tonumber(lo), _tonumber(hi)
+		i = numpy.searchsorted(self._lo, lo, side = "right") - 1
+		return bool(i >= 0 and hi <= self._hi[i])
+
+	# supplementary accessors
+
+	def __abs__(self):
+		"""
+		Return the sum of the durations of all segments in self.
+		Does not require the segmentarray to be coalesced.
+		"""
+		return _fromnumber((self._hi - self._lo).sum().item())
+
+	def extent(self):
+		"""
+		Return the segment whose end-points denote the maximum and
+		minimum extent of the segmentarray.  Does not require the
+		segmentarray to be coalesced.
+		"""
+		if not len(self):
+			raise ValueError("empty list")
+		return segments.segment(_fromnumber(self._lo.min().item()), _fromnumber(self._hi.max().item()))
+
+	# arithmetic operations
+
+	def __iand__(self, other):
+		"""
+		Replace the segmentarray with the intersection of itself and
+		another.
+		"""
+		other = segmentarray(other)
+		self.bounds = _frombounds(*_intersection(self._lo, self._hi, other._lo, other._hi))
+		return self
+
+	def __and__(self, other):
+		"""
+		Return the intersection of the segmentarray and another.
+		"""
+		return self.__class__(self).__iand__(other)
+
+	__rand__ = __and__
+
+	def __ior__(self, other):
+		"""
+		Replace the segmentarray with the union of itself and
+		another.
+		"""
+		other = segmentarray(other)
+		self.bounds = _frombounds(*_coalesce(numpy.concatenate((self._lo, other._lo)), numpy.concatenate((self._hi, other._hi))))
+		return self
+
+	def __or__(self, other):
+		"""
+		Return the union of the segmentarray and another.
+		"""
+		return self.__class__(self).__ior__(other)
+
+	__ror__ = __or__
+
+	# addition is union
+	__iadd__ = __ior__
+	__add__ = __or__
+	__radd__ = __ror__
+
+	def __isub__(self, other):
+		"""
+		Replace the segmentarray with the difference between itself
+		and another.
+		"""
+		other = segmentarray(other)
+		self.bounds = _frombounds(*_difference(self._lo, self._hi, other._lo, other._hi))
+		return self
+
+	def __sub__(self, other):
+		"""
+		Return the difference between the segmentarray and another.
+		"""
+		return self.__class__(self).__isub__(other)
+
+	def __rsub__(self, other):
+		return self.__class__(other).__isub__(self)
+
+	def __invert__(self):
+		"""
+		Return the segmentarray that is the inversion of the given
+		list.  The result always has float64 boundaries, because
+		integer arrays cannot represent infinity.
+		"""
+		inf = float("+inf")
+		lo = numpy.append(-inf, self._hi).astype(numpy.float64)
+		hi = numpy.append(self._lo, inf).astype(numpy.float64)
+		keep = lo != hi
+		return self._new(lo[keep], hi[keep])
+
+	# other operations
+
+	def intersects_segment(self, other):
+		"""
+		Returns True if the intersection of self and the segment
+		other is not the null set, otherwise returns False.
+		Requires self to be coalesced.
+		"""
+		lo, hi = map(_tonumber, other)
+		first, last = _overlaps(lo, hi, self._lo, self._hi)
+		return bool(last > first)
+
+	def intersects(self, other):
+		"""
+		Returns True if the intersection of self and other is not
+		the null set, otherwise returns False.  Requires both lists
+		to be coalesced.
+		"""
+		other = segmentarray(other)
+		first, last = _overlaps(self._lo, self._hi, other._lo, other._hi)
+		return bool((last > first).any())
+
+	def coalesce(self):
+		"""
+		Sort the segments into ascending order, and merge continuous
+		segments into single segments.  The segmentarray is modified
+		in place.
+		"""
+		self.bounds = _frombounds(*_coalesce(self._lo, self._hi))
+		return self
+
+	def protract(self, x):
+		"""
+		Subtract x from each segment's lower bound and add x to its
+		upper bound, and coalesce the result.  The segmentarray is
+		modified in place.
+		"""
+		lo = self._lo - x
+		hi = self._hi + x
+		# like segment.protract(), exchange the bounds if they have
+		# passed one another
+		self.bounds = _frombounds(numpy.minimum(lo, hi), numpy.maximum(lo, hi))
+		return self.coalesce()
+
+	def contract(self, x):
+		"""
+		Add x to each segment's lower bound and subtract x from its
+		upper bound, and coalesce the result.  The segmentarray is
+		modified in place.
+		"""
+		return self.protract(-x)
+
+	def shift(self, x):
+		"""
+		Add x to the upper and lower bounds of every segment.  Does
+		not require the segmentarray to be coalesced nor does it
+		coalesce it.  The segmentarray is modified in place.
+		"""
+		self.bounds = self.bounds + x
+		return self
@@ -42,9 +42,19 @@ segments.segmentUtils
 """
 
 
+from array import array as _array
 from bisect import bisect_left as _bisect_left
 from bisect import bisect_right as _bisect_right
 from copy import copy as _shallowcopy
+from heapq import heapify as _heapify
+from heapq import heappop as _heappop
+from heapq import heapreplace as _heapreplace
+from heapq import merge as _merge
+import contextlib
+import operator
+import pickle
+import sys
+import threading
 
 
 import six
@@ -482,6 +492,254 @@ class segment(tuple):
 #
 
 
+def _gallop(segs, x, i):
+	"""
+	Return the index of the first segment at or after index i in the
+	coalesced list segs whose upper bound is greater than x.  The search
+	gallops forward from i, so it is O(log d) where d is the distance
+	moved.
+	"""
+	n = len(segs)
+	lo = hi = i
+	step = 1
+	while hi < n and segs[hi][1] <= x:
+		lo = hi + 1
+		hi += step
+		step *= 2
+	hi = min(hi, n)
+	while lo < hi:
+		mid = (lo + hi) // 2
+		if segs[mid][1] <= x:
+			lo = mid + 1
+		else:
+			hi = mid
+	return lo
+
+
+def _intersection(a, b):
+	"""
+	Generator yielding, in order, the segments of the intersection of
+	two coalesced lists of segments.  The segments of each list that
+	lie between those of the other are skipped over by galloping, so
+	for lists of lengths n and m the algorithm is O(n + m), and O(m log
+	n) for m << n.  Segments of a that lie entirely within b are
+	yielded unmodified, and where boundaries are equal a's are used.
+	"""
+	i = j = 0
+	n, m = len(a), len(b)
+	while i < n and j < m:
+		i = _gallop(a, b[j][0], i)
+		if i >= n:
+			break
+		j = _gallop(b, a[i][0], j)
+		if j >= m:
+			break
+		seg = a[i]
+		lo, hi = seg
+		blo, bhi = b[j]
+		if hi <= blo:
+			continue
+		if blo > lo:
+			lo, seg = blo, None
+		if bhi < hi:
+			hi, seg = bhi, None
+			j += 1
+		else:
+			i += 1
+		yield seg if seg is not None else segment(lo, hi)
+
+
+def _difference(a, b):
+	"""
+	Generator yielding, in order, the segments of the difference
+	between two coalesced lists of segments, a - b.  For lists of
+	lengths n and m this is O(n + m).  Segments of a that are not cut
+	are yielded unmodified.
+	"""
+	j = 0
+	m = len(b)
+	for seg in a:
+		lo, hi = seg
+		while True:
+			while j < m and b[j][1] <= lo:
+				j += 1
+			if j >= m or hi <= b[j][0]:
+				yield seg if seg is not None else segment(lo, hi)
+				break
+			other_lo, other_hi = b[j]
+			if other_lo > lo:
+				yield segment(lo, other_lo)
+			if other_hi >= hi:
+				break
+			lo, seg = other_hi, None
+
+
+def _union(a, b):
+	"""
+	Generator yielding, in order, the segments of the union of two
+	coalesced sequences of segments.  For sequences of lengths n and m
+	this is O(n + m).  Segments that are not merged with any others are
+	yielded unmodified, the rest are built with the same steps as
+	segmentlist.coalesce().
+	"""
+	segs = _merge(a, b)
+	for seg in segs:
+		lo, hi = seg
+		break
+	else:
+		return
+	for nextseg in segs:
+		if hi >= nextseg[0]:
+			hi = max(hi, nextseg[1])
+			seg = None
+			continue
+		if lo != hi:
+			yield seg if type(seg) is segment else segment(lo, hi)
+		seg = nextseg
+		lo, hi = seg
+	if lo != hi:
+		yield seg if type(seg) is segment else segment(lo, hi)
+
+
+#
+# The totals of the durations of the results of the above, following the
+# same steps and summing in the same order as segmentlist.__abs__() would,
+# but without building any segments.
+#
+
+
+def _intersection_duration(a, b):
+	"""
+	Return the total duration of the intersection of two coalesced
+	lists of segments, as abs(segmentlist(_intersection(a, b))).
+	"""
+	total = 0
+	i = j = 0
+	n, m = len(a), len(b)
+	while i < n and j < m:
+		i = _gallop(a, b[j][0], i)
+		if i >= n:
+			break
+		j = _gallop(b, a[i][0], j)
+		if j >= m:
+			break
+		lo, hi = a[i]
+		blo, bhi = b[j]
+		if hi <= blo:
+			continue
+		if blo > lo:
+			lo = blo
+		if bhi < hi:
+			hi = bhi
+			j += 1
+		else:
+			i += 1
+		total += hi - lo
+	return total
+
+
+def _difference_duration(a, b):
+	"""
+	Return the total duration of the difference between two coalesced
+	lists of segments, as abs(segmentlist(_difference(a, b))).
+	"""
+	total = 0
+	j = 0
+	m = len(b)
+	for lo, hi in a:
+		while True:
+			while j < m and b[j][1] <= lo:
+				j += 1
+			if j >= m or hi <= b[j][0]:
+				total += hi - lo
+				break
+			other_lo, other_hi = b[j]
+			if other_lo > lo:
+				total += other_lo - lo
+			if other_hi >= hi:
+				break
+			lo = other_hi
+	return total
+
+
+def _union_duration(a, b):
+	"""
+	Return the total duration of the union of two coalesced sequences
+	of segments, as abs(segmentlist(_union(a, b))).
+	"""
+	total = 0
+	segs = _merge(a, b)
+	for lo, hi in segs:
+		break
+	else:
+		return total
+	for nextlo, nexthi in segs:
+		if hi >= nextlo:
+			hi = max(hi, nexthi)
+			continue
+		if lo != hi:
+			total += hi - lo
+		lo, hi = nextlo, nexthi
+	if lo != hi:
+		total += hi - lo
+	return total
+
+
+def _coalesce_parallel(seglist, parallel):
+	"""
+	Implementation of segmentlist.coalesce(parallel = ...).
+	"""
+	parallel = operator.index(parallel)
+	if parallel > 1 and len(seglist) > parallel:
+		from concurrent.futures import ThreadPoolExecutor
+		size = -(-len(seglist) // parallel)
+		chunks = [segmentlist(seglist[i : i + size]) for i in range(0, len(seglist), size)]
+		with ThreadPoolExecutor(len(chunks)) as executor:
+			seglist[:] = [seg for chunk in executor.map(segmentlist.coalesce, chunks) for seg in chunk]
+	# the coalesced chunks are each sorted, so this is a merge
+	return segmentlist.coalesce(seglist)
+
+
+def _pack_bounds(segs):
+	"""
+	Return an array.array of the boundaries of the segments in segs if
+	the segments are all of type segment (not a subclass) and their
+	boundaries are all ints that fit in 64 bits or all floats,
+	otherwise return None.
+	"""
+	if not segs or not all(type(seg) is segment for seg in segs):
+		return None
+	bounds = [x for seg in segs for x in seg]
+	types = set(map(type, bounds))
+	if types == set([float]):
+		return _array("d", bounds)
+	if types == set([int]):
+		try:
+			return _array("q", bounds)
+		except OverflowError:
+			pass
+	return None
+
+
+def _segmentlist_frombuffer(typecode, buf, byteorder):
+	"""
+	Reconstruct a segmentlist pickled by segmentlist.__reduce_ex__()
+	with pickle protocol 2 or later from the buffer buf of its
+	boundaries, an array of the array module's type typecode with the
+	given byte order.
+	"""
+	bounds = _array(typecode)
+	if six.PY3:
+		bounds.frombytes(memoryview(buf).cast("B"))
+	else:
+		# Python 2's array.array and memoryview have neither
+		bounds.fromstring(bytes(buf))
+	if byteorder != sys.byteorder:
+		bounds.byteswap()
+	bounds = bounds.tolist()
+	return segmentlist(map(segment, bounds[0::2], bounds[1::2]))
+
+
 class segmentlist(list):
 	"""
 	The segmentlist class defines a list of segments, and is an
@@ -522,6 +780,29 @@ class segmentlist(list):
 	[segment(-infinity, -10), segment(-5, 5), segment(10, 20), segment(30, infinity)]
 	"""
 
+	# pickle support.
+
+	def __reduce_ex__(self, protocol):
+		"""
+		Pickle support.  With pickle protocol 2 or later, a list
+		of segments whose boundaries are all ints that fit in 64
+		bits or all floats is pickled as a single buffer of the
+		boundaries, which with protocol 5 or later can be sent
+		out-of-band.  Python 3 only.
+		"""
+		if type(self) is not segmentlist:
+			# let subclasses be pickled the default way
+			return super(segmentlist, self).__reduce_ex__(protocol)
+		if protocol >= 2 and six.PY3:
+			bounds = _pack_bounds(self)
+			if bounds is not None:
+				if protocol >= 5 and hasattr(pickle, "PickleBuffer"):
+					buf = pickle.PickleBuffer(bounds)
+				else:
+					buf = bounds.tobytes()
+				return _segmentlist_frombuffer, (bounds.typecode, buf, sys.byteorder)
+		return segmentlist, (), None, iter(self)
+
 	# container method over-rides.
 
 	def __contains__(self, item):
@@ -545,6 +826,33 @@ class segmentlist(list):
 		i = _bisect_left(self, item)
 		return ((i != 0) and (item in self[i-1])) or ((i != len(self)) and (item in self[i]))
 
+	def contains_many(self, times):
+		"""
+		Return an array of booleans of the same shape as times
+		indicating, for each value in times, whether or not that
+		value is contained within the segments in self.  times can
+		be a numpy array or any other object that numpy can convert
+		to an array of floats, and the segment boundaries are also
+		converted to floats for the comparison.  If self has length
+		n and there are m times, this operation is O(m log n), but
+		all of the work is done in a single vectorized pass.
+		Requires the list to be coalesced.  Requires numpy.
+
+		Example:
+
+		>>> x = segmentlist([segment(0, 10), segment(20, 30)])
+		>>> x.contains_many([-5, 0, 10, 25]).tolist()
+		[False, True, False, True]
+		"""
+		import numpy
+		times = numpy.asarray(times, dtype = float)
+		if not self:
+			return numpy.zeros(times.shape, dtype = bool)
+		lo = numpy.array([float(seg[0]) for seg in self])
+		hi = numpy.array([float(seg[1]) for seg in self])
+		i = numpy.searchsorted(lo, times, side = "right") - 1
+		return (i >= 0) & (times < hi[i])
+
 	# supplementary accessors
 
 	def __abs__(self):
@@ -582,36 +890,79 @@ class segmentlist(list):
 				return i
 		raise ValueError(item)
 
+	def find_many(self, items):
+		"""
+		Return an array of integers giving, for each item in items,
+		the index of the segment in self that wholly contains it, or
+		-1 if there is no such segment.  items can be a numpy array
+		or any other object that numpy can convert to an array of
+		floats.  If it is a two-dimensional array with two columns
+		then each row is taken to be a segment, otherwise each
+		element is taken to be a scalar.  The segment boundaries
+		are converted to floats for the comparison.  If self has
+		length n and there are m items, this operation is O(m log
+		n).  Unlike .find(), requires the list to be coalesced.
+		Requires numpy.
+
+		Example:
+
+		>>> x = segmentlist([segment(0, 10), segment(20, 30)])
+		>>> x.find_many([-5, 0, 10, 25]).tolist()
+		[-1, 0, -1, 1]
+		>>> x.find_many([(2, 4), (5, 25)]).tolist()
+		[0, -1]
+		"""
+		import numpy
+		items = numpy.asarray(items, dtype = float)
+		if items.ndim == 2 and items.shape[1] == 2:
+			a = items.min(axis = 1)
+			b = items.max(axis = 1)
+		else:
+			a = b = items
+		if not self:
+			return numpy.full(a.shape, -1, dtype = numpy.intp)
+		lo = numpy.array([float(seg[0]) for seg in self])
+		hi = numpy.array([float(seg[1]) for seg in self])
+		i = numpy.searchsorted(lo, a, side = "right") - 1
+		if b is a:
+			found = (i >= 0) & (a < hi[i])
+		else:
+			found = (i >= 0) & (b <= hi[i])
+		return numpy.where(found, i, -1)
+
 	# arithmetic operations that are sensible with segment lists
 
 	def __iand__(self, other):
 		"""
 		Replace the segmentlist with the intersection of itself and
 		another.  If the two lists have lengths n and m
-		respectively, this operation is O(n + m).
+		respectively, this operation is O(n + m), and O(m log n)
+		for m << n.
 		"""
-		return self.__isub__(~other)
+		if other is not self:
+			self[:] = _intersection(self, other)
+		return self
 
 	def __and__(self, other):
 		"""
 		Return the intersection of the segmentlist and another.  If
 		the two lists have lengths n and m respectively, this
-		operation is O(n + m).
+		operation is O(n + m), and O(m log n) for m << n.
 		"""
 		if len(self) >= len(other):
-			return self.__class__(self).__iand__(other)
-		return self.__class__(other).__iand__(self)
+			return self.__class__(_intersection(self, other))
+		return self.__class__(_intersection(other, self))
 
 	def __ior__(self, other):
 		"""
 		Replace the segmentlist with the union of itself and
 		another.  If the two lists have numbers of elements n and m
 		respectively, then for m << n the algorithm is O(m log n),
-		otherwise it is O((n + m) log (n + m)).
+		otherwise the two lists are merged in O(n + m).
 		"""
 		if len(other) > len(self) / 2:
-			self.extend(other)
-			return self.coalesce()
+			self[:] = _union(self, other)
+			return self
 		if other is self:
 			return self
 		i = 0
@@ -669,35 +1020,16 @@ class segmentlist(list):
 		if other is self:
 			del self[:]
 			return self
-		i = j = 0
-		other_lo, other_hi = other[j]
-		while i < len(self):
-			self_lo, self_hi = self[i]
-			while other_hi <= self_lo:
-				j += 1
-				if j >= len(other):
-					return self
-				other_lo, other_hi = other[j]
-			if self_hi <= other_lo:
-				i += 1
-			elif other_lo <= self_lo:
-				if other_hi >= self_hi:
-					del self[i]
-				else:
-					self[i] = segment(other_hi, self_hi)
-			else:
-				self[i] = segment(self_lo, other_lo)
-				i += 1
-				if other_hi < self_hi:
-					self.insert(i, segment(other_hi, self_hi))
+		self[:] = _difference(self, other)
 		return self
 
 	def __sub__(self, other):
 		"""
 		Return the difference between the segmentlist and another.
-		This operation is O(n).
+		For lists of length m and n respectively, this operation is
+		O(n + m).
 		"""
-		return self.__class__(self).__isub__(other)
+		return self.__class__(_difference(self, other))
 
 	def __invert__(self):
 		"""
@@ -717,6 +1049,39 @@ class segmentlist(list):
 			l.append(segment(last, PosInfinity))
 		return l
 
+	# durations of the results of arithmetic operations
+
+	def intersection_duration(self, other):
+		"""
+		Return abs(self & other), the total duration of the
+		intersection of the segmentlist and another, without
+		building the intersection.  The algorithm is the same as
+		for .__and__(), and requires both lists to be coalesced.
+		The C extension does the arithmetic on numeric boundaries
+		without the GIL.
+		"""
+		if len(self) >= len(other):
+			return _intersection_duration(self, other)
+		return _intersection_duration(other, self)
+
+	def union_duration(self, other):
+		"""
+		Return abs(self | other), the total duration of the union
+		of the segmentlist and another, without building the
+		union.  For lists of length n and m this is O(n + m).
+		Requires both lists to be coalesced.
+		"""
+		return _union_duration(self, other)
+
+	def difference_duration(self, other):
+		"""
+		Return abs(self - other), the total duration of the
+		difference between the segmentlist and another, without
+		building the difference.  For lists of length n and m this
+		is O(n + m).  Requires both lists to be coalesced.
+		"""
+		return _difference_duration(self, other)
+
 	# other operations
 
 	def intersects_segment(self, other):
@@ -757,12 +1122,21 @@ class segmentlist(list):
 			else:
 				return True
 
-	def coalesce(self):
+	def coalesce(self, parallel = None):
 		"""
 		Sort the elements of the list into ascending order, and merge
 		continuous segments into single segments.  Segmentlist is
 		modified in place.  This operation is O(n log n).
+
+		If parallel is an integer greater than 1, the list is split
+		into that many chunks, which are coalesced concurrently by a
+		pool of threads before the results are merged.  The result
+		is the same.  The C extension does the arithmetic on numeric
+		boundaries without the GIL, so for long lists of them this
+		is faster.
 		"""
+		if parallel is not None:
+			return _coalesce_parallel(self, parallel)
 		self.sort()
 		i = j = 0
 		n = len(self)
@@ -805,6 +1179,131 @@ class segmentlist(list):
 		return self
 
 
+def _shifted(seglist, offset):
+	"""
+	Yield the boundaries of the segments in seglist with offset added
+	to them.  Used by _vote().
+	"""
+	for lo, hi in seglist:
+		yield lo + offset, hi + offset
+
+
+def _coalesced(seglist):
+	"""
+	Return seglist if it is a coalesced list of segments, otherwise a
+	new coalesced segmentlist of its segments.
+	"""
+	if isinstance(seglist, list):
+		prev = None
+		for lo, hi in seglist:
+			if not lo < hi or (prev is not None and not prev < lo):
+				break
+			prev = hi
+		else:
+			return seglist
+	return segmentlist(seglist).coalesce()
+
+
+def _vote(seglists, n, offsets = None):
+	"""
+	Return the segmentlist of the intervals during which at least n of
+	the coalesced segmentlists in seglists intersect.  The lists are
+	swept together with a heap holding the next boundary of each, so
+	for a total of N segments in k lists this is O(N log k).  seglists
+	and the lists in it are only iterated over once, they can be
+	generators.  If offsets is not None it is a sequence giving, for
+	each list, an amount to add to the boundaries of its segments as
+	they are read, or None.
+	"""
+	result = segmentlist()
+	if n < 1:
+		return result
+	# one heap entry per list:  the next boundary, the list's index (so
+	# that nothing after it is ever compared), +1 or -1 for entering
+	# or leaving a segment, the segment's upper bound when entering it,
+	# and the iterator over the list's segments
+	heap = []
+	for i, seglist in enumerate(seglists):
+		if offsets is not None and i < len(offsets) and offsets[i] is not None:
+			seglist = _shifted(seglist, offsets[i])
+		segiter = iter(seglist)
+		for lo, hi in segiter:
+			heap.append((lo, i, +1, hi, segiter))
+			break
+	_heapify(heap)
+	votes = 0
+	while heap:
+		bound = heap[0][0]
+		before = votes
+		while heap and heap[0][0] == bound:
+			x, i, delta, hi, segiter = heap[0]
+			votes += delta
+			if delta > 0:
+				_heapreplace(heap, (hi, i, -1, None, segiter))
+				continue
+			for lo, hi in segiter:
+				_heapreplace(heap, (lo, i, +1, hi, segiter))
+				break
+			else:
+				_heappop(heap)
+		if before < n <= votes:
+			start = bound
+		elif votes < n <= before:
+			result.append(segment(start, bound))
+	return result
+
+
+def _coincidences(seglists, n, offsets = None, durations = False, first = False):
+	"""
+	Compare each of the first n coalesced segmentlists in seglists
+	with each of the rest, and return a list of n rows of
+	len(seglists) - n entries giving, for each pair, whether or not
+	the two lists intersect, or if durations is True the length of
+	their intersection.  The segments of all the lists are merged in
+	order of their lower bounds.  Because the lists are coalesced, a
+	segment can only intersect a segment of another list that starts
+	no later than it does if that is the last segment of that list to
+	have started, so for a total of N segments in k lists this is
+	O(N k).  seglists and the lists in it are only iterated over once,
+	they can be generators.  offsets is as for _vote().  If first is
+	True the sweep stops at the first intersection found.
+	"""
+	heap = []
+	k = 0
+	for i, seglist in enumerate(seglists):
+		k = i + 1
+		if offsets is not None and i < len(offsets) and offsets[i] is not None:
+			seglist = _shifted(seglist, offsets[i])
+		segiter = iter(seglist)
+		for lo, hi in segiter:
+			heap.append((lo, i, hi, segiter))
+			break
+	if not 0 <= n <= k:
+		raise ValueError("n out of range")
+	_heapify(heap)
+	result = [[0 if durations else False] * (k - n) for i in range(n)]
+	# the last segment of each list to have started
+	current = [None] * k
+	while heap:
+		lo, i, hi, segiter = heap[0]
+		for j in (range(n, k) if i < n else range(n)):
+			if current[j] is not None and current[j][1] > lo and current[j][0] < hi:
+				row, col = (i, j - n) if i < n else (j, i - n)
+				if durations:
+					result[row][col] += min(current[j][1], hi) - lo
+				else:
+					result[row][col] = True
+				if first:
+					return result
+		current[i] = lo, hi
+		for lo, hi in segiter:
+			_heapreplace(heap, (lo, i, hi, segiter))
+			break
+		else:
+			_heappop(heap)
+	return result
+
+
 #
 # =============================================================================
 #
@@ -878,6 +1377,253 @@ class _offsets(dict):
 		raise NotImplementedError
 
 
+def _total_length(seglists):
+	"""
+	Return the total number of segments in the segmentlists in the
+	dictionary seglists.
+	"""
+	return sum(map(len, seglists.values()))
+
+
+def _segmentlistdict_copy(src, dst, keys):
+	"""
+	For each key in keys, set the segmentlist in the segmentlistdict
+	dst to a shallow copy of the one in src, and its offset to the
+	offset in src.  dst's .__setitem__() is not used.
+	"""
+	for key in keys:
+		dict.__setitem__(dst, key, _shallowcopy(src[key]))
+		dict.__setitem__(dst.offsets, key, src.offsets[key])
+
+
+def _segmentlistdict_iand(self, other):
+	"""
+	segmentlistdict.__iand__() without an executor.
+	"""
+	for key, value in six.iteritems(other):
+		if key in self:
+			self[key] &= value
+		else:
+			self[key] = segmentlist()
+	return self
+
+
+def _segmentlistdict_ior(self, other):
+	"""
+	segmentlistdict.__ior__() without an executor.
+	"""
+	for key, value in six.iteritems(other):
+		if key in self:
+			self[key] |= value
+		else:
+			self[key] = _shallowcopy(value)
+	return self
+
+
+def _segmentlistdict_isub(self, other):
+	"""
+	segmentlistdict.__isub__() without an executor.
+	"""
+	for key, value in six.iteritems(other):
+		if key in self:
+			self[key] -= value
+	return self
+
+
+def _segmentlistdict_extent(seglists):
+	"""
+	Return a dictionary of the results of segmentlist.extent() for
+	each of the segmentlists in the dictionary seglists.
+	"""
+	return dict((key, segmentlist.extent(value)) for key, value in six.iteritems(seglists))
+
+
+def _segmentlistdict_extent_all(seglists):
+	"""
+	Return the segment spanning the .extent() of each of the
+	non-empty segmentlists in the dictionary seglists.
+	"""
+	segs = tuple(seglist.extent() for seglist in seglists.values() if seglist)
+	if not segs:
+		raise ValueError("empty list")
+	return segment(min(seg[0] for seg in segs), max(seg[1] for seg in segs))
+
+
+# the executor installed in each thread by segmentlistdict.parallel()
+_parallel_context = threading.local()
+
+
+def _parallel_map(func, *iterables):
+	"""
+	Return a list of the results of func applied to the items of
+	iterables, as by map(), evaluated by the executor installed in
+	this thread by segmentlistdict.parallel(), if any.
+	"""
+	executor = getattr(_parallel_context, "executor", None)
+	if executor is None:
+		return list(map(func, *iterables))
+	# process pools pickle the arguments and results with the
+	# default protocol, 2 or later, with which segmentlists are sent
+	# as one buffer of boundaries
+	return list(executor.map(func, *iterables))
+
+
+class _methodcaller(object):
+	"""
+	Like operator.methodcaller(name, *args), but the object is called
+	with the method's leading arguments as well, and process pools can
+	pickle it in all supported versions of Python (they can pickle
+	operator.methodcaller objects only from Python 3.5, and methods of
+	classes not at all in Python 2).
+	"""
+	def __init__(self, name, *args):
+		self.name = name
+		self.args = args
+
+	def __call__(self, obj, *args):
+		return getattr(obj, self.name)(*(args + self.args))
+
+
+def _apply_inplace(func, seglists, *args):
+	"""
+	For each segmentlist in seglists, call func with it and the
+	corresponding elements of args, if any, as arguments.  func must
+	modify the segmentlist in place and return it.  The calls are
+	evaluated by _parallel_map(), and results computed in another
+	process are copied into the original segmentlists, so they are
+	modified in place regardless.  If there is no executor the calls
+	are made one at a time in order, as they are if a segmentlist
+	appears more than once, or appears in args in another position,
+	since then they would interfere.
+	"""
+	seglists = list(seglists)
+	args = [list(arg) for arg in args]
+	if getattr(_parallel_context, "executor", None) is not None:
+		targets = set(map(id, seglists))
+		if len(targets) == len(seglists) and not any(id(other) in targets and other is not seglist for arg in args for seglist, other in zip(seglists, arg)):
+			for seglist, result in zip(seglists, _parallel_map(func, seglists, *args)):
+				if result is not seglist:
+					seglist[:] = result
+			return
+	for i, seglist in enumerate(seglists):
+		func(seglist, *[arg[i] for arg in args])
+
+
+def _common_keys(a, b, keys):
+	"""
+	Return lists of the keys of a and of b that are in keys, or all of
+	them if keys is None.
+	"""
+	if keys is None:
+		return list(a), list(b)
+	keys = set(keys)
+	return [key for key in a if key in keys], [key for key in b if key in keys]
+
+
+def _cross_coincidences(a, a_keys, b, b_keys, durations = False, first = False, offsets = None):
+	"""
+	Return _coincidences() for the segmentlists associated with a_keys
+	in the segmentlistdict a against those associated with b_keys in
+	the dictionary b.  If offsets is not None it is an offset vector
+	applied to a, and to b if it is a, as by a._shifts().
+	"""
+	shifts = None
+	if offsets is not None:
+		shifts = a._shifts(a_keys, offsets) + (a._shifts(b_keys, offsets) if b is a else [None] * len(b_keys))
+	return _coincidences([a[key] for key in a_keys] + [b[key] for key in b_keys], len(a_keys), shifts, durations, first)
+
+
+def _coincident_livetimes(bounds, shifts):
+	"""
+	Return a list of the total lengths of the intersection of the
+	coalesced segment lists whose boundaries are in bounds, a sequence
+	of arrays of floats (lo, hi, lo, hi, ...), for each row of shifts,
+	a sequence of sequences of the amounts by which to shift each list.
+	The segment that ends first can't intersect anything after the
+	segments it is compared with, so each step moves past it:  O(N k)
+	per row for N segments in k lists.
+	"""
+	result = []
+	for shift in shifts:
+		total = 0.0
+		idx = [0] * len(bounds)
+		while bounds and all(2 * i < len(b) for i, b in zip(idx, bounds)):
+			lo = max(b[2 * i] + x for i, b, x in zip(idx, bounds, shift))
+			ends = [b[2 * i + 1] + x for i, b, x in zip(idx, bounds, shift)]
+			hi = min(ends)
+			if lo < hi:
+				total += hi - lo
+			idx[ends.index(hi)] += 1
+		result.append(total)
+	return result
+
+
+@contextlib.contextmanager
+def _shared_bounds(bounds):
+	"""
+	Return a context manager that copies bounds, a sequence of
+	arrays of floats, into a block of shared memory, unlinked on
+	exit, and yields a picklable handle from which
+	_coincident_livetimes_shared() recovers them, or None if shared
+	memory is not available (Python < 3.8).
+	"""
+	try:
+		from multiprocessing import shared_memory
+	except ImportError:
+		yield None
+		return
+	lengths = tuple(len(b) for b in bounds)
+	shm = shared_memory.SharedMemory(create = True, size = 8 * sum(lengths))
+	try:
+		buf = shm.buf.cast("d")
+		start = 0
+		for b in bounds:
+			buf[start : start + len(b)] = b
+			start += len(b)
+		buf.release()
+		yield shm.name, lengths
+	finally:
+		shm.close()
+		try:
+			shm.unlink()
+		except OSError:
+			# already gone
+			pass
+
+
+# the handle, shared memory block, and bounds last loaded by
+# _coincident_livetimes_shared() in this process
+_shared_bounds_loaded = (None, None, ())
+
+
+def _coincident_livetimes_shared(handle, shifts):
+	"""
+	_coincident_livetimes() for the bounds copied by _shared_bounds().
+	Each process attaches to the shared memory once, and then reuses
+	it, so the workers of a process pool are sent the bounds once
+	instead of with each chunk of shifts.
+	"""
+	global _shared_bounds_loaded
+	if _shared_bounds_loaded[0] != handle:
+		from multiprocessing import shared_memory
+		name, lengths = handle
+		_, shm, views = _shared_bounds_loaded
+		_shared_bounds_loaded = (None, None, ())
+		for view in views:
+			view.release()
+		if shm is not None:
+			shm.close()
+		shm = shared_memory.SharedMemory(name)
+		buf = shm.buf.cast("d")
+		bounds = []
+		start = 0
+		for length in lengths:
+			bounds.append(buf[start : start + length])
+			start += length
+		_shared_bounds_loaded = handle, shm, bounds + [buf]
+	return _coincident_livetimes(_shared_bounds_loaded[2][:-1], shifts)
+
+
 class segmentlistdict(dict):
 	"""
 	A dictionary associating a unique label and numeric offset with
@@ -897,6 +1643,13 @@ class segmentlistdict(dict):
 	from its original position (not its current position) by the given
 	amount.
 
+	For time slides, .intersection(), .union(), .vote(),
+	.intersects() and .is_coincident() accept an offset vector, a
+	dictionary of offsets applied as by .offsets.update() but only
+	while the result is computed:  the offsets are added to the
+	boundaries as they are read, and neither the segmentlists nor the
+	offsets attribute are changed.
+
 	Example:
 
 	>>> x = segmentlistdict()
@@ -971,9 +1724,7 @@ class segmentlistdict(dict):
 		if keys is None:
 			keys = self
 		new = self.__class__()
-		for key in keys:
-			new[key] = _shallowcopy(self[key])
-			dict.__setitem__(new.offsets, key, self.offsets[key])
+		_segmentlistdict_copy(self, new, keys)
 		return new
 
 	def __setitem__(self, key, value):
@@ -1004,7 +1755,8 @@ class segmentlistdict(dict):
 		>>> x["H2"] = segmentlist([segment(5, 15)])
 		>>> assert x.map(lambda l: 12 in l) == {'H2': True, 'H1': False}
 		"""
-		return dict((key, func(value)) for key, value in six.iteritems(self))
+		keys = list(self)
+		return dict(zip(keys, _parallel_map(func, [self[key] for key in keys])))
 
 	def __abs__(self):
 		"""
@@ -1018,17 +1770,14 @@ class segmentlistdict(dict):
 		Return a dictionary of the results of running .extent() on
 		each of the segmentlists.
 		"""
-		return self.map(segmentlist.extent)
+		return _segmentlistdict_extent(self)
 
 	def extent_all(self):
 		"""
 		Return the result of running .extent() on the union of all
 		lists in the dictionary.
 		"""
-		segs = tuple(seglist.extent() for seglist in self.values() if seglist)
-		if not segs:
-			raise ValueError("empty list")
-		return segment(min(seg[0] for seg in segs), max(seg[1] for seg in segs))
+		return _segmentlistdict_extent_all(self)
 
 	def find(self, item):
 		"""
@@ -1062,31 +1811,88 @@ class segmentlistdict(dict):
 		"""
 		return [key for key, segs in self.items() if x in segs]
 
+	# parallel evaluation
+
+	@classmethod
+	@contextlib.contextmanager
+	def parallel(cls, executor = None, workers = None):
+		"""
+		Return a context manager within which the operations that
+		are applied to each segmentlist in turn are instead
+		submitted to executor, a concurrent.futures.Executor (on
+		Python 2, from the futures package), to be evaluated
+		concurrently:  .coalesce(), .contract(), .protract(),
+		.map(), and the list-by-list arithmetic operators.  The
+		context applies to all segmentlistdict objects used in the
+		calling thread, including the copies made by the arithmetic
+		operators.
+
+		If executor is None, one is created for the duration of the
+		context, with workers workers, by default one per CPU:  a
+		ThreadPoolExecutor if the C extension releases the GIL while
+		it does the arithmetic, otherwise a ProcessPoolExecutor.
+		Otherwise workers may give the number of executor's
+		workers, among which .livetime_over_offsets() divides its
+		work.  With a process pool the segmentlists are pickled to
+		the workers and the results pickled back, so that cost must
+		be outweighed by the work, and the function passed to
+		.map() must be picklable.
+
+		Example:
+
+		>>> from concurrent.futures import ThreadPoolExecutor
+		>>> x = segmentlistdict()
+		>>> x["H1"] = segmentlist([segment(0, 10), segment(5, 15)])
+		>>> x["L1"] = segmentlist([segment(0, 5), segment(5, 15)])
+		>>> with ThreadPoolExecutor(2) as executor, x.parallel(executor):
+		...	assert x.coalesce() == {"H1": [segment(0, 15)], "L1": [segment(0, 15)]}
+		"""
+		from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+		owned = executor is None
+		if owned:
+			if workers is None:
+				# ThreadPoolExecutor has no default before Python 3.5
+				import multiprocessing
+				workers = multiprocessing.cpu_count()
+			executor = (ThreadPoolExecutor if _releases_gil else ProcessPoolExecutor)(workers)
+		previous = getattr(_parallel_context, "executor", None), getattr(_parallel_context, "workers", None)
+		_parallel_context.executor, _parallel_context.workers = executor, workers
+		try:
+			yield executor
+		finally:
+			_parallel_context.executor, _parallel_context.workers = previous
+			if owned:
+				executor.shutdown()
+
 	# list-by-list arithmetic
 
 	def __iand__(self, other):
-		for key, value in six.iteritems(other):
-			if key in self:
-				self[key] &= value
-			else:
+		if getattr(_parallel_context, "executor", None) is None:
+			return _segmentlistdict_iand(self, other)
+		keys = [key for key in other if key in self]
+		_apply_inplace(operator.iand, [self[key] for key in keys], [other[key] for key in keys])
+		for key in other:
+			if key not in self:
 				self[key] = segmentlist()
 		return self
 
 	def __and__(self, other):
-		if sum(len(s) for s in self.values()) <= sum(len(s) for s in other.values()):
+		if _total_length(self) <= _total_length(other):
 			return self.copy().__iand__(other)
 		return other.copy().__iand__(self)
 
 	def __ior__(self, other):
+		if getattr(_parallel_context, "executor", None) is None:
+			return _segmentlistdict_ior(self, other)
+		keys = [key for key in other if key in self]
+		_apply_inplace(operator.ior, [self[key] for key in keys], [other[key] for key in keys])
 		for key, value in six.iteritems(other):
-			if key in self:
-				self[key] |= value
-			else:
+			if key not in self:
 				self[key] = _shallowcopy(value)
 		return self
 
 	def __or__(self, other):
-		if sum(len(s) for s in self.values()) >= sum(len(s) for s in other.values()):
+		if _total_length(self) >= _total_length(other):
 			return self.copy().__ior__(other)
 		return other.copy().__ior__(self)
 
@@ -1094,9 +1900,10 @@ class segmentlistdict(dict):
 	__add__ = __or__
 
 	def __isub__(self, other):
-		for key, value in six.iteritems(other):
-			if key in self:
-				self[key] -= value
+		if getattr(_parallel_context, "executor", None) is None:
+			return _segmentlistdict_isub(self, other)
+		keys = [key for key in other if key in self]
+		_apply_inplace(operator.isub, [self[key] for key in keys], [other[key] for key in keys])
 		return self
 
 	def __sub__(self, other):
@@ -1111,7 +1918,7 @@ class segmentlistdict(dict):
 		return self
 
 	def __xor__(self, other):
-		if sum(len(s) for s in self.values()) <= sum(len(s) for s in other.values()):
+		if _total_length(self) <= _total_length(other):
 			return self.copy().__ixor__(other)
 		return other.copy().__ixor__(self)
 
@@ -1121,6 +1928,53 @@ class segmentlistdict(dict):
 			dict.__setitem__(new, key, ~value)
 		return new
 
+	# durations of the results of list-by-list arithmetic
+
+	def intersection_duration(self, other):
+		"""
+		Return abs(self & other), a dictionary of the durations of
+		the intersections of the segmentlists, without building
+		them.  See segmentlist.intersection_duration().
+		"""
+		if _total_length(self) > _total_length(other):
+			self, other = other, self
+		keys = [key for key in other if key in self]
+		result = dict(zip(keys, _parallel_map(_methodcaller("intersection_duration"), [self[key] for key in keys], [other[key] for key in keys])))
+		for key in self:
+			if key not in other:
+				result[key] = abs(self[key])
+		for key in other:
+			if key not in self:
+				result[key] = 0
+		return result
+
+	def union_duration(self, other):
+		"""
+		Return abs(self | other), a dictionary of the durations of
+		the unions of the segmentlists, without building them.  See
+		segmentlist.union_duration().
+		"""
+		keys = [key for key in other if key in self]
+		result = dict(zip(keys, _parallel_map(_methodcaller("union_duration"), [self[key] for key in keys], [other[key] for key in keys])))
+		for seglists in (self, other):
+			for key in seglists:
+				if key not in result:
+					result[key] = abs(seglists[key])
+		return result
+
+	def difference_duration(self, other):
+		"""
+		Return abs(self - other), a dictionary of the durations of
+		the differences between the segmentlists, without building
+		them.  See segmentlist.difference_duration().
+		"""
+		keys = [key for key in self if key in other]
+		result = dict(zip(keys, _parallel_map(_methodcaller("difference_duration"), [self[key] for key in keys], [other[key] for key in keys])))
+		for key in self:
+			if key not in other:
+				result[key] = abs(self[key])
+		return result
+
 	# other list-by-list operations
 
 	def intersects_segment(self, seg):
@@ -1130,17 +1984,21 @@ class segmentlistdict(dict):
 		"""
 		return any(value.intersects_segment(seg) for value in six.itervalues(self))
 
-	def intersects(self, other):
+	def intersects(self, other, offsets = None):
 		"""
 		Returns True if there exists a segmentlist in self that
 		intersects the corresponding segmentlist in other;  returns
-		False otherwise.
+		False otherwise.  If offsets is not None, it is an offset
+		vector applied to self, and to other if it is self, for the
+		comparison.
 
 		See also:
 
 		.intersects_all(), .all_intersects(), .all_intersects_all()
 		"""
-		return any(key in self and self[key].intersects(value) for key, value in six.iteritems(other))
+		if offsets is None:
+			return any(key in self and self[key].intersects(value) for key, value in six.iteritems(other))
+		return any(_cross_coincidences(self, [key], other, [key], first = True, offsets = offsets)[0][0] for key in other if key in self)
 
 	def intersects_all(self, other):
 		"""
@@ -1195,24 +2053,21 @@ class segmentlistdict(dict):
 		"""
 		Run .coalesce() on all segmentlists.
 		"""
-		for value in six.itervalues(self):
-			value.coalesce()
+		_apply_inplace(_methodcaller("coalesce"), six.itervalues(self))
 		return self
 
 	def contract(self, x):
 		"""
 		Run .contract(x) on all segmentlists.
 		"""
-		for value in six.itervalues(self):
-			value.contract(x)
+		_apply_inplace(_methodcaller("contract", x), six.itervalues(self))
 		return self
 
 	def protract(self, x):
 		"""
 		Run .protract(x) on all segmentlists.
 		"""
-		for value in six.itervalues(self):
-			value.protract(x)
+		_apply_inplace(_methodcaller("protract", x), six.itervalues(self))
 		return self
 
 	def extract_common(self, keys):
@@ -1232,7 +2087,7 @@ class segmentlistdict(dict):
 
 	# multi-list operations
 
-	def is_coincident(self, other, keys = None):
+	def is_coincident(self, other, keys = None, offsets = None):
 		"""
 		Return True if any segment in any list in self intersects
 		any segment in any list in other.  If the optional keys
@@ -1245,45 +2100,407 @@ class segmentlistdict(dict):
 
 		This method is equivalent to the intersects() method, but
 		without requiring the keys of the intersecting segment
-		lists to match.
+		lists to match.  offsets is as for .intersects().
 		"""
-		if keys is not None:
-			keys = set(keys)
-			self = tuple(self[key] for key in set(self) & keys)
-			other = tuple(other[key] for key in set(other) & keys)
-		else:
-			self = tuple(self.values())
-			other = tuple(other.values())
-		# make sure inner loop is smallest
-		if len(self) < len(other):
-			self, other = other, self
-		return any(a.intersects(b) for a in self for b in other)
+		self_keys, other_keys = _common_keys(self, other, keys)
+		return any(any(row) for row in _cross_coincidences(self, self_keys, other, other_keys, first = True, offsets = offsets))
+
+	def coincidence_matrix(self, other, keys = None, durations = False):
+		"""
+		Return a dictionary of dictionaries such that
+		result[a][b] is True if the segmentlist associated with
+		the key a in self intersects the segmentlist associated
+		with the key b in other, or False if not.  If durations
+		is True then result[a][b] is instead the length of their
+		intersection, abs(self[a] & other[b]).  The keys argument
+		works as for .is_coincident().  The segmentlists must be
+		coalesced.
+
+		All the segmentlists of both dictionaries are swept
+		together once, so for a total of N segments in K lists
+		this is O(N K).
 
-	def intersection(self, keys):
+		Example:
+
+		>>> x = segmentlistdict()
+		>>> x["H1"] = segmentlist([segment(0, 10)])
+		>>> x["L1"] = segmentlist([segment(20, 30)])
+		>>> y = segmentlistdict()
+		>>> y["V1"] = segmentlist([segment(5, 25)])
+		>>> x.coincidence_matrix(y, durations = True)["H1"]["V1"]
+		5
+		"""
+		self_keys, other_keys = _common_keys(self, other, keys)
+		rows = _cross_coincidences(self, self_keys, other, other_keys, durations = durations)
+		return dict((a, dict(zip(other_keys, row))) for a, row in zip(self_keys, rows))
+
+	def intersection(self, keys, offsets = None):
 		"""
 		Return the intersection of the segmentlists associated with
-		the keys in keys.
+		the keys in keys.  offsets is as for .vote().
 		"""
 		keys = set(keys)
 		if not keys:
 			return segmentlist()
-		seglist = _shallowcopy(self[keys.pop()])
-		for key in keys:
-			seglist &= self[key]
-		return seglist
+		return self.vote(keys, len(keys), offsets)
 
-	def union(self, keys):
+	def union(self, keys, offsets = None):
 		"""
 		Return the union of the segmentlists associated with the
-		keys in keys.
+		keys in keys.  offsets is as for .vote().
 		"""
-		keys = set(keys)
-		if not keys:
-			return segmentlist()
-		seglist = _shallowcopy(self[keys.pop()])
-		for key in keys:
-			seglist |= self[key]
-		return seglist
+		return self.vote(keys, 1, offsets)
+
+	def vote(self, keys, n, offsets = None):
+		"""
+		Return the intervals during which at least n of the
+		segmentlists associated with the keys in keys intersect.
+		With n = 1 this is the union of the segmentlists, with n
+		equal to the number of keys it is their intersection.  The
+		result is coalesced, and of the type of one of the
+		segmentlists.  Segmentlists that are not coalesced are
+		swept as coalesced copies.  If offsets is not None, it is
+		an offset vector:  the result is that with
+		.offsets.update(offsets), but the segmentlists and their
+		offsets are not changed.
+
+		Example:
+
+		>>> x = segmentlistdict()
+		>>> x["H1"] = segmentlist([segment(0, 15)])
+		>>> x["L1"] = segmentlist([segment(5, 20)])
+		>>> x["V1"] = segmentlist([segment(10, 25)])
+		>>> x.vote(("H1", "L1", "V1"), 2)
+		[segment(5, 20)]
+		>>> x.vote(("H1", "L1", "V1"), 2, {"L1": 12})
+		[segment(10, 15), segment(17.0, 25)]
+		"""
+		keys = list(set(keys))
+		result = _vote([_coalesced(self[key]) for key in keys], n, None if offsets is None else self._shifts(keys, offsets))
+		if keys and type(self[keys[0]]) is not type(result):
+			result = type(self[keys[0]])(result)
+		return result
+
+	# time slides
+
+	def _shifts(self, keys, offsets):
+		"""
+		Return a list of the amounts by which the segmentlists
+		associated with the keys in keys would be shifted by
+		.offsets.update(offsets), None for those that would not
+		be.
+		"""
+		return [offsets[key] - self.offsets[key] if key in offsets and offsets[key] != self.offsets[key] else None for key in keys]
+
+	def livetime_over_offsets(self, offset_vectors, keys = None, chunksize = None):
+		"""
+		Return a list of the livetimes of the intersection of the
+		segmentlists associated with the keys in keys, or all keys
+		if keys is None, for each of the offset vectors in
+		offset_vectors.  An offset vector is a dictionary of
+		offsets, applied as by .offsets.update():  keys it doesn't
+		mention keep their current offsets.  The livetime for each
+		is float(abs(self.intersection(keys))) with those offsets,
+		but the offsets are not changed.  The segmentlists must be
+		coalesced.
+
+		The boundaries are converted to floats once, and then the
+		lists are swept together for each offset vector in turn,
+		O(N k) per offset vector for N segments in k lists.  The C
+		extension does this without holding the GIL, and within
+		.parallel() the offset vectors are divided among the
+		executor's workers in chunks of chunksize, by default four
+		chunks per worker, the number of which is the workers
+		argument of .parallel(), or else the number of CPUs.  A
+		process pool's workers read the boundaries from shared
+		memory (Python 3.8 and later), so they are sent to each
+		worker once, not with each chunk.
+
+		Example:
+
+		>>> x = segmentlistdict()
+		>>> x["H1"] = segmentlist([segment(0, 10), segment(20, 30)])
+		>>> x["L1"] = segmentlist([segment(5, 15)])
+		>>> x.livetime_over_offsets([{"H1": 0, "L1": 0}, {"L1": 10}, {"L1": -5}])
+		[5.0, 5.0, 10.0]
+		"""
+		keys = list(self) if keys is None else list(set(keys))
+		bounds = [_array("d", (float(bound) for seg in self[key] for bound in seg)) for key in keys]
+		shifts = [[float(shift or 0.0) for shift in self._shifts(keys, vector)] for vector in offset_vectors]
+		executor = getattr(_parallel_context, "executor", None)
+		if executor is None or len(shifts) < 2:
+			return _coincident_livetimes(bounds, shifts)
+		if chunksize is None:
+			workers = getattr(_parallel_context, "workers", None)
+			if not workers:
+				import multiprocessing
+				workers = multiprocessing.cpu_count()
+			chunksize = -(-len(shifts) // (4 * workers))
+		chunks = [shifts[i : i + chunksize] for i in range(0, len(shifts), chunksize)]
+		from concurrent.futures import ProcessPoolExecutor
+		results = None
+		if isinstance(executor, ProcessPoolExecutor) and all(bounds):
+			with _shared_bounds(bounds) as handle:
+				if handle is not None:
+					results = _parallel_map(_coincident_livetimes_shared, [handle] * len(chunks), chunks)
+		if results is None:
+			results = _parallel_map(_coincident_livetimes, [bounds] * len(chunks), chunks)
+		return [livetime for livetimes in results for livetime in livetimes]
+
+
+#
+# =============================================================================
+#
+#                                 segmentindex
+#
+# =============================================================================
+#
+
+
+class segmentindex(object):
+	"""
+	A static index of a collection of segments, for finding the
+	segments that overlap a point or a segment.  Unlike the methods of
+	segmentlist the index does not require the segments to be
+	coalesced:  they can overlap, repeat, and be in any order, and
+	each keeps its identity, reported as its position in the sequence
+	the index was built from.
+
+	The index is built once, in O(n log n), and can't be modified.
+	Queries are O(log n + k), where k is the number of segments
+	reported.  Segments that start within the query are found by
+	bisecting a list of the segments sorted by lower bound, those
+	that start before it and extend into it by descending a centred
+	interval tree.  The index can be pickled.
+
+	Example:
+
+	>>> x = segmentindex([segment(0, 10), segment(5, 15), segment(5, 15), segment(20, 30)])
+	>>> sorted(x.find_all(7))
+	[0, 1, 2]
+	>>> sorted(x.find_all(segment(10, 25)))
+	[1, 2, 3]
+	>>> x.overlapping(segment(15, 20))
+	[]
+	"""
+	__slots__ = ("segments", "_starts", "_ends", "_order", "_nodes")
+
+	# the largest number of segments to put in a leaf of the tree
+	_leaf_size = 16
+
+	def __init__(self, segs = ()):
+		self.segments = segs = tuple(segs)
+		order = sorted(range(len(segs)), key = lambda i: segs[i][0])
+		self._order = order
+		self._starts = [segs[i][0] for i in order]
+		self._ends = [segs[i][1] for i in order]
+
+		# build the centred interval tree from the segments that
+		# have non-zero length, which are the only ones that can
+		# contain a point strictly.  each node is a list of its
+		# centre, the positions of its left and right children in
+		# the node list (-1 if none), and the lower bounds, upper
+		# bounds, and indexes of the segments that contain the
+		# centre:  the bounds in ascending order, each followed by
+		# the indexes of the segments in the same order.  the
+		# segments to the left of a node end at or before its
+		# centre, those to the right start after it.  small sets
+		# of segments are put in leaves, which are lists of their
+		# lower bounds, upper bounds and indexes, and are searched
+		# linearly
+		starts, ends = [seg[0] for seg in segs], [seg[1] for seg in segs]
+		nodes = []
+		members = [i for i in order if starts[i] < ends[i]]
+		stack = [(members, [starts[i] for i in members], None)] if members else []
+		while stack:
+			members, member_starts, parent = stack.pop()
+			if parent is not None:
+				parent[0][parent[1]] = len(nodes)
+			if len(members) <= self._leaf_size:
+				nodes.append([member_starts, [ends[i] for i in members], members])
+				continue
+			# the members are in order of lower bound, so the
+			# ones to the right of the centre are a tail
+			mid = len(members) // 2
+			centre = member_starts[mid]
+			split = _bisect_right(member_starts, centre, mid)
+			left, here = [], []
+			for i in members[:split]:
+				(left if ends[i] <= centre else here).append(i)
+			by_end = sorted(here, key = ends.__getitem__)
+			node = [centre, -1, -1, [starts[i] for i in here], here, [ends[i] for i in by_end], by_end]
+			nodes.append(node)
+			if left:
+				stack.append((left, [starts[i] for i in left], (node, 1)))
+			if split < len(members):
+				stack.append((members[split:], member_starts[split:], (node, 2)))
+		self._nodes = [tuple(node) for node in nodes]
+
+	def __len__(self):
+		return len(self.segments)
+
+	def __getitem__(self, i):
+		return self.segments[i]
+
+	def __iter__(self):
+		return iter(self.segments)
+
+	def __repr__(self):
+		return "segmentindex(%s)" % repr(list(self.segments))
+
+	def __getstate__(self):
+		return self.segments, self._starts, self._ends, self._order, self._nodes
+
+	def __setstate__(self, state):
+		self.segments, self._starts, self._ends, self._order, self._nodes = state
+
+	def _stab(self, x, found):
+		"""
+		Append to found the indexes of the segments whose lower
+		bounds are less than x and whose upper bounds are greater
+		than x.
+		"""
+		i = 0 if self._nodes else -1
+		while i >= 0:
+			node = self._nodes[i]
+			if len(node) == 3:
+				starts, ends, members = node
+				found.extend(members[j] for j in range(_bisect_left(starts, x)) if ends[j] > x)
+				break
+			centre, left, right, starts, by_start, ends, by_end = node
+			if x > centre:
+				# every segment here starts before x
+				found.extend(by_end[_bisect_right(ends, x):])
+				i = right
+			else:
+				# every segment here ends after x
+				found.extend(by_start[:_bisect_left(starts, x)])
+				i = left if x < centre else -1
+
+	def find_all(self, item):
+		"""
+		Return a list of the indexes of the segments that overlap
+		item, in no particular order.  If item is a segment, or any
+		other tuple of two values, the segments that intersect it
+		are found, otherwise those that contain it as a scalar.
+		See segment.intersects() and segment.__contains__().
+		"""
+		found = []
+		if isinstance(item, tuple):
+			lo, hi = item
+			# segments that start within item.  those of
+			# zero length at its lower bound don't intersect it
+			start = _bisect_left(self._starts, lo)
+			stop = _bisect_left(self._starts, hi, start)
+		else:
+			# segments that start at item.  those of zero
+			# length don't contain it
+			lo = item
+			start = _bisect_left(self._starts, lo)
+			stop = _bisect_right(self._starts, lo, start)
+		ends, order = self._ends, self._order
+		found.extend(order[i] for i in range(start, stop) if ends[i] > lo)
+		# segments that start before lo and end after it
+		self._stab(lo, found)
+		return found
+
+	def overlapping(self, item):
+		"""
+		Return a segmentlist of the segments that overlap item, in
+		the order they were given to the index.  See .find_all().
+		"""
+		return segmentlist(self.segments[i] for i in sorted(self.find_all(item)))
+
+
+#
+# =============================================================================
+#
+#                              segmentlistbuilder
+#
+# =============================================================================
+#
+
+
+class segmentlistbuilder(object):
+	"""
+	Accumulate segments, arriving mostly in time order, into a
+	coalesced segmentlist.  Intended for building lists from live
+	data, where calling .coalesce() after each new segment costs
+	O(n log n).
+
+	A segment that starts at or after the start of the last segment
+	in the list is merged into the end of the list in O(1).  Others
+	are held in a buffer of up to buffer_size segments, which is
+	coalesced and merged into the list when it fills, or when the
+	list is retrieved.  The .coalesced attribute is the coalesced
+	segmentlist of all the segments added so far.
+
+	Example:
+
+	>>> x = segmentlistbuilder()
+	>>> x.extend([segment(0, 10), segment(5, 15), segment(20, 30)])
+	>>> x.append(segment(14, 20))
+	>>> x.coalesced
+	[segment(0, 30)]
+	"""
+	__slots__ = ("_segs", "_buffer", "buffer_size")
+
+	def __init__(self, segs = (), buffer_size = 64):
+		self._segs = segmentlist()
+		self._buffer = []
+		self.buffer_size = buffer_size
+		self.extend(segs)
+
+	def append(self, seg):
+		"""
+		Add a segment.
+		"""
+		lo, hi = seg = segment(seg)
+		if lo == hi:
+			# coalesce() discards empty segments
+			return
+		segs = self._segs
+		if segs:
+			last = segs[-1]
+			if lo > last[1]:
+				segs.append(seg)
+			elif lo >= last[0]:
+				if hi > last[1]:
+					segs[-1] = segment(last[0], hi)
+			else:
+				self._buffer.append(seg)
+				if len(self._buffer) >= self.buffer_size:
+					self.flush()
+		else:
+			segs.append(seg)
+
+	def extend(self, segs):
+		"""
+		Add the segments from an iterable.
+		"""
+		for seg in segs:
+			self.append(seg)
+
+	def flush(self):
+		"""
+		Merge the buffered out-of-order segments into the list.
+		This is done automatically, and need not be called
+		explicitly.
+		"""
+		if self._buffer:
+			self._segs |= segmentlist(self._buffer).coalesce()
+			del self._buffer[:]
+
+	@property
+	def coalesced(self):
+		"""
+		The coalesced segmentlist of the segments added so far.
+		The list is the builder's own, and is updated in place by
+		segments added later;  copy it to keep a snapshot, and do
+		not modify it.
+		"""
+		self.flush()
+		return self._segs
 
 
 #
@@ -1295,8 +2512,14 @@ class segmentlistdict(dict):
 #
 
 
+# whether the C extension releases the GIL in the segmentlist arithmetic,
+# which lets threads evaluate it in parallel
+_releases_gil = False
+
+
 try:
 	from .__segments import *
+	from .__segments import _coalesced, _coincidences, _coincident_livetimes, _offsets, _releases_gil, _segmentlist_frombuffer, _segmentlistdict_copy, _segmentlistdict_extent, _segmentlistdict_extent_all, _segmentlistdict_iand, _segmentlistdict_ior, _segmentlistdict_isub, _total_length, _vote
 except ImportError:
 	pass
 
@@ -1313,4 +2536,3 @@ except ImportError:
 import six.moves.copyreg
 
 six.moves.copyreg.pickle(segment, lambda x: (segment, tuple(x)))
-six.moves.copyreg.pickle(segmentlist, lambda x: (segmentlist, (), None, iter(x)))
@@ -30,8 +30,14 @@ objects.
 """
 
 
+import io
+import json
+import mmap
+import os
 import re
+import struct
 
+import six
 from six.moves import range
 
 from . import segments
@@ -101,11 +107,161 @@ def fromlalcache(cachefile, coltype = int):
 	return segments.segmentlist(CacheEntry(l, coltype = coltype).segment for l in cachefile)
 
 
+#
+# Bulk parsing of text files with numpy
+#
+
+
+# the number of characters of text parsed at a time
+_bulk_block_size = 1 << 22
+
+
+def _bulk_parse(file, parse):
+	"""
+	If file is a seekable text file object, parse the remainder of its
+	contents in blocks of whole lines of about _bulk_block_size
+	characters with parse(), and return the segmentlist of the
+	segments found, otherwise return None.  parse() returns a format
+	and an (n, 2) array of the lower and upper bounds of a block's
+	segments, or None if the block can't be parsed in bulk.  If any
+	block can't be, or the blocks' formats differ, file is returned to
+	its position and None is returned.  Only one block of text is held
+	in memory at a time.
+	"""
+	try:
+		pos = file.tell()
+	except (AttributeError, IOError, ValueError):
+		return None
+	formats = set()
+	blocks = []
+	while True:
+		lines = file.readlines(_bulk_block_size)
+		if not lines:
+			break
+		result = parse("".join(lines)) if isinstance(lines[0], six.string_types) else None
+		del lines
+		if result is not None:
+			format, bounds = result
+			formats.add(format)
+			blocks.append(bounds)
+		if result is None or len(formats) > 1:
+			file.seek(pos)
+			return None
+	if not blocks:
+		return segments.segmentlist()
+	import numpy
+	bounds = numpy.concatenate(blocks)
+	return _tosegmentlist(bounds[:, 0], bounds[:, 1])
+
+
+def _loadtxt(text, coltype, usecols = None):
+	"""
+	Parse the whitespace-delimited columns of numbers in text with
+	numpy.loadtxt() into an (n, k) array of int64 values if coltype is
+	int or float64 values if coltype is float.  Return None if numpy is
+	not available, if text can't be parsed, or if it contains values
+	whose conversion by coltype might not be reproduced exactly:  ints
+	too large to subtract without overflow and non-finite floats.
+	"""
+	if not text.strip():
+		return None
+	try:
+		import numpy
+	except ImportError:
+		return None
+	if numpy.lib.NumpyVersion(numpy.__version__) < "1.23.0":
+		# older versions of loadtxt() parse integers with
+		# int(float(x))
+		return None
+	try:
+		cols = numpy.loadtxt(io.StringIO(text), dtype = numpy.int64 if coltype is int else numpy.float64, comments = None, usecols = usecols, ndmin = 2)
+	except (ValueError, OverflowError):
+		return None
+	if coltype is int:
+		if len(cols) and numpy.abs(cols).max() > 2**62:
+			return None
+	elif not numpy.isfinite(cols).all():
+		return None
+	return cols
+
+
+def _tosegmentlist(lo, hi):
+	"""
+	Return a segmentlist of the segments whose lower and upper bounds
+	are given by the numpy arrays lo and hi.
+	"""
+	return segments.segmentlist(map(segments.segment, lo.tolist(), hi.tolist()))
+
+
+# text that the line parsers might read differently than numpy
+_unusual_whitespace = re.compile(r"[^\S \t\n]")
+_blank_line = re.compile(r"^[ \t]*$", re.MULTILINE)
+
+
 #
 # Segwizard-formated segment list text files
 #
 
 
+_segwizard_comment = re.compile(r"[#;].*")
+_segwizard_unusual = re.compile(r"[^0-9 \t\n.+eE-]")
+_segwizard_unusual_number = re.compile(r"^[ \t]*[0-9]*[^0-9 \t\n]", re.MULTILINE)
+_segwizard_tokenizer = re.compile(r"\A\s*([\d.+-eE]+)\s+([\d.+-eE]+)(?:\s+([\d.+-eE]+))?(?:\s+([\d.+-eE]+))?\Z")
+
+
+def iter_segwizard(file, coltype = int, strict = True, coalesce = False):
+	"""
+	Generator yielding the segments in the file object file containing
+	a segwizard compatible segment list as they are read.  See
+	fromsegwizard() for the meanings of coltype and strict and for the
+	file formats recognized.  Only the line being parsed is held in
+	memory, so files of any size can be read.  If coalesce is True, the
+	segments are coalesced as they are read with coalesce_sorted(),
+	which requires them to be in order.
+
+	Example:
+
+	>>> from six.moves import StringIO
+	>>> list(iter_segwizard(StringIO("0 0 10 10\\n1 10 20 10\\n"), coalesce = True))
+	[segment(0, 20)]
+	"""
+	if coalesce:
+		for seg in coalesce_sorted(iter_segwizard(file, coltype, strict)):
+			yield seg
+		return
+	format = None
+	for line in file:
+		# everything from the first '#' or ';' is a comment
+		line = line.partition("#")[0].partition(";")[0].rstrip()
+		if not line:
+			continue
+		match = _segwizard_tokenizer.match(line)
+		if match is None:
+			break
+		tokens = [token for token in match.groups() if token is not None]
+		this_line_format = len(tokens)
+		try:
+			if this_line_format == 4:
+				# the segment number must be an unsigned
+				# integer
+				if not tokens[0].isdigit():
+					break
+				int(tokens[0])
+				del tokens[0]
+			seg = segments.segment(coltype(tokens[0]), coltype(tokens[1]))
+			duration = coltype(tokens[2]) if this_line_format > 2 else abs(seg)
+		except ValueError:
+			break
+		if strict:
+			if abs(seg) != duration:
+				raise ValueError("segment '%s' has incorrect duration" % line)
+			if format is None:
+				format = this_line_format
+			elif format != this_line_format:
+				raise ValueError("segment '%s' format mismatch" % line)
+		yield seg
+
+
 def fromsegwizard(file, coltype = int, strict = True):
 	"""
 	Read a segmentlist from the file object file containing a segwizard
@@ -123,46 +279,52 @@ def fromsegwizard(file, coltype = int, strict = True):
 	the segments in the input file are not coalesced or out of order,
 	then thusly shall be the output of this function.  It is
 	recommended that this function's output be coalesced before use.
+
+	If coltype is int or float, numpy is available and file is a
+	seekable file object, the file is first parsed in bulk, in blocks
+	of lines, by numpy.loadtxt() and the durations checked with
+	vectorized arithmetic.  If anything in the file might be parsed
+	differently by numpy, or is not a valid segment, the file is
+	re-read line by line, so the result and the errors raised do not
+	depend on the method.
+
+	See also:
+
+	iter_segwizard()
 	"""
-	commentpat = re.compile(r"\s*([#;].*)?\Z", re.DOTALL)
-	twocolsegpat = re.compile(r"\A\s*([\d.+-eE]+)\s+([\d.+-eE]+)\s*\Z")
-	threecolsegpat = re.compile(r"\A\s*([\d.+-eE]+)\s+([\d.+-eE]+)\s+([\d.+-eE]+)\s*\Z")
-	fourcolsegpat = re.compile(r"\A\s*([\d]+)\s+([\d.+-eE]+)\s+([\d.+-eE]+)\s+([\d.+-eE]+)\s*\Z")
-	format = None
-	l = segments.segmentlist()
-	for line in file:
-		line = commentpat.split(line)[0]
-		if not line:
-			continue
-		try:
-			[tokens] = fourcolsegpat.findall(line)
-			num = int(tokens[0])
-			seg = segments.segment(list(map(coltype, tokens[1:3])))
-			duration = coltype(tokens[3])
-			this_line_format = 4
-		except ValueError:
-			try:
-				[tokens] = threecolsegpat.findall(line)
-				seg = segments.segment(list(map(coltype, tokens[0:2])))
-				duration = coltype(tokens[2])
-				this_line_format = 3
-			except ValueError:
-				try:
-					[tokens] = twocolsegpat.findall(line)
-					seg = segments.segment(list(map(coltype, tokens[0:2])))
-					duration = abs(seg)
-					this_line_format = 2
-				except ValueError:
-					break
-		if strict:
-			if abs(seg) != duration:
-				raise ValueError("segment '%s' has incorrect duration" % line)
-			if format is None:
-				format = this_line_format
-			elif format != this_line_format:
-				raise ValueError("segment '%s' format mismatch" % line)
-		l.append(seg)
-	return l
+	if coltype is int or coltype is float:
+		seglist = _bulk_parse(file, lambda text: _fromsegwizard_bulk(text, coltype, strict))
+		if seglist is not None:
+			return seglist
+	return segments.segmentlist(iter_segwizard(file, coltype = coltype, strict = strict))
+
+
+def _fromsegwizard_bulk(text, coltype, strict):
+	"""
+	Parse the segwizard compatible segment list in the string text
+	with numpy for _bulk_parse().  The format is the number of
+	columns.  Returns None if the text contains anything that
+	fromsegwizard()'s line parser might treat differently.
+	"""
+	if "#" in text or ";" in text:
+		text = _segwizard_comment.sub("", text)
+	if _segwizard_unusual.search(text):
+		return None
+	cols = _loadtxt(text, coltype)
+	if cols is None or not 2 <= cols.shape[1] <= 4:
+		return None
+	format = cols.shape[1]
+	if format == 4:
+		# the segment number must be an unsigned integer
+		if _segwizard_unusual_number.search(text):
+			return None
+		cols = cols[:, 1:]
+	import numpy
+	lo = numpy.minimum(cols[:, 0], cols[:, 1])
+	hi = numpy.maximum(cols[:, 0], cols[:, 1])
+	if strict and cols.shape[1] == 3 and (hi - lo != cols[:, 2]).any():
+		return None
+	return format, numpy.column_stack((lo, hi))
 
 
 def tosegwizard(file, seglist, header = True, coltype = int):
@@ -200,7 +362,16 @@ def fromtama(file, coltype = float):
 	the segments in the input file are not coalesced or out of order,
 	then thusly shall be the output of this function.  It is
 	recommended that this function's output be coalesced before use.
+
+	If coltype is int or float, numpy is available and file is a
+	seekable file object, the file is first parsed in bulk, in blocks
+	of lines, by numpy.loadtxt().  If anything in the file might be
+	parsed differently by numpy, the file is re-read line by line.
 	"""
+	if coltype is int or coltype is float:
+		seglist = _bulk_parse(file, lambda text: _fromtama_bulk(text, coltype))
+		if seglist is not None:
+			return seglist
 	segmentpat = re.compile(r"\A\s*\S+\s+\S+\s+\S+\s+([\d.+-eE]+)\s+([\d.+-eE]+)")
 	l = segments.segmentlist()
 	for line in file:
@@ -212,6 +383,165 @@ def fromtama(file, coltype = float):
 	return l
 
 
+def _fromtama_bulk(text, coltype):
+	"""
+	Parse the TAMA locked-segments data in the string text with numpy
+	for _bulk_parse().  Returns None if the text contains anything that
+	fromtama()'s line parser might treat differently.
+	"""
+	# blank lines stop the line parser.  text is whole lines, a final
+	# newline does not start another line
+	if _unusual_whitespace.search(text) or _blank_line.search(text[:-1] if text.endswith("\n") else text):
+		return None
+	cols = _loadtxt(text, coltype, usecols = (3, 4))
+	if cols is None:
+		return None
+	import numpy
+	return None, numpy.column_stack((numpy.minimum(cols[:, 0], cols[:, 1]), numpy.maximum(cols[:, 0], cols[:, 1])))
+
+
+#
+# Binary segment list files
+#
+
+
+_binary_magic = b"SEGMENTS"
+_binary_version = 1
+
+
+def _binary_offset(offset):
+	"""
+	Return offset as an int or a float, which the JSON header of the
+	segments binary format records exactly.  ValueError is raised if
+	offset is neither and cannot be converted to a float without loss,
+	for example a LIGOTimeGPS with more precision than a float has.
+	"""
+	import numpy
+	if isinstance(offset, six.integer_types + (numpy.integer,)):
+		return int(offset)
+	value = float(offset)
+	if value != offset:
+		raise ValueError("offset %s cannot be stored without loss of precision" % repr(offset))
+	return value
+
+
+def tobinary(file, seglists):
+	"""
+	Write seglists to the file object file, which must be opened in
+	binary mode, in the segments binary format.  seglists can be a
+	segmentlistdict, whose keys must be strings, or a single
+	segmentlist, segmentarray, or other iterable of segments.  The
+	boundaries are converted as by segmentarray, so they must be ints
+	or floats or the infinity objects.  So must the offsets, or they
+	must be exactly representable as floats, else ValueError is raised.
+	This function requires numpy.
+
+	The file begins with the 8 bytes "SEGMENTS", followed by the
+	format version and the length of the header, as little-endian
+	unsigned 32-bit integers, and the header, a JSON object listing the
+	dtype, length, key, offset, and position of each segment list.
+	The header is padded to a multiple of 16 bytes, and is followed by
+	the boundaries of each list as a contiguous (n, 2) array of
+	little-endian int64 or float64 values.
+
+	See also:
+
+	frombinary()
+	"""
+	from .arrays import segmentarray
+	if isinstance(seglists, segments.segmentlistdict):
+		keys = list(seglists)
+		for key in keys:
+			if not isinstance(key, six.string_types):
+				raise TypeError("segmentlistdict keys must be strings, not %s" % repr(key))
+		offsets = [_binary_offset(seglists.offsets[key]) for key in keys]
+		arrays = [segmentarray(seglists[key]).bounds for key in keys]
+	else:
+		keys = [None]
+		offsets = [0.0]
+		arrays = [segmentarray(seglists).bounds]
+	arrays = [bounds.astype(bounds.dtype.newbyteorder("<"), order = "C", copy = False) for bounds in arrays]
+	lists = []
+	start = 0
+	for key, offset, bounds in zip(keys, offsets, arrays):
+		lists.append({"key": key, "offset": offset, "dtype": bounds.dtype.str, "length": len(bounds), "start": start})
+		start += bounds.nbytes
+	header = json.dumps({"dict": isinstance(seglists, segments.segmentlistdict), "lists": lists}, sort_keys = True).encode("utf-8")
+	header += b" " * (-(len(header) + 16) % 16)
+	file.write(_binary_magic)
+	file.write(struct.pack("<II", _binary_version, len(header)))
+	file.write(header)
+	for bounds in arrays:
+		file.write(bounds.data)
+
+
+def frombinary(file, memmap = True):
+	"""
+	Read a file in the segments binary format written by tobinary().
+	file is the name of the file or a file object opened in binary
+	mode, which is read from the start.  The result is a
+	segmentlistdict of segmentarray objects, with the offsets recorded
+	in the file, if a segmentlistdict was written, otherwise a
+	segmentarray.  This function requires numpy.
+
+	If memmap is True (the default), the file is memory-mapped rather
+	than read:  opening the file is fast regardless of its size, pages
+	are loaded only when they are used, and processes that open the
+	same file share its pages.  The segmentarray objects' boundary
+	arrays are read-only views of the file, which segmentarray
+	supports:  operations that modify a segmentarray replace its
+	array.  File objects that cannot be memory-mapped, like io.BytesIO,
+	are read.
+
+	ValueError is raised if the file is not in the segments binary
+	format or is in a version of it that is not supported.
+
+	See also:
+
+	tobinary()
+	"""
+	import numpy
+	from .arrays import segmentarray
+	if isinstance(file, six.string_types):
+		with open(file, "rb") as f:
+			return frombinary(f, memmap = memmap)
+	buf = None
+	if memmap:
+		try:
+			if os.fstat(file.fileno()).st_size:
+				buf = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+		except (AttributeError, io.UnsupportedOperation, ValueError, OSError, mmap.error):
+			# not backed by a file descriptor, e.g. io.BytesIO
+			pass
+	if buf is None:
+		file.seek(0)
+		buf = file.read()
+	buf = numpy.frombuffer(buf, dtype = numpy.uint8)
+	if buf[:len(_binary_magic)].tobytes() != _binary_magic or len(buf) < 16:
+		raise ValueError("not a segments binary file")
+	version, header_length = struct.unpack("<II", buf[8:16].tobytes())
+	if version != _binary_version:
+		raise ValueError("unsupported segments binary file version %d" % version)
+	header = json.loads(buf[16:16 + header_length].tobytes().decode("utf-8"))
+	data = buf[16 + header_length:]
+	values = []
+	for entry in header["lists"]:
+		dtype = numpy.dtype(entry["dtype"])
+		start = entry["start"]
+		stop = start + 2 * dtype.itemsize * entry["length"]
+		if stop > len(data):
+			raise ValueError("segments binary file is truncated")
+		values.append(segmentarray(data[start:stop].view(dtype).reshape((entry["length"], 2))))
+	if not header["dict"]:
+		[value] = values
+		return value
+	seglists = segments.segmentlistdict()
+	for entry, value in zip(header["lists"], values):
+		seglists[entry["key"]] = value
+		dict.__setitem__(seglists.offsets, entry["key"], entry["offset"])
+	return seglists
+
+
 #
 # Command line or config file strings
 #
@@ -351,33 +681,318 @@ def segmentlistdict_from_short_string(s, boundtype = int):
 	return d
 
 
+def _iter_bitstream(bitstream, start, dt, minlen):
+	"""
+	Generator implementing from_bitstream() for iterables.
+	"""
+	i = None
+	j = -1
+	for j, bit in enumerate(bitstream):
+		if bit:
+			if i is None:
+				# found start of True block
+				i = j
+		elif i is not None:
+			if j - i >= minlen:
+				yield segments.segment(start + i * dt, start + j * dt)
+			i = None
+	# the stream ended in a True block
+	if i is not None and j + 1 - i >= minlen:
+		yield segments.segment(start + i * dt, start + (j + 1) * dt)
+
+
+def _asbits(chunk):
+	"""
+	Return the one-dimensional array or buffer chunk as a numpy array
+	of booleans.
+	"""
+	import numpy
+	if not isinstance(chunk, numpy.ndarray):
+		chunk = numpy.asarray(memoryview(chunk))
+	if chunk.ndim != 1:
+		raise ValueError("bit stream must be one-dimensional")
+	return chunk.astype(bool, copy = False)
+
+
+def _pair_edges(edges, open_run, minlen):
+	"""
+	Return the arrays of the first and one-past-the-last sample indexes
+	of the runs delimited by edges, the sorted array of the indexes of
+	the samples at which a bit stream changes, that are at least minlen
+	samples long, and the index of the start of the run left open at
+	the end, or -1.  open_run is the index of the start of the run open
+	at the start, or -1.
+	"""
+	import numpy
+	if open_run >= 0:
+		edges = numpy.concatenate(([open_run], edges))
+	if len(edges) % 2:
+		open_run = int(edges[-1])
+		edges = edges[:-1]
+	else:
+		open_run = -1
+	lo, hi = edges[0::2], edges[1::2]
+	keep = hi - lo >= minlen
+	return lo[keep], hi[keep], open_run
+
+
+def _tosegments(lo, hi, start, dt):
+	"""
+	Return a segmentlist of the segments spanning the samples from the
+	indexes in the array lo up to those in hi.
+	"""
+	return segments.segmentlist(segments.segment(start + i * dt, start + j * dt) for i, j in zip(lo.tolist(), hi.tolist()))
+
+
 def from_bitstream(bitstream, start, dt, minlen = 1):
 	"""
 	Convert consecutive True values in a bit stream (boolean-castable
 	iterable) to a stream of segments. Require minlen consecutive True
 	samples to comprise a segment.
 
+	If the bit stream is a numpy array or other one-dimensional object
+	supporting the buffer protocol (bytes, array.array, ...) then the
+	run edges are found with numpy, and the result is a segmentlist
+	instead of a generator.  For bit streams delivered in chunks see
+	bitstreamdecoder.
+
 	Example:
 
 	>>> list(from_bitstream((True, True, False, True, False), 0, 1))
 	[segment(0, 2), segment(3, 4)]
 	>>> list(from_bitstream([[], [[]], [[]], [], []], 1013968613, 0.125))
 	[segment(1013968613.125, 1013968613.375)]
+	>>> import numpy
+	>>> from_bitstream(numpy.array([0, 1, 1, 1, 0, 1]), 10, 2, minlen = 2)
+	[segment(12, 18)]
+	"""
+	try:
+		memoryview(bitstream)
+	except TypeError:
+		return _iter_bitstream(bitstream, start, dt, minlen)
+	try:
+		import numpy
+	except ImportError:
+		return segments.segmentlist(_iter_bitstream(bitstream, start, dt, minlen))
+	decoder = bitstreamdecoder(start, dt, minlen)
+	seglist = decoder.append(bitstream)
+	seglist.extend(decoder.close())
+	return seglist
+
+
+class bitstreamdecoder(object):
+	"""
+	Convert consecutive True values in a bit stream delivered in chunks,
+	consecutive numpy arrays or other one-dimensional buffers of
+	boolean-castable samples, to segments.  The result is the same as
+	from_bitstream() applied to the whole stream:  a block of True
+	samples that continues from one chunk into the next is one segment,
+	and must be minlen samples long in total.  Requires numpy.
+
+	Example:
+
+	>>> import numpy
+	>>> decoder = bitstreamdecoder(0, 1)
+	>>> decoder.append(numpy.array([True, True, False, True]))
+	[segment(0, 2)]
+	>>> decoder.append(numpy.array([True, True]))
+	[]
+	>>> decoder.close()
+	[segment(3, 6)]
+	"""
+	def __init__(self, start, dt, minlen = 1):
+		self.start = start
+		self.dt = dt
+		self.minlen = minlen
+		# the number of samples so far, and the index of the
+		# sample that started the block of True samples at the end,
+		# or -1
+		self._n = 0
+		self._open = -1
+
+	def append(self, chunk):
+		"""
+		Decode the next chunk of the bit stream, and return a
+		segmentlist of the blocks of True samples that ended in
+		it.
+		"""
+		import numpy
+		chunk = _asbits(chunk)
+		if not len(chunk):
+			return segments.segmentlist()
+		edges = numpy.flatnonzero(chunk[1:] != chunk[:-1]) + (self._n + 1)
+		if chunk[0] != (self._open >= 0):
+			edges = numpy.concatenate(([self._n], edges))
+		self._n += len(chunk)
+		lo, hi, self._open = _pair_edges(edges, self._open, self.minlen)
+		return _tosegments(lo, hi, self.start, self.dt)
+
+	def close(self):
+		"""
+		End the bit stream, and return a segmentlist of the block
+		of True samples at the end, if any.
+		"""
+		import numpy
+		edges = numpy.array([self._n], dtype = numpy.int64) if self._open >= 0 else numpy.zeros(0, dtype = numpy.int64)
+		lo, hi, self._open = _pair_edges(edges, self._open, self.minlen)
+		return _tosegments(lo, hi, self.start, self.dt)
+
+
+def _statevector_bits(bits, itemsize):
+	"""
+	Return a list of the (name, bit number) pairs described by the bits
+	argument of from_statevector() for a state vector whose samples are
+	itemsize bytes, or None if that is not known, in which case the
+	default is no bits.
+	"""
+	if bits is None:
+		bits = list(range(8 * itemsize)) if itemsize is not None else []
+	if isinstance(bits, dict):
+		bits = list(bits.items())
+	else:
+		bits = [(name, bit) for bit, name in enumerate(bits) if name is not None]
+	for name, bit in bits:
+		if bit < 0:
+			raise ValueError("bit %d of %s is negative" % (bit, repr(name)))
+		if itemsize is not None and bit >= 8 * itemsize:
+			raise ValueError("bit %d of %s out of range for %d-byte samples" % (bit, repr(name), itemsize))
+	return bits
+
+
+def from_statevector(statevector, start, dt, bits = None, minlen = 1):
+	"""
+	Convert a state vector, a numpy array or other one-dimensional
+	buffer of integers each bit of which is a separate flag, to a
+	segmentlistdict giving for each bit the segments during which it is
+	set, as from_bitstream() would for that bit.  All the bits are
+	decoded in one pass over the samples.  bits is a dictionary mapping
+	names to bit numbers (0 is the least significant bit), or a
+	sequence of names, the first for bit 0 and so on, with None for the
+	bits to be skipped.  The default is all of the bits, named by their
+	numbers.  For state vectors delivered in chunks see
+	statevectordecoder.  Requires numpy.
+
+	Example:
+
+	>>> import numpy
+	>>> x = numpy.array([0b01, 0b11, 0b11, 0b10, 0b00, 0b01], dtype = numpy.uint8)
+	>>> seglists = from_statevector(x, 0, 1, bits = ["locked", "observing"])
+	>>> seglists["locked"]
+	[segment(0, 3), segment(5, 6)]
+	>>> seglists["observing"]
+	[segment(1, 4)]
 	"""
-	bitstream = iter(bitstream)
-	i = 0
-	while 1:
-		if next(bitstream):
-			# found start of True block; find the end
-			j = i + 1
-			try:
-				while next(bitstream):
-					j += 1
-			finally:  # make sure StopIteration doesn't kill final segment
-				if j - i >= minlen:
-					yield segments.segment(start + i * dt, start + j * dt)
-			i = j  # advance to end of block
-		i += 1
+	decoder = statevectordecoder(start, dt, bits = bits, minlen = minlen)
+	seglists = decoder.append(statevector)
+	seglists.extend(decoder.close())
+	return seglists
+
+
+class statevectordecoder(object):
+	"""
+	Convert a state vector delivered in chunks, consecutive numpy
+	arrays or other one-dimensional buffers of integers, to segments.
+	The result is the same as from_statevector() applied to the whole
+	state vector:  a block of samples with a bit set that continues
+	from one chunk into the next is one segment, and must be minlen
+	samples long in total.  Requires numpy.
+
+	The width of the samples, and so the number of bits if bits is
+	None, is taken from the first chunk, and ValueError is raised if a
+	later chunk's samples are of a different width.  If the state
+	vector ends before any chunks are appended, close() returns an
+	empty segmentlist for each of the bits named by bits.
+
+	Example:
+
+	>>> import numpy
+	>>> decoder = statevectordecoder(0, 1, bits = {"locked": 0})
+	>>> decoder.append(numpy.array([1, 1, 0, 1], dtype = numpy.uint8))
+	{'locked': [segment(0, 2)]}
+	>>> decoder.append(numpy.array([1, 1], dtype = numpy.uint8))
+	{'locked': []}
+	>>> decoder.close()
+	{'locked': [segment(3, 6)]}
+	"""
+	def __init__(self, start, dt, bits = None, minlen = 1):
+		self.start = start
+		self.dt = dt
+		self.bits = bits
+		self.minlen = minlen
+		# the width of the samples in bytes, the (name, bit number)
+		# pairs, the number of samples so far, the value of the
+		# last sample, and for each bit the index of the sample that
+		# started the block in which it is set at the end, or -1
+		self._itemsize = None
+		self._bits = None
+		self._n = 0
+		self._last = 0
+		self._open = None
+
+	def _setbits(self, itemsize):
+		self._itemsize = itemsize
+		self._bits = _statevector_bits(self.bits, itemsize)
+		self._open = dict((name, -1) for name, bit in self._bits)
+
+	def append(self, chunk):
+		"""
+		Decode the next chunk of the state vector, and return a
+		segmentlistdict of the blocks of samples with each bit set
+		that ended in it.
+		"""
+		import numpy
+		if not isinstance(chunk, numpy.ndarray):
+			chunk = numpy.asarray(memoryview(chunk))
+		if chunk.ndim != 1:
+			raise ValueError("state vector must be one-dimensional")
+		if chunk.dtype.kind not in "biu":
+			raise TypeError("state vector must be of integer type, not %s" % chunk.dtype)
+		# bit operations on unsigned integers of the same width
+		chunk = chunk.view("u%d" % chunk.dtype.itemsize)
+		if self._bits is None:
+			self._setbits(chunk.dtype.itemsize)
+		elif self._itemsize is not None and chunk.dtype.itemsize != self._itemsize:
+			raise ValueError("chunk of %d-byte samples follows %d-byte samples" % (chunk.dtype.itemsize, self._itemsize))
+		seglists = segments.segmentlistdict()
+		if not len(chunk):
+			for name, bit in self._bits:
+				seglists[name] = segments.segmentlist()
+			return seglists
+
+		# the indexes of the samples at which any of the bits
+		# changes, and which bits
+		mask = 0
+		for name, bit in self._bits:
+			mask |= 1 << bit
+		changes = numpy.empty_like(chunk)
+		changes[0] = int(chunk[0]) ^ self._last
+		numpy.bitwise_xor(chunk[1:], chunk[:-1], out = changes[1:])
+		changes &= chunk.dtype.type(mask)
+		edges = numpy.flatnonzero(changes)
+		changes = changes[edges]
+		edges += self._n
+		self._n += len(chunk)
+		self._last = int(chunk[-1])
+
+		for name, bit in self._bits:
+			lo, hi, self._open[name] = _pair_edges(edges[changes & chunk.dtype.type(1 << bit) != 0], self._open[name], self.minlen)
+			seglists[name] = _tosegments(lo, hi, self.start, self.dt)
+		return seglists
+
+	def close(self):
+		"""
+		End the state vector, and return a segmentlistdict of the
+		blocks of samples with each bit set at the end, if any.
+		"""
+		import numpy
+		if self._bits is None:
+			self._setbits(None)
+		seglists = segments.segmentlistdict()
+		for name, bit in self._bits:
+			edges = numpy.array([self._n], dtype = numpy.int64) if self._open[name] >= 0 else numpy.zeros(0, dtype = numpy.int64)
+			lo, hi, self._open[name] = _pair_edges(edges, self._open[name], self.minlen)
+			seglists[name] = _tosegments(lo, hi, self.start, self.dt)
+		return seglists
 
 
 #
@@ -486,75 +1101,46 @@ def vote(seglists, n):
 
 	The sequence of segmentlists is only iterated over once, and the
 	segmentlists within it are only iterated over once;  they can all
-	be generators.  If there are a total of N segments in M segment
-	lists and the final result has L segments the algorithm is O(N M) +
-	O(L).
+	be generators.  The segmentlists are swept together with a heap
+	holding the next boundary of each, so if there are a total of N
+	segments in M segment lists the algorithm is O(N log M).
+
+	See also:
+
+	segments.segmentlistdict.vote()
 	"""
-	# check for no-op
+	return segments._vote(seglists, n)
 
-	if n < 1:
-		return segments.segmentlist()
 
-	# digest the segmentlists into an ordered sequence of off-on and
-	# on-off transitions with the vote count for each transition
-	# FIXME:  this generator is declared locally for now, is it useful
-	# as a stand-alone generator?
-
-	def pop_min(l):
-		# remove and return the smallest value from a list
-		val = min(l, key=lambda _: _[:2])
-		for i in range(len(l) - 1, -1, -1):
-			if l[i][:2] == val[:2]:
-				return l.pop(i)
-		assert False	# cannot get here
-
-	def vote_generator(seglists):
-		queue = []
-		for seglist in seglists:
-			segiter = iter(seglist)
-			try:
-				seg = next(segiter)
-			except StopIteration:
-				continue
-			# put them in so that the smallest boundary is
-			# closest to the end of the list
-			queue.append((seg[1], -1, segiter))
-			queue.append((seg[0], +1, None))
-		if not queue:
-			return
-		queue.sort(reverse = True, key = lambda _: _[:2])
-		bound = queue[-1][0]
-		votes = 0
-		while queue:
-			this_bound, delta, segiter = pop_min(queue)
-			if this_bound == bound:
-				votes += delta
-			else:
-				yield bound, votes
-				bound = this_bound
-				votes = delta
-			if segiter is not None:
-				try:
-					seg = next(segiter)
-				except StopIteration:
-					continue
-				queue.append((seg[1], -1, segiter))
-				queue.append((seg[0], +1, None))
-		yield bound, votes
-
-	# compute the cumulative sum of votes, and assemble a segmentlist
-	# from the intervals when the vote count is equal to or greater
-	# than n
-
-	result = segments.segmentlist()
-	votes = 0
-	for bound, delta in vote_generator(seglists):
-		if delta > 0 and n - delta <= votes < n:
-			start = bound
-		elif delta < 0 and n <= votes < n - delta:
-			result.append(segments.segment(start, bound))
-			del start	# detect stops that aren't preceded by starts
-		votes += delta
-	assert votes == 0	# detect failed cumulative sum
-
-	return result
+def coalesce_sorted(segs):
+	"""
+	Generator yielding the segments of the coalesced segmentlist made
+	from the segments in the iterable segs, which must be sorted in
+	ascending order of their lower bounds.  Segments that overlap or
+	touch are merged and empty segments are dropped, as by
+	segmentlist.coalesce(), but only the segment being assembled is
+	held in memory, so segs can be a generator of any length.
+	ValueError is raised if a segment is found to be out of order.
+
+	Example:
+
+	>>> from segments.segments import *
+	>>> list(coalesce_sorted([segment(0, 10), segment(5, 15), segment(15, 20), segment(30, 30), segment(40, 50)]))
+	[segment(0, 20), segment(40, 50)]
+	"""
+	segs = iter(segs)
+	for lo, hi in segs:
+		break
+	else:
+		return
+	for seg in segs:
+		if seg[0] > hi:
+			if lo != hi:
+				yield segments.segment(lo, hi)
+			lo, hi = seg
+		elif seg[0] < lo:
+			raise ValueError("segment %s is out of order" % repr(seg))
+		elif seg[1] > hi:
+			hi = seg[1]
+	if lo != hi:
+		yield segments.segment(lo, hi)
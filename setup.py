@@ -43,7 +43,8 @@ if set(('pytest', 'test', 'prt')).intersection(sys.argv):
 # define extension
 csegments = Extension(
     'segments.__segments',
-    ['src/segments.c', 'src/infinity.c', 'src/segment.c', 'src/segmentlist.c'],
+    ['src/segments.c', 'src/infinity.c', 'src/segment.c', 'src/segmentlist.c',
+     'src/segmentlistdict.c'],
     include_dirs=['src'],
 )
 
@@ -27,7 +27,9 @@
 
 
 #include <Python.h>
+#include <math.h>
 #include <stdlib.h>
+#include <string.h>
 
 
 #include <segments.h>
@@ -57,6 +59,121 @@ static int segments_SegmentList_Check(PyObject *obj)
 #endif
 
 
+/*
+ * Numeric boundaries.  When a boundary is an exact float or int whose
+ * value can be represented exactly as a double, or is one of the
+ * pre-allocated infinity instances, its value is unboxed into a C double
+ * and comparisons are done in C.  Comparing the doubles gives the same
+ * answer Python would give for the objects, so anything else (including
+ * NaN, IEEE infinities, very large ints and subclasses of float and int)
+ * is left to rich comparison.
+ */
+
+
+#define MAX_EXACT_INT (1LL << 53)
+#if PY_MAJOR_VERSION < 3
+#define Number_CheckExact(obj) (PyFloat_CheckExact(obj) || PyInt_CheckExact(obj) || PyLong_CheckExact(obj))
+#else
+#define Number_CheckExact(obj) (PyFloat_CheckExact(obj) || PyLong_CheckExact(obj))
+#endif
+
+
+static int unbox_bound(PyObject *obj, double *x)
+{
+	if(PyFloat_CheckExact(obj)) {
+		*x = PyFloat_AS_DOUBLE(obj);
+		return Py_IS_FINITE(*x);
+	}
+#if PY_MAJOR_VERSION < 3
+	if(PyInt_CheckExact(obj)) {
+		long v = PyInt_AS_LONG(obj);
+		if(v > MAX_EXACT_INT || v < -MAX_EXACT_INT)
+			return 0;
+		*x = (double) v;
+		return 1;
+	}
+#endif
+	if(PyLong_CheckExact(obj)) {
+		int overflow;
+		PY_LONG_LONG v = PyLong_AsLongLongAndOverflow(obj, &overflow);
+		if(overflow || v > MAX_EXACT_INT || v < -MAX_EXACT_INT)
+			return 0;
+		*x = (double) v;
+		return 1;
+	}
+	if(obj == (PyObject *) segments_PosInfinity) {
+		*x = HUGE_VAL;
+		return 1;
+	}
+	if(obj == (PyObject *) segments_NegInfinity) {
+		*x = -HUGE_VAL;
+		return 1;
+	}
+	return 0;
+}
+
+
+/* like PyObject_RichCompareBool() for two segment boundaries */
+
+static int compare_bounds(PyObject *a, PyObject *b, int op)
+{
+	double x, y;
+
+	if(!(unbox_bound(a, &x) && unbox_bound(b, &y)))
+		return PyObject_RichCompareBool(a, b, op);
+
+	switch(op) {
+	case Py_LT:
+		return x < y;
+	case Py_LE:
+		return x <= y;
+	case Py_EQ:
+		return x == y;
+	case Py_NE:
+		return x != y;
+	case Py_GT:
+		return x > y;
+	case Py_GE:
+		return x >= y;
+	}
+	return PyObject_RichCompareBool(a, b, op);
+}
+
+
+/*
+ * a < b for the items of a segmentlist and the things that get searched
+ * for in one.  Two segments are compared like tuples, a segment and
+ * anything else by comparing the segment's lower bound to it, which is
+ * what segment's rich comparison does.  When the scalar is on the left it
+ * must be a plain number, because infinity answers the comparison itself.
+ * Anything that can't be unboxed is done with rich comparison.
+ */
+
+static int less_than(PyObject *a, PyObject *b)
+{
+	double x, y;
+
+	if(a->ob_type == &segments_Segment_Type) {
+		PyObject *alo = PyTuple_GET_ITEM(a, 0);
+		if(b->ob_type == &segments_Segment_Type) {
+			PyObject *blo = PyTuple_GET_ITEM(b, 0);
+			if(unbox_bound(alo, &x) && unbox_bound(blo, &y)) {
+				if(x != y)
+					return x < y;
+				if(unbox_bound(PyTuple_GET_ITEM(a, 1), &x) && unbox_bound(PyTuple_GET_ITEM(b, 1), &y))
+					return x < y;
+			}
+		} else if(unbox_bound(alo, &x) && unbox_bound(b, &y))
+			return x < y;
+	} else if(b->ob_type == &segments_Segment_Type && Number_CheckExact(a)) {
+		if(unbox_bound(a, &x) && unbox_bound(PyTuple_GET_ITEM(b, 0), &y))
+			return x < y;
+	}
+
+	return PyObject_RichCompareBool(a, b, Py_LT);
+}
+
+
 /* copied from bisect.py */
 
 static Py_ssize_t bisect_left(PyObject *seglist, PyObject *seg, Py_ssize_t lo, Py_ssize_t hi)
@@ -77,7 +194,7 @@ static Py_ssize_t bisect_left(PyObject *seglist, PyObject *seg, Py_ssize_t lo, P
 		if(!item)
 			return -1;
 		Py_INCREF(item);
-		result = PyObject_RichCompareBool(item, seg, Py_LT);
+		result = less_than(item, seg);
 		Py_DECREF(item);
 		if(result < 0)
 			/* error */
@@ -114,7 +231,7 @@ static Py_ssize_t bisect_right(PyObject *seglist, PyObject *seg, Py_ssize_t lo,
 		if(!item)
 			return -1;
 		Py_INCREF(item);
-		result = PyObject_RichCompareBool(seg, item, Py_LT);
+		result = less_than(seg, item);
 		Py_DECREF(item);
 		if(result < 0)
 			/* error */
@@ -200,7 +317,7 @@ static PyObject *min(PyObject *a, PyObject *b)
 {
 	int result;
 
-	result = PyObject_RichCompareBool(a, b, Py_LT);
+	result = compare_bounds(a, b, Py_LT);
 	if(result < 0) {
 		Py_DECREF(a);
 		Py_DECREF(b);
@@ -219,7 +336,7 @@ static PyObject *max(PyObject *a, PyObject *b)
 {
 	int result;
 
-	result = PyObject_RichCompareBool(a, b, Py_GT);
+	result = compare_bounds(a, b, Py_GT);
 	if(result < 0) {
 		Py_DECREF(a);
 		Py_DECREF(b);
@@ -272,233 +389,989 @@ static PyListObject *segments_SegmentList_New(PyTypeObject *type, PyObject *sequ
 
 
 /*
- * Accessors
+ * Convert the boundaries of the segments in a list to an array of doubles
+ * in the order lo, hi, lo, hi, ....  The boundaries are converted with
+ * PyFloat_AsDouble(), so anything that can be converted to a float is
+ * accepted.  The return value must be freed with PyMem_Free().  Returns
+ * NULL on failure.
  */
 
 
-static PyObject *__abs__(PyObject *self)
+static double *as_doubles(PyObject *seglist, Py_ssize_t *n)
 {
+	double *bounds;
 	Py_ssize_t i;
-	PyObject *abs;
 
-#if PY_MAJOR_VERSION < 3
-	abs = PyInt_FromLong(0);
-#else
-	abs = PyLong_FromLong(0);
-#endif
-	if(!abs)
-		return NULL;
+	*n = PyList_GET_SIZE(seglist);
+	/* +1 so that empty lists don't cause a 0-byte allocation */
+	bounds = PyMem_New(double, 2 * *n + 1);
+	if(!bounds)
+		return (double *) PyErr_NoMemory();
 
-	for(i = 0; i < PyList_GET_SIZE(self); i++) {
-		PyObject *seg, *segsize, *newabs;
-		seg = PyList_GET_ITEM(self, i);
-		if(!seg) {
-			Py_DECREF(abs);
+	for(i = 0; i < *n; i++) {
+		PyObject *lo, *hi;
+		if(unpack(PyList_GET_ITEM(seglist, i), &lo, &hi)) {
+			PyMem_Free(bounds);
 			return NULL;
 		}
-		Py_INCREF(seg);
-		segsize = PyNumber_Absolute(seg);
-		Py_DECREF(seg);
-		if(!segsize) {
-			Py_DECREF(abs);
+		bounds[2 * i] = PyFloat_AsDouble(lo);
+		bounds[2 * i + 1] = PyFloat_AsDouble(hi);
+		Py_DECREF(lo);
+		Py_DECREF(hi);
+		if(PyErr_Occurred()) {
+			PyMem_Free(bounds);
 			return NULL;
 		}
-		newabs = PyNumber_InPlaceAdd(abs, segsize);
-		Py_DECREF(segsize);
-		Py_DECREF(abs);
-		abs = newabs;
-		if(!abs)
-			return NULL;
 	}
 
-	return abs;
+	return bounds;
 }
 
 
-static PyObject *extent(PyObject *self, PyObject *nul)
+/*
+ * Use numpy to convert obj to a C-contiguous array of doubles, and to
+ * allocate an uninitialized array of the same shape and of the given
+ * dtype for the output.  If pairs is not NULL, then a two-dimensional
+ * input with two columns is taken to be an array of (lo, hi) pairs, the
+ * output has one element per row, and *pairs is set to 1 (to 0
+ * otherwise).  The output array is returned, and the buffers of both
+ * arrays are returned in the views, which must be released with
+ * PyBuffer_Release().  Returns NULL on failure.  numpy is only imported
+ * when this is called, it is not required to build or import the module.
+ */
+
+
+static PyObject *numpy_buffers(PyObject *obj, Py_buffer *in, const char *dtype, Py_buffer *out, int *pairs)
 {
-	Py_ssize_t n = PyList_GET_SIZE(self);
-	Py_ssize_t i;
-	PyObject *lo, *hi;
+	PyObject *numpy = PyImport_ImportModule("numpy");
+	PyObject *array, *shape, *result;
+	int ndim, i;
 
-	if(n < 0)
+	if(!numpy)
 		return NULL;
-	if(n < 1) {
-		PyErr_SetString(PyExc_ValueError, "empty list");
+	array = PyObject_CallMethod(numpy, "asarray", "Oss", obj, "float64", "C");
+	if(!array) {
+		Py_DECREF(numpy);
 		return NULL;
 	}
-
-	if(unpack(PyList_GET_ITEM(self, 0), &lo, &hi))
+	/* the view holds a reference to the array */
+	i = PyObject_GetBuffer(array, in, PyBUF_C_CONTIGUOUS);
+	Py_DECREF(array);
+	if(i < 0) {
+		Py_DECREF(numpy);
 		return NULL;
+	}
 
-	for(i = 1; i < n; i++) {
-		PyObject *item_lo, *item_hi;
-
-		if(unpack(PyList_GET_ITEM(self, i), &item_lo, &item_hi)) {
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			return NULL;
-		}
-
-		lo = min(lo, item_lo);
-		if(!lo) {
-			Py_DECREF(hi);
-			Py_DECREF(item_hi);
-			return NULL;
+	ndim = in->ndim;
+	if(pairs) {
+		*pairs = ndim == 2 && in->shape[1] == 2;
+		if(*pairs)
+			ndim = 1;
+	}
+	shape = PyTuple_New(ndim);
+	for(i = 0; shape && i < ndim; i++) {
+		PyObject *dim = PyLong_FromSsize_t(in->shape[i]);
+		if(!dim) {
+			Py_CLEAR(shape);
+			break;
 		}
+		PyTuple_SET_ITEM(shape, i, dim);
+	}
+	result = shape ? PyObject_CallMethod(numpy, "empty", "Os", shape, dtype) : NULL;
+	Py_DECREF(numpy);
+	Py_XDECREF(shape);
+	if(!result) {
+		PyBuffer_Release(in);
+		return NULL;
+	}
 
-		hi = max(hi, item_hi);
-		if(!hi) {
-			Py_DECREF(lo);
-			Py_DECREF(item_lo);
-			return NULL;
-		}
+	if(PyObject_GetBuffer(result, out, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE) < 0) {
+		PyBuffer_Release(in);
+		Py_DECREF(result);
+		return NULL;
 	}
 
-	return make_segment(lo, hi);
+	return result;
 }
 
 
-static PyObject *find(PyObject *self, PyObject *item)
+/*
+ * Return the index of the first of the n sorted values a[0], a[stride],
+ * a[2 * stride], ... that is greater than x.  All values before index lo
+ * must be known to be <= x.  The search gallops forward from lo, so a
+ * sequence of searches for ascending values of x costs O(log d) each,
+ * where d is the distance moved, instead of O(log n).
+ */
+
+
+static Py_ssize_t gallop_right(const double *a, Py_ssize_t stride, Py_ssize_t lo, Py_ssize_t n, double x)
 {
-	Py_ssize_t n = PyList_GET_SIZE(self);
-	Py_ssize_t i;
+	Py_ssize_t hi = lo;
+	Py_ssize_t step = 1;
 
-	if(n < 0)
-		return NULL;
+	while(hi < n && a[hi * stride] <= x) {
+		lo = hi + 1;
+		hi += step;
+		step *= 2;
+	}
+	if(hi > n)
+		hi = n;
 
-	Py_INCREF(item);
-	for(i = 0; i < n; i++) {
-		Py_ssize_t result;
-		PyObject *seg = PyList_GET_ITEM(self, i);
-		Py_INCREF(seg);
-		result = PySequence_Contains(seg, item);
-		Py_DECREF(seg);
-		if(result < 0) {
-			Py_DECREF(item);
-			return NULL;
-		} else if(result > 0) {
-			Py_DECREF(item);
-			/* match found */
-#if PY_MAJOR_VERSION < 3
-			return PyInt_FromLong(i);
-#else
-			return PyLong_FromLong(i);
-#endif
-		}
+	while(lo < hi) {
+		Py_ssize_t mid = lo + (hi - lo) / 2;
+		if(a[mid * stride] <= x)
+			lo = mid + 1;
+		else
+			hi = mid;
 	}
-	Py_DECREF(item);
 
-	PyErr_SetObject(PyExc_ValueError, item);
-	return NULL;
+	return lo;
 }
 
 
 /*
- * Comparisons
+ * Unboxed segments.  A list whose items are all 2-tuples (segments) of
+ * numeric boundaries can be converted in one pass to an array of these,
+ * the algorithm run on the doubles, and segment objects built only for
+ * the output.  The object pointers are borrowed from the list being
+ * operated on:  lobj and hobj are the objects that will be used to build
+ * the output segment, and seg, if not NULL, is an item of the input whose
+ * boundaries are exactly lobj and hobj and so can be re-used as-is.
  */
 
 
-static PyObject *intersects(PyObject *self, PyObject *other)
-{
-	Py_ssize_t n_self = PyList_GET_SIZE(self);
-	Py_ssize_t n_other = PySequence_Size(other);
+struct numseg {
+	double lo, hi;
+	PyObject *lobj, *hobj;
 	PyObject *seg;
-	PyObject *lo;
-	PyObject *hi;
-	PyObject *olo;
-	PyObject *ohi;
-	int result;
-	Py_ssize_t i, j;
+};
 
-	if((n_self < 0) || (n_other < 0))
+
+/*
+ * Unbox the items of a list.  Returns the array, which must be freed with
+ * PyMem_Free(), or NULL.  If NULL is returned and no exception is set,
+ * then the list is not eligible for the numeric algorithms.
+ */
+
+static struct numseg *unbox_list(PyObject *seglist, Py_ssize_t extra)
+{
+	Py_ssize_t n = PyList_GET_SIZE(seglist);
+	struct numseg *segs;
+	Py_ssize_t i;
+
+	/* +1 so that empty lists don't cause a 0-byte allocation */
+	segs = PyMem_New(struct numseg, n + extra + 1);
+	if(!segs)
+		return (struct numseg *) PyErr_NoMemory();
+
+	for(i = 0; i < n; i++) {
+		PyObject *seg = PyList_GET_ITEM(seglist, i);
+		if(!PyTuple_Check(seg) || PyTuple_GET_SIZE(seg) != 2)
+			break;
+		segs[i].lobj = PyTuple_GET_ITEM(seg, 0);
+		segs[i].hobj = PyTuple_GET_ITEM(seg, 1);
+		if(!(unbox_bound(segs[i].lobj, &segs[i].lo) && unbox_bound(segs[i].hobj, &segs[i].hi)))
+			break;
+		segs[i].seg = seg;
+	}
+	if(i < n) {
+		PyMem_Free(segs);
 		return NULL;
-	if((n_self < 1) || (n_other < 1)) {
-		Py_INCREF(Py_False);
-		return Py_False;
 	}
 
-	i = j = 0;
+	return segs;
+}
 
-	if(unpack(PyList_GET_ITEM(self, 0), &lo, &hi))
-		return NULL;
-	seg = PySequence_GetItem(other, 0);
-	if(unpack(seg, &olo, &ohi)) {
-		Py_DECREF(lo);
-		Py_DECREF(hi);
-		Py_XDECREF(seg);
+
+/*
+ * Build a list from unboxed segments.  Returns a new reference or NULL on
+ * failure.
+ */
+
+static PyObject *box_list(const struct numseg *segs, Py_ssize_t n)
+{
+	PyObject *new = PyList_New(n);
+	Py_ssize_t i;
+
+	if(!new)
 		return NULL;
-	}
-	Py_DECREF(seg);
 
-	while(1) {
-		if((result = PyObject_RichCompareBool(hi, olo, Py_LE)) < 0) {
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			return NULL;
-		} else if(result > 0) {
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			if(++i >= n_self) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				Py_INCREF(Py_False);
-				return Py_False;
-			}
-			if(unpack(PyList_GET_ITEM(self, i), &lo, &hi)) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				return NULL;
-			}
-		} else if((result = PyObject_RichCompareBool(ohi, lo, Py_LE)) < 0) {
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			return NULL;
-		} else if(result > 0) {
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			if(++j >= n_other) {
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				Py_INCREF(Py_False);
-				return Py_False;
-			}
-			seg = PySequence_GetItem(other, j);
-			if(unpack(seg, &olo, &ohi)) {
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				Py_XDECREF(seg);
+	for(i = 0; i < n; i++) {
+		PyObject *seg = segs[i].seg;
+		if(seg)
+			Py_INCREF(seg);
+		else {
+			Py_INCREF(segs[i].lobj);
+			Py_INCREF(segs[i].hobj);
+			seg = make_segment(segs[i].lobj, segs[i].hobj);
+			if(!seg) {
+				Py_DECREF(new);
 				return NULL;
 			}
-			Py_DECREF(seg);
-		} else {
-			/* self[i] and other[j] intersect */
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			Py_INCREF(Py_True);
-			return Py_True;
 		}
+		PyList_SET_ITEM(new, i, seg);
 	}
+
+	return new;
 }
 
 
-static PyObject *intersects_segment(PyObject *self, PyObject *other)
+/* replace the contents of a list with the unboxed segments */
+
+static int replace_list(PyObject *seglist, const struct numseg *segs, Py_ssize_t n)
 {
-	Py_ssize_t i = bisect_left(self, other, -1, -1);
-	PyObject *a = NULL, *b = NULL;
+	PyObject *new = box_list(segs, n);
 	int result;
 
-	if(i < 0)
-		/* error */
-		return NULL;
-
-	if(i != 0) {
+	if(!new)
+		return -1;
+	result = PyList_SetSlice(seglist, 0, PyList_GET_SIZE(seglist), new);
+	Py_DECREF(new);
+	return result;
+}
+
+
+/*
+ * Releasing the GIL.  The numeric kernels below do not use the Python API,
+ * so for long lists they are run with the GIL released, letting other
+ * threads run, including ones doing arithmetic on other segmentlists.  The
+ * unboxed segments borrow their objects from the lists, which other
+ * threads could modify in the meantime, so references to the items of the
+ * lists are held until the result has been boxed.
+ */
+
+
+#define NOGIL_MIN_SEGMENTS 1024
+
+
+struct nogil {
+	PyThreadState *save;
+	PyObject *keep[2];
+};
+
+
+/*
+ * Release the GIL if the lists a and b (which may be NULL) have at least
+ * NOGIL_MIN_SEGMENTS segments between them.  Returns 0 on success, -1 on
+ * failure.
+ */
+
+static int nogil_begin(struct nogil *state, PyObject *a, PyObject *b)
+{
+	PyObject *lists[2];
+	int i;
+
+	lists[0] = a;
+	lists[1] = b;
+	state->save = NULL;
+	state->keep[0] = state->keep[1] = NULL;
+	if(PyList_GET_SIZE(a) + (b ? PyList_GET_SIZE(b) : 0) < NOGIL_MIN_SEGMENTS)
+		return 0;
+	for(i = 0; i < 2 && lists[i]; i++) {
+		state->keep[i] = PyList_GetSlice(lists[i], 0, PyList_GET_SIZE(lists[i]));
+		if(!state->keep[i]) {
+			Py_CLEAR(state->keep[0]);
+			return -1;
+		}
+	}
+	state->save = PyEval_SaveThread();
+	return 0;
+}
+
+
+/* re-acquire the GIL, if nogil_begin() released it */
+
+static void nogil_end(struct nogil *state)
+{
+	if(state->save)
+		PyEval_RestoreThread(state->save);
+	state->save = NULL;
+}
+
+
+/* release the references held by nogil_begin(), once the result is boxed */
+
+static void nogil_clear(struct nogil *state)
+{
+	Py_CLEAR(state->keep[0]);
+	Py_CLEAR(state->keep[1]);
+}
+
+
+/*
+ * Stable sort of unboxed segments by (lo, hi), which is the order
+ * PyList_Sort() puts segments in.  A natural merge sort:  the ascending
+ * runs already present in the input are found and merged pairwise until
+ * one is left, so concatenations of sorted lists, which is what the union
+ * operations produce, are sorted in a pass or two.  Does not require the
+ * GIL, so uses malloc() and does not set an exception.  Returns 0 on
+ * success, -1 if out of memory.
+ */
+
+
+static int numseg_less(const struct numseg *a, const struct numseg *b)
+{
+	return a->lo < b->lo || (a->lo == b->lo && a->hi < b->hi);
+}
+
+
+static int sort_segs(struct numseg *segs, Py_ssize_t n)
+{
+	struct numseg *a = segs, *b, *tmp;
+	Py_ssize_t *runs;
+	Py_ssize_t nruns, i, r;
+
+	/* +2 so that there is always room for the end of the last run */
+	runs = malloc((n + 2) * sizeof(*runs));
+	if(!runs)
+		return -1;
+	runs[0] = 0;
+	for(i = 1, nruns = 1; i < n; i++)
+		if(numseg_less(&segs[i], &segs[i - 1]))
+			runs[nruns++] = i;
+	runs[nruns] = n;
+	if(nruns < 2) {
+		/* already sorted */
+		free(runs);
+		return 0;
+	}
+
+	b = malloc(n * sizeof(*b));
+	if(!b) {
+		free(runs);
+		return -1;
+	}
+
+	while(nruns > 1) {
+		for(r = 0; r < nruns; r += 2) {
+			Py_ssize_t l = runs[r], lend = runs[r + 1];
+			Py_ssize_t rr = lend, rend = r + 2 <= nruns ? runs[r + 2] : lend;
+			Py_ssize_t k = l;
+			while(l < lend && rr < rend)
+				b[k++] = numseg_less(&a[rr], &a[l]) ? a[rr++] : a[l++];
+			while(l < lend)
+				b[k++] = a[l++];
+			while(rr < rend)
+				b[k++] = a[rr++];
+			runs[r / 2] = runs[r];
+		}
+		nruns = (nruns + 1) / 2;
+		runs[nruns] = n;
+		tmp = a;
+		a = b;
+		b = tmp;
+	}
+	if(a != segs) {
+		memcpy(segs, a, n * sizeof(*segs));
+		b = a;
+	}
+
+	free(b);
+	free(runs);
+	return 0;
+}
+
+
+/*
+ * Merge the sorted unboxed segments a and b into out, which must have
+ * room for na + nb segments.  The merge is stable, so it puts segments in
+ * the same order as PyList_Sort() would after extending a with b.
+ */
+
+static void merge_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct numseg *out)
+{
+	Py_ssize_t i = 0, j = 0, k = 0;
+
+	while(i < na && j < nb)
+		out[k++] = numseg_less(&b[j], &a[i]) ? b[j++] : a[i++];
+	while(i < na)
+		out[k++] = a[i++];
+	while(j < nb)
+		out[k++] = b[j++];
+}
+
+
+/*
+ * Return the index of the first of the unboxed segments at or after i
+ * whose upper bound is greater than x, galloping forward from i like
+ * gallop_right().
+ */
+
+static Py_ssize_t gallop_segs(const struct numseg *segs, Py_ssize_t i, Py_ssize_t n, double x)
+{
+	Py_ssize_t lo = i, hi = i;
+	Py_ssize_t step = 1;
+
+	while(hi < n && segs[hi].hi <= x) {
+		lo = hi + 1;
+		hi += step;
+		step *= 2;
+	}
+	if(hi > n)
+		hi = n;
+
+	while(lo < hi) {
+		Py_ssize_t mid = lo + (hi - lo) / 2;
+		if(segs[mid].hi <= x)
+			lo = mid + 1;
+		else
+			hi = mid;
+	}
+
+	return lo;
+}
+
+
+/*
+ * Intersect the coalesced unboxed segments a and b, writing the result to
+ * out, which must have room for na + nb segments.  Segments of a that are
+ * not cut are kept, and where boundaries are equal a's are used, as in
+ * the generic algorithm.  Returns the length of the result.
+ */
+
+static Py_ssize_t intersect_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct numseg *out)
+{
+	Py_ssize_t i = 0, j = 0, k = 0;
+
+	while(i < na && j < nb) {
+		i = gallop_segs(a, i, na, b[j].lo);
+		if(i >= na)
+			break;
+		j = gallop_segs(b, j, nb, a[i].lo);
+		if(j >= nb)
+			break;
+		if(a[i].hi <= b[j].lo)
+			continue;
+		out[k] = a[i];
+		if(b[j].lo > a[i].lo) {
+			out[k].lo = b[j].lo;
+			out[k].lobj = b[j].lobj;
+			out[k].seg = NULL;
+		}
+		if(b[j].hi < a[i].hi) {
+			out[k].hi = b[j].hi;
+			out[k].hobj = b[j].hobj;
+			out[k].seg = NULL;
+			j++;
+		} else
+			i++;
+		k++;
+	}
+
+	return k;
+}
+
+
+/*
+ * Coalesce sorted unboxed segments in place, following the same steps as
+ * the generic algorithm so that the same boundary objects are kept.
+ * Returns the new length.
+ */
+
+static Py_ssize_t coalesce_segs(struct numseg *segs, Py_ssize_t n)
+{
+	Py_ssize_t i, j;
+
+	for(i = j = 0; j < n; ) {
+		struct numseg cur = segs[j++];
+		while(j < n && cur.hi >= segs[j].lo) {
+			if(!(cur.hi > segs[j].hi)) {
+				cur.hi = segs[j].hi;
+				cur.hobj = segs[j].hobj;
+				cur.seg = NULL;
+			}
+			j++;
+		}
+		if(cur.lo != cur.hi) {
+			if(cur.seg && cur.seg->ob_type != &segments_Segment_Type)
+				/* the generic algorithm always makes a new
+				 * segment, so only re-use segments */
+				cur.seg = NULL;
+			segs[i++] = cur;
+		}
+	}
+
+	return i;
+}
+
+
+/*
+ * Subtract the unboxed segments b from a, writing the result to out,
+ * which must have room for na + nb segments.  Follows the same steps as
+ * the generic algorithm.  Returns the length of the result.
+ */
+
+static Py_ssize_t subtract_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct numseg *out)
+{
+	Py_ssize_t i, j, k;
+
+	for(i = j = k = 0; i < na; i++) {
+		struct numseg cur = a[i];
+		while(1) {
+			while(j < nb && b[j].hi <= cur.lo)
+				j++;
+			if(j >= nb || cur.hi <= b[j].lo) {
+				out[k++] = cur;
+				break;
+			}
+			if(b[j].lo > cur.lo) {
+				/* the part of cur before b[j] */
+				out[k] = cur;
+				out[k].hi = b[j].lo;
+				out[k].hobj = b[j].lobj;
+				out[k++].seg = NULL;
+			}
+			if(!(b[j].hi < cur.hi))
+				break;
+			/* continue with the part of cur after b[j] */
+			cur.lo = b[j].hi;
+			cur.lobj = b[j].hobj;
+			cur.seg = NULL;
+		}
+	}
+
+	return k;
+}
+
+
+/*
+ * The total durations of the results of the above, without building them.
+ * The same steps are followed, and the durations of the segments summed
+ * in the same order, as for __abs__() on the result, so if the boundaries
+ * are all floats or all ints the result is identical.  Sums of ints are
+ * done in integers:  the boundaries are at most 2^53 in magnitude, so the
+ * total duration of disjoint segments fits.
+ */
+
+
+#define KIND_FLOATS 1
+#define KIND_INTS 2
+#define KIND_OTHER 4
+
+
+/* the OR of the kinds of the boundaries of unboxed segments */
+
+static int numseg_kinds(const struct numseg *segs, Py_ssize_t n)
+{
+	int kinds = 0;
+	Py_ssize_t i;
+
+	for(i = 0; i < n; i++) {
+		PyObject *bounds[2];
+		int k;
+		bounds[0] = segs[i].lobj;
+		bounds[1] = segs[i].hobj;
+		for(k = 0; k < 2; k++) {
+			if(PyFloat_CheckExact(bounds[k]))
+				kinds |= KIND_FLOATS;
+#if PY_MAJOR_VERSION < 3
+			else if(PyInt_CheckExact(bounds[k]) || PyLong_CheckExact(bounds[k]))
+#else
+			else if(PyLong_CheckExact(bounds[k]))
+#endif
+				kinds |= KIND_INTS;
+			else
+				kinds |= KIND_OTHER;
+		}
+	}
+
+	return kinds;
+}
+
+
+struct duration {
+	int ints;
+	Py_ssize_t count;
+	double x;
+	PY_LONG_LONG n;
+};
+
+
+static void duration_add(struct duration *total, double lo, double hi)
+{
+	if(total->ints)
+		total->n += (PY_LONG_LONG) hi - (PY_LONG_LONG) lo;
+	else
+		total->x += hi - lo;
+	total->count++;
+}
+
+
+/* box the total, which is 0 if nothing was added, like sum() */
+
+static PyObject *duration_box(const struct duration *total)
+{
+	if(!total->count) {
+#if PY_MAJOR_VERSION < 3
+		return PyInt_FromLong(0);
+#else
+		return PyLong_FromLong(0);
+#endif
+	}
+	if(total->ints)
+		return PyLong_FromLongLong(total->n);
+	return PyFloat_FromDouble(total->x);
+}
+
+
+/* as intersect_segs() */
+
+static void intersection_duration_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct duration *total)
+{
+	Py_ssize_t i = 0, j = 0;
+
+	while(i < na && j < nb) {
+		double lo, hi;
+		i = gallop_segs(a, i, na, b[j].lo);
+		if(i >= na)
+			break;
+		j = gallop_segs(b, j, nb, a[i].lo);
+		if(j >= nb)
+			break;
+		if(a[i].hi <= b[j].lo)
+			continue;
+		lo = b[j].lo > a[i].lo ? b[j].lo : a[i].lo;
+		if(b[j].hi < a[i].hi)
+			hi = b[j++].hi;
+		else
+			hi = a[i++].hi;
+		duration_add(total, lo, hi);
+	}
+}
+
+
+/* as merge_segs() followed by coalesce_segs() */
+
+static void union_duration_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct duration *total)
+{
+	Py_ssize_t i = 0, j = 0;
+	double lo = 0., hi = 0.;
+	int started = 0;
+
+	while(i < na || j < nb) {
+		const struct numseg *next = j >= nb || (i < na && !numseg_less(&b[j], &a[i])) ? &a[i++] : &b[j++];
+		if(started && hi >= next->lo) {
+			if(!(hi > next->hi))
+				hi = next->hi;
+			continue;
+		}
+		if(started && lo != hi)
+			duration_add(total, lo, hi);
+		lo = next->lo;
+		hi = next->hi;
+		started = 1;
+	}
+	if(started && lo != hi)
+		duration_add(total, lo, hi);
+}
+
+
+/* as subtract_segs() */
+
+static void difference_duration_segs(const struct numseg *a, Py_ssize_t na, const struct numseg *b, Py_ssize_t nb, struct duration *total)
+{
+	Py_ssize_t i, j;
+
+	for(i = j = 0; i < na; i++) {
+		double lo = a[i].lo, hi = a[i].hi;
+		while(1) {
+			while(j < nb && b[j].hi <= lo)
+				j++;
+			if(j >= nb || hi <= b[j].lo) {
+				duration_add(total, lo, hi);
+				break;
+			}
+			if(b[j].lo > lo)
+				duration_add(total, lo, b[j].lo);
+			if(!(b[j].hi < hi))
+				break;
+			lo = b[j].hi;
+		}
+	}
+}
+
+
+/*
+ * Accessors
+ */
+
+
+static PyObject *__abs__(PyObject *self)
+{
+	Py_ssize_t i;
+	PyObject *abs;
+
+#if PY_MAJOR_VERSION < 3
+	abs = PyInt_FromLong(0);
+#else
+	abs = PyLong_FromLong(0);
+#endif
+	if(!abs)
+		return NULL;
+
+	for(i = 0; i < PyList_GET_SIZE(self); i++) {
+		PyObject *seg, *segsize, *newabs;
+		seg = PyList_GET_ITEM(self, i);
+		if(!seg) {
+			Py_DECREF(abs);
+			return NULL;
+		}
+		Py_INCREF(seg);
+		segsize = PyNumber_Absolute(seg);
+		Py_DECREF(seg);
+		if(!segsize) {
+			Py_DECREF(abs);
+			return NULL;
+		}
+		newabs = PyNumber_InPlaceAdd(abs, segsize);
+		Py_DECREF(segsize);
+		Py_DECREF(abs);
+		abs = newabs;
+		if(!abs)
+			return NULL;
+	}
+
+	return abs;
+}
+
+
+static PyObject *extent(PyObject *self, PyObject *nul)
+{
+	Py_ssize_t n = PyList_GET_SIZE(self);
+	Py_ssize_t i;
+	PyObject *lo, *hi;
+
+	if(n < 0)
+		return NULL;
+	if(n < 1) {
+		PyErr_SetString(PyExc_ValueError, "empty list");
+		return NULL;
+	}
+
+	if(unpack(PyList_GET_ITEM(self, 0), &lo, &hi))
+		return NULL;
+
+	for(i = 1; i < n; i++) {
+		PyObject *item_lo, *item_hi;
+
+		if(unpack(PyList_GET_ITEM(self, i), &item_lo, &item_hi)) {
+			Py_DECREF(lo);
+			Py_DECREF(hi);
+			return NULL;
+		}
+
+		lo = min(lo, item_lo);
+		if(!lo) {
+			Py_DECREF(hi);
+			Py_DECREF(item_hi);
+			return NULL;
+		}
+
+		hi = max(hi, item_hi);
+		if(!hi) {
+			Py_DECREF(lo);
+			Py_DECREF(item_lo);
+			return NULL;
+		}
+	}
+
+	return make_segment(lo, hi);
+}
+
+
+static PyObject *find(PyObject *self, PyObject *item)
+{
+	Py_ssize_t n = PyList_GET_SIZE(self);
+	Py_ssize_t i;
+
+	if(n < 0)
+		return NULL;
+
+	Py_INCREF(item);
+	for(i = 0; i < n; i++) {
+		Py_ssize_t result;
+		PyObject *seg = PyList_GET_ITEM(self, i);
+		Py_INCREF(seg);
+		result = PySequence_Contains(seg, item);
+		Py_DECREF(seg);
+		if(result < 0) {
+			Py_DECREF(item);
+			return NULL;
+		} else if(result > 0) {
+			Py_DECREF(item);
+			/* match found */
+#if PY_MAJOR_VERSION < 3
+			return PyInt_FromLong(i);
+#else
+			return PyLong_FromLong(i);
+#endif
+		}
+	}
+	Py_DECREF(item);
+
+	PyErr_SetObject(PyExc_ValueError, item);
+	return NULL;
+}
+
+
+static PyObject *find_many(PyObject *self, PyObject *items)
+{
+	Py_buffer in, out;
+	PyObject *result;
+	double *bounds;
+	const double *t;
+	Py_ssize_t *index;
+	Py_ssize_t n, m;
+	Py_ssize_t i, k;
+	int pairs;
+
+	bounds = as_doubles(self, &n);
+	if(!bounds)
+		return NULL;
+	result = numpy_buffers(items, &in, "intp", &out, &pairs);
+	if(!result) {
+		PyMem_Free(bounds);
+		return NULL;
+	}
+
+	t = in.buf;
+	index = out.buf;
+	m = in.len / sizeof(*t);
+	if(pairs) {
+		double last = 0.;
+		for(i = k = 0; k < m; k += 2) {
+			double lo = t[k] <= t[k + 1] ? t[k] : t[k + 1];
+			double hi = t[k] <= t[k + 1] ? t[k + 1] : t[k];
+			/* if the segments are in order, continue the
+			 * search from where the last one left off */
+			if(k && !(lo >= last))
+				i = 0;
+			last = lo;
+			i = gallop_right(bounds, 2, i, n, lo);
+			index[k / 2] = i > 0 && hi <= bounds[2 * i - 1] ? i - 1 : -1;
+		}
+	} else {
+		for(i = k = 0; k < m; k++) {
+			if(k && !(t[k] >= t[k - 1]))
+				i = 0;
+			i = gallop_right(bounds, 2, i, n, t[k]);
+			index[k] = i > 0 && t[k] < bounds[2 * i - 1] ? i - 1 : -1;
+		}
+	}
+
+	PyBuffer_Release(&in);
+	PyBuffer_Release(&out);
+	PyMem_Free(bounds);
+
+	return result;
+}
+
+
+/*
+ * Comparisons
+ */
+
+
+static PyObject *intersects(PyObject *self, PyObject *other)
+{
+	Py_ssize_t n_self = PyList_GET_SIZE(self);
+	Py_ssize_t n_other = PySequence_Size(other);
+	PyObject *seg;
+	PyObject *lo;
+	PyObject *hi;
+	PyObject *olo;
+	PyObject *ohi;
+	int result;
+	Py_ssize_t i, j;
+
+	if((n_self < 0) || (n_other < 0))
+		return NULL;
+	if((n_self < 1) || (n_other < 1)) {
+		Py_INCREF(Py_False);
+		return Py_False;
+	}
+
+	i = j = 0;
+
+	if(unpack(PyList_GET_ITEM(self, 0), &lo, &hi))
+		return NULL;
+	seg = PySequence_GetItem(other, 0);
+	if(unpack(seg, &olo, &ohi)) {
+		Py_DECREF(lo);
+		Py_DECREF(hi);
+		Py_XDECREF(seg);
+		return NULL;
+	}
+	Py_DECREF(seg);
+
+	while(1) {
+		if((result = PyObject_RichCompareBool(hi, olo, Py_LE)) < 0) {
+			Py_DECREF(lo);
+			Py_DECREF(hi);
+			Py_DECREF(olo);
+			Py_DECREF(ohi);
+			return NULL;
+		} else if(result > 0) {
+			Py_DECREF(lo);
+			Py_DECREF(hi);
+			if(++i >= n_self) {
+				Py_DECREF(olo);
+				Py_DECREF(ohi);
+				Py_INCREF(Py_False);
+				return Py_False;
+			}
+			if(unpack(PyList_GET_ITEM(self, i), &lo, &hi)) {
+				Py_DECREF(olo);
+				Py_DECREF(ohi);
+				return NULL;
+			}
+		} else if((result = PyObject_RichCompareBool(ohi, lo, Py_LE)) < 0) {
+			Py_DECREF(lo);
+			Py_DECREF(hi);
+			Py_DECREF(olo);
+			Py_DECREF(ohi);
+			return NULL;
+		} else if(result > 0) {
+			Py_DECREF(olo);
+			Py_DECREF(ohi);
+			if(++j >= n_other) {
+				Py_DECREF(lo);
+				Py_DECREF(hi);
+				Py_INCREF(Py_False);
+				return Py_False;
+			}
+			seg = PySequence_GetItem(other, j);
+			if(unpack(seg, &olo, &ohi)) {
+				Py_DECREF(lo);
+				Py_DECREF(hi);
+				Py_XDECREF(seg);
+				return NULL;
+			}
+			Py_DECREF(seg);
+		} else {
+			/* self[i] and other[j] intersect */
+			Py_DECREF(lo);
+			Py_DECREF(hi);
+			Py_DECREF(olo);
+			Py_DECREF(ohi);
+			Py_INCREF(Py_True);
+			return Py_True;
+		}
+	}
+}
+
+
+static PyObject *intersects_segment(PyObject *self, PyObject *other)
+{
+	Py_ssize_t i = bisect_left(self, other, -1, -1);
+	PyObject *a = NULL, *b = NULL;
+	int result;
+
+	if(i < 0)
+		/* error */
+		return NULL;
+
+	if(i != 0) {
 		if(unpack(other, &a, NULL) || unpack(PyList_GET_ITEM(self, i - 1), NULL, &b)) {
 			Py_XDECREF(a);
 			Py_XDECREF(b);
@@ -585,18 +1458,98 @@ static int __contains__(PyObject *self, PyObject *other)
 }
 
 
+static PyObject *contains_many(PyObject *self, PyObject *times)
+{
+	Py_buffer in, out;
+	PyObject *result;
+	double *bounds;
+	const double *t;
+	char *mask;
+	Py_ssize_t n, m;
+	Py_ssize_t i, k;
+
+	bounds = as_doubles(self, &n);
+	if(!bounds)
+		return NULL;
+	result = numpy_buffers(times, &in, "bool", &out, NULL);
+	if(!result) {
+		PyMem_Free(bounds);
+		return NULL;
+	}
+
+	t = in.buf;
+	mask = out.buf;
+	m = in.len / sizeof(*t);
+	for(i = k = 0; k < m; k++) {
+		/* if the times are in order, continue the search from
+		 * where the last one left off */
+		if(k && !(t[k] >= t[k - 1]))
+			i = 0;
+		i = gallop_right(bounds, 2, i, n, t[k]);
+		mask[k] = i > 0 && t[k] < bounds[2 * i - 1];
+	}
+
+	PyBuffer_Release(&in);
+	PyBuffer_Release(&out);
+	PyMem_Free(bounds);
+
+	return result;
+}
+
+
 /*
  * Coalesce
  */
 
 
-static PyObject *coalesce(PyObject *self, PyObject *nul)
+static PyObject *coalesce(PyObject *self, PyObject *args, PyObject *kwds)
 {
+	static char *kwlist[] = {"parallel", NULL};
+	PyObject *parallel = Py_None;
 	PyObject *lo, *hi;
+	struct numseg *segs;
 	int result;
 	Py_ssize_t i, j;
 	Py_ssize_t n;
 
+	if(!PyArg_ParseTupleAndKeywords(args, kwds, "|O:coalesce", kwlist, &parallel))
+		return NULL;
+	if(parallel != Py_None) {
+		/* the chunking and threads are done in Python */
+		PyObject *module = PyImport_ImportModule("segments.segments");
+		PyObject *new;
+		if(!module)
+			return NULL;
+		new = PyObject_CallMethod(module, "_coalesce_parallel", "OO", self, parallel);
+		Py_DECREF(module);
+		return new;
+	}
+
+	/* fast path for numeric boundaries */
+	segs = unbox_list(self, 0);
+	if(segs) {
+		struct nogil nogil;
+		n = PyList_GET_SIZE(self);
+		result = nogil_begin(&nogil, self, NULL);
+		if(!result) {
+			result = sort_segs(segs, n);
+			if(!result)
+				n = coalesce_segs(segs, n);
+			nogil_end(&nogil);
+			if(result < 0)
+				PyErr_NoMemory();
+			else
+				result = replace_list(self, segs, n);
+			nogil_clear(&nogil);
+		}
+		PyMem_Free(segs);
+		if(result < 0)
+			return NULL;
+		Py_INCREF(self);
+		return self;
+	} else if(PyErr_Occurred())
+		return NULL;
+
 	if(PyList_Sort(self) < 0)
 		return NULL;
 
@@ -617,7 +1570,7 @@ static PyObject *coalesce(PyObject *self, PyObject *nul)
 				Py_DECREF(hi);
 				return NULL;
 			}
-			result = PyObject_RichCompareBool(hi, a, Py_GE);
+			result = compare_bounds(hi, a, Py_GE);
 			Py_DECREF(a);
 			if(result < 0) {
 				Py_DECREF(lo);
@@ -637,7 +1590,7 @@ static PyObject *coalesce(PyObject *self, PyObject *nul)
 			}
 		}
 
-		if((result = PyObject_RichCompareBool(lo, hi, Py_NE)) < 0) {
+		if((result = compare_bounds(lo, hi, Py_NE)) < 0) {
 			Py_DECREF(lo);
 			Py_DECREF(hi);
 			return NULL;
@@ -658,56 +1611,387 @@ static PyObject *coalesce(PyObject *self, PyObject *nul)
 
 	}
 
-	if(PyList_SetSlice(self, i, n, NULL) < 0)
-		return NULL;
-
-	Py_INCREF(self);
-	return self;
+	if(PyList_SetSlice(self, i, n, NULL) < 0)
+		return NULL;
+
+	Py_INCREF(self);
+	return self;
+}
+
+
+/*
+ * Arithmetic
+ */
+
+
+/*
+ * Advance *i to the index of the first segment at or after *i whose upper
+ * bound is greater than x, galloping forward like gallop_right().
+ * Returns 0 on success, -1 on failure.
+ */
+
+static int gallop_list(PyObject *seglist, Py_ssize_t *i, PyObject *x)
+{
+	Py_ssize_t lo = *i, hi = *i;
+	Py_ssize_t step = 1;
+
+	while(1) {
+		PyObject *seg_hi;
+		int result;
+		if(hi >= PyList_GET_SIZE(seglist))
+			break;
+		if(unpack(PyList_GET_ITEM(seglist, hi), NULL, &seg_hi))
+			return -1;
+		result = compare_bounds(seg_hi, x, Py_LE);
+		Py_DECREF(seg_hi);
+		if(result < 0)
+			return -1;
+		else if(!result)
+			break;
+		lo = hi + 1;
+		hi += step;
+		step *= 2;
+	}
+
+	while(lo < hi) {
+		Py_ssize_t mid = lo + (hi - lo) / 2;
+		PyObject *seg_hi;
+		int result;
+		if(mid >= PyList_GET_SIZE(seglist)) {
+			hi = mid;
+			continue;
+		}
+		if(unpack(PyList_GET_ITEM(seglist, mid), NULL, &seg_hi))
+			return -1;
+		result = compare_bounds(seg_hi, x, Py_LE);
+		Py_DECREF(seg_hi);
+		if(result < 0)
+			return -1;
+		else if(result)
+			lo = mid + 1;
+		else
+			hi = mid;
+	}
+
+	*i = lo;
+	return 0;
+}
+
+
+/*
+ * The intersection of two coalesced lists of segments.  The segments of
+ * each list that lie between those of the other are skipped over by
+ * galloping, so this is O(n + m), and O(m log n) for m << n.  Segments of
+ * a that are not cut are kept, and where boundaries are equal a's are
+ * used, which is what self -= ~other used to do.  When the lists are of
+ * similar size and their boundaries are numeric the work is done on
+ * unboxed segments.  Returns a new list or NULL on failure.
+ */
+
+static PyObject *intersection(PyObject *a, PyObject *b)
+{
+	PyObject *new;
+	PyObject *seg = NULL, *lo = NULL, *hi = NULL, *b_lo = NULL, *b_hi = NULL;
+	Py_ssize_t n = PyList_GET_SIZE(a), m = PyList_GET_SIZE(b);
+	Py_ssize_t i = 0, j = 0;
+
+	/* fast path for numeric boundaries.  unboxing is O(n + m), so not
+	 * worth it when one list is much shorter than the other */
+	if(n < 16 * (m + 1) && m < 16 * (n + 1)) {
+		struct numseg *x, *y, *out;
+
+		x = unbox_list(a, 0);
+		if(!x && PyErr_Occurred())
+			return NULL;
+		y = x ? unbox_list(b, 0) : NULL;
+		if(!y && PyErr_Occurred()) {
+			PyMem_Free(x);
+			return NULL;
+		}
+		if(x && y) {
+			struct nogil nogil;
+			out = PyMem_New(struct numseg, n + m + 1);
+			if(!out)
+				new = PyErr_NoMemory();
+			else if(nogil_begin(&nogil, a, b) < 0)
+				new = NULL;
+			else {
+				Py_ssize_t k = intersect_segs(x, n, y, m, out);
+				nogil_end(&nogil);
+				new = box_list(out, k);
+				nogil_clear(&nogil);
+			}
+			PyMem_Free(x);
+			PyMem_Free(y);
+			PyMem_Free(out);
+			return new;
+		}
+		PyMem_Free(x);
+	}
+
+	new = PyList_New(0);
+	if(!new)
+		return NULL;
+
+	while(i < PyList_GET_SIZE(a) && j < PyList_GET_SIZE(b)) {
+		int result;
+
+		if(unpack(PyList_GET_ITEM(b, j), &b_lo, NULL))
+			goto error;
+		result = gallop_list(a, &i, b_lo);
+		Py_CLEAR(b_lo);
+		if(result < 0)
+			goto error;
+		if(i >= PyList_GET_SIZE(a))
+			break;
+		seg = PyList_GET_ITEM(a, i);
+		Py_INCREF(seg);
+		if(unpack(seg, &lo, &hi) || gallop_list(b, &j, lo) < 0)
+			goto error;
+		if(j >= PyList_GET_SIZE(b)) {
+			Py_CLEAR(seg);
+			Py_CLEAR(lo);
+			Py_CLEAR(hi);
+			break;
+		}
+		if(unpack(PyList_GET_ITEM(b, j), &b_lo, &b_hi))
+			goto error;
+
+		if((result = compare_bounds(hi, b_lo, Py_LE)) < 0)
+			goto error;
+		else if(result > 0) {
+			/* no overlap, keep galloping */
+			Py_CLEAR(seg);
+			Py_CLEAR(lo);
+			Py_CLEAR(hi);
+			Py_CLEAR(b_lo);
+			Py_CLEAR(b_hi);
+			continue;
+		}
+		if((result = compare_bounds(b_lo, lo, Py_GT)) < 0)
+			goto error;
+		else if(result > 0) {
+			Py_DECREF(lo);
+			lo = b_lo;
+			b_lo = NULL;
+			Py_CLEAR(seg);
+		}
+		if((result = compare_bounds(b_hi, hi, Py_LT)) < 0)
+			goto error;
+		else if(result > 0) {
+			Py_DECREF(hi);
+			hi = b_hi;
+			b_hi = NULL;
+			Py_CLEAR(seg);
+			j++;
+		} else
+			i++;
+
+		if(seg)
+			result = PyList_Append(new, seg);
+		else {
+			seg = make_segment(lo, hi);
+			lo = hi = NULL;
+			result = seg ? PyList_Append(new, seg) : -1;
+		}
+		Py_CLEAR(seg);
+		Py_CLEAR(lo);
+		Py_CLEAR(hi);
+		Py_CLEAR(b_lo);
+		Py_CLEAR(b_hi);
+		if(result < 0)
+			goto error;
+	}
+
+	return new;
+
+error:
+	Py_XDECREF(seg);
+	Py_XDECREF(lo);
+	Py_XDECREF(hi);
+	Py_XDECREF(b_lo);
+	Py_XDECREF(b_hi);
+	Py_DECREF(new);
+	return NULL;
+}
+
+
+static PyObject *__iand__(PyObject *self, PyObject *other)
+{
+	PyObject *new;
+	int result;
+
+	/* don't iterate over the same object twice */
+	if(other == self) {
+		Py_INCREF(self);
+		return self;
+	}
+
+	other = PySequence_List(other);
+	if(!other)
+		return NULL;
+	new = intersection(self, other);
+	Py_DECREF(other);
+	if(!new)
+		return NULL;
+	result = PyList_SetSlice(self, 0, PyList_GET_SIZE(self), new);
+	Py_DECREF(new);
+	if(result < 0)
+		return NULL;
+
+	Py_INCREF(self);
+	return self;
+}
+
+
+static PyObject *__and__(PyObject *self, PyObject *other)
+{
+	PyObject *new = NULL;
+	PyObject *result;
+	PyTypeObject *ob_type;
+
+	if (PyObject_TypeCheck(self, &segments_SegmentList_Type))
+		ob_type = self->ob_type;
+	else
+		ob_type = other->ob_type;
+
+	/* the longer list goes first.  error checking on size functions
+	 * not required */
+	if(PySequence_Size(self) < PySequence_Size(other)) {
+		PyObject *tmp = self;
+		self = other;
+		other = tmp;
+	}
+	if(PyList_Check(self))
+		Py_INCREF(self);
+	else
+		self = PySequence_List(self);
+	if(PyList_Check(other))
+		Py_INCREF(other);
+	else
+		other = PySequence_List(other);
+	if(self && other) {
+		result = intersection(self, other);
+		if(result) {
+			new = (PyObject *) segments_SegmentList_New(ob_type, result);
+			Py_DECREF(result);
+		}
+	}
+	Py_XDECREF(self);
+	Py_XDECREF(other);
+
+	return new;
 }
 
 
 /*
- * Arithmetic
+ * Append the segment [lo, hi) to a list, unless it's empty.  If item is
+ * not NULL it is an object of segment type whose boundaries are lo and
+ * hi, and it's appended instead of a new segment.  Consumes references to
+ * lo and hi.
  */
 
-
-static PyObject *__iand__(PyObject *self, PyObject *other)
+static int append_segment(PyObject *seglist, PyObject *item, PyObject *lo, PyObject *hi)
 {
-	PyObject *new = NULL;
-	other = PyNumber_Invert(other);
-	if(other) {
-		new = PyNumber_InPlaceSubtract(self, other);
-		Py_DECREF(other);
+	PyObject *seg;
+	int result = compare_bounds(lo, hi, Py_NE);
+
+	if(result <= 0) {
+		Py_DECREF(lo);
+		Py_DECREF(hi);
+		return result;
 	}
-	return new;
+	if(item) {
+		Py_DECREF(lo);
+		Py_DECREF(hi);
+		return PyList_Append(seglist, item);
+	}
+	seg = make_segment(lo, hi);
+	if(!seg)
+		return -1;
+	result = PyList_Append(seglist, seg);
+	Py_DECREF(seg);
+	return result;
 }
 
 
-static PyObject *__and__(PyObject *self, PyObject *other)
-{
-	PyObject *new = NULL;
-	PyTypeObject *ob_type;
+/*
+ * The union of two coalesced lists of segments, computed by merging them
+ * and coalescing the result in one pass, O(n + m).  Follows the same
+ * steps as extending the first with the second and calling .coalesce(),
+ * except that segments that are not merged with any others are kept.
+ * Returns a new list or NULL on failure.
+ */
 
-	if (PyObject_TypeCheck(self, &segments_SegmentList_Type))
-		ob_type = self->ob_type;
-	else
-		ob_type = other->ob_type;
+static PyObject *merge_union(PyObject *self, PyObject *other)
+{
+	PyObject *a, *b, *new = NULL;
+	PyObject *lo = NULL, *hi = NULL, *item = NULL;
+	Py_ssize_t i = 0, j = 0;
+	Py_ssize_t n, m;
+
+	/* work from copies, comparisons can run Python code */
+	a = PyList_GetSlice(self, 0, PyList_GET_SIZE(self));
+	b = PySequence_List(other);
+	if(!a || !b)
+		goto done;
+	n = PyList_GET_SIZE(a);
+	m = PyList_GET_SIZE(b);
+	new = PyList_New(0);
+	if(!new)
+		goto done;
+
+	while(i < n || j < m) {
+		PyObject *next, *next_lo, *next_hi;
+		int result;
+
+		/* next segment in sort order, from a on ties */
+		if(i >= n)
+			result = 1;
+		else if(j >= m)
+			result = 0;
+		else if((result = less_than(PyList_GET_ITEM(b, j), PyList_GET_ITEM(a, i))) < 0)
+			goto error;
+		next = result ? PyList_GET_ITEM(b, j++) : PyList_GET_ITEM(a, i++);
+		if(unpack(next, &next_lo, &next_hi))
+			goto error;
 
-	/* error checking on size functions not required */
-	if(PySequence_Size(self) >= PySequence_Size(other)) {
-		self = (PyObject *) segments_SegmentList_New(ob_type, self);
-		if(self) {
-			new = PyNumber_InPlaceAnd(self, other);
-			Py_DECREF(self);
-		}
-	} else {
-		other = (PyObject *) segments_SegmentList_New(ob_type, other);
-		if(other) {
-			new = PyNumber_InPlaceAnd(other, self);
-			Py_DECREF(other);
+		if(lo) {
+			if((result = compare_bounds(hi, next_lo, Py_GE)) < 0) {
+				Py_DECREF(next_lo);
+				Py_DECREF(next_hi);
+				goto error;
+			} else if(result > 0) {
+				Py_DECREF(next_lo);
+				hi = max(hi, next_hi);
+				if(!hi)
+					goto error;
+				item = NULL;
+				continue;
+			}
+			result = append_segment(new, item, lo, hi);
+			lo = hi = NULL;
+			if(result < 0) {
+				Py_DECREF(next_lo);
+				Py_DECREF(next_hi);
+				goto error;
+			}
 		}
+		lo = next_lo;
+		hi = next_hi;
+		item = next->ob_type == &segments_Segment_Type ? next : NULL;
 	}
-
+	if(lo && append_segment(new, item, lo, hi) < 0)
+		Py_CLEAR(new);
+	goto done;
+
+error:
+	Py_XDECREF(lo);
+	Py_XDECREF(hi);
+	Py_CLEAR(new);
+done:
+	Py_XDECREF(a);
+	Py_XDECREF(b);
 	return new;
 }
 
@@ -719,12 +2003,59 @@ static PyObject *__ior__(PyObject *self, PyObject *other)
 	Py_ssize_t i, j;
 	Py_ssize_t n;
 
-	/* Faster algorithm when the two lists have very different sizes.
-	 * OK to not test size functions for error return values */
+	/* Merge the two lists unless they have very different sizes, in
+	 * which case the algorithm below is faster.  OK to not test size
+	 * functions for error return values */
 	if(PySequence_Size(other) > PyList_GET_SIZE(self) / 2) {
-		if(pylist_extend((PyListObject *) self, other))
+		PyObject *new = NULL;
+
+		/* fast path for numeric boundaries */
+		if(PyList_Check(other)) {
+			struct numseg *a, *b;
+			Py_ssize_t na = PyList_GET_SIZE(self), nb = PyList_GET_SIZE(other);
+
+			a = unbox_list(self, 0);
+			if(!a && PyErr_Occurred())
+				return NULL;
+			b = a ? unbox_list(other, na) : NULL;
+			if(!b && PyErr_Occurred()) {
+				PyMem_Free(a);
+				return NULL;
+			}
+			if(a && b) {
+				struct nogil nogil;
+				result = nogil_begin(&nogil, self, other);
+				if(!result) {
+					/* move b to the end of its buffer,
+					 * then the merge can be written to
+					 * the start without overwriting
+					 * anything before it's read */
+					memmove(b + na, b, nb * sizeof(*b));
+					merge_segs(a, na, b + na, nb, b);
+					nb = coalesce_segs(b, na + nb);
+					nogil_end(&nogil);
+					result = replace_list(self, b, nb);
+					nogil_clear(&nogil);
+				}
+				PyMem_Free(a);
+				PyMem_Free(b);
+				if(result < 0)
+					return NULL;
+				Py_INCREF(self);
+				return self;
+			}
+			PyMem_Free(a);
+		}
+
+		new = merge_union(self, other);
+		if(!new)
 			return NULL;
-		return PyObject_CallMethod(self, "coalesce", NULL);
+		result = PyList_SetSlice(self, 0, PyList_GET_SIZE(self), new);
+		Py_DECREF(new);
+		if(result < 0)
+			return NULL;
+		Py_INCREF(self);
+		return self;
 	}
 
 	/* don't iterate over the same object twice */
@@ -760,7 +2091,7 @@ static PyObject *__ior__(PyObject *self, PyObject *other)
 				Py_DECREF(other);
 				return NULL;
 			}
-			if((result = PyObject_RichCompareBool(item_hi, lo, Py_GE)) < 0) {
+			if((result = compare_bounds(item_hi, lo, Py_GE)) < 0) {
 				Py_DECREF(lo);
 				Py_DECREF(hi);
 				Py_DECREF(item_lo);
@@ -786,7 +2117,7 @@ static PyObject *__ior__(PyObject *self, PyObject *other)
 				Py_DECREF(seg);
 				Py_DECREF(other);
 				return NULL;
-			} else if((result = PyObject_RichCompareBool(item_lo, hi, Py_LE)) < 0) {
+			} else if((result = compare_bounds(item_lo, hi, Py_LE)) < 0) {
 				Py_DECREF(lo);
 				Py_DECREF(hi);
 				Py_DECREF(item_lo);
@@ -909,15 +2240,152 @@ static PyObject *__xor__(PyObject *self, PyObject *other)
 }
 
 
+/*
+ * The difference between two coalesced lists of segments, built in a
+ * single pass into a new list, O(n + m).  Follows the steps of the
+ * original in-place algorithm:  segments of a that are not cut are kept,
+ * the pieces of the rest are new segments.  When the boundaries are
+ * numeric the work is done on unboxed segments.  Returns a new list or
+ * NULL on failure.
+ */
+
+static PyObject *difference(PyObject *a, PyObject *b)
+{
+	PyObject *new;
+	PyObject *seg = NULL, *lo = NULL, *hi = NULL, *b_lo = NULL, *b_hi = NULL;
+	Py_ssize_t n = PyList_GET_SIZE(a), m = PyList_GET_SIZE(b);
+	Py_ssize_t i, j;
+	struct numseg *x, *y, *out;
+
+	/* fast path for numeric boundaries */
+	x = unbox_list(a, 0);
+	if(!x && PyErr_Occurred())
+		return NULL;
+	y = x ? unbox_list(b, 0) : NULL;
+	if(!y && PyErr_Occurred()) {
+		PyMem_Free(x);
+		return NULL;
+	}
+	if(x && y) {
+		struct nogil nogil;
+		out = PyMem_New(struct numseg, n + m + 1);
+		if(!out)
+			new = PyErr_NoMemory();
+		else if(nogil_begin(&nogil, a, b) < 0)
+			new = NULL;
+		else {
+			Py_ssize_t k = subtract_segs(x, n, y, m, out);
+			nogil_end(&nogil);
+			new = box_list(out, k);
+			nogil_clear(&nogil);
+		}
+		PyMem_Free(x);
+		PyMem_Free(y);
+		PyMem_Free(out);
+		return new;
+	}
+	PyMem_Free(x);
+
+	new = PyList_New(0);
+	if(!new)
+		return NULL;
+
+	for(i = j = 0; i < PyList_GET_SIZE(a); i++) {
+		seg = PyList_GET_ITEM(a, i);
+		Py_INCREF(seg);
+		if(unpack(seg, &lo, &hi))
+			goto error;
+
+		while(1) {
+			int result;
+
+			/* skip segments of b that end at or before lo */
+			while(j < PyList_GET_SIZE(b)) {
+				if(unpack(PyList_GET_ITEM(b, j), NULL, &b_hi))
+					goto error;
+				result = compare_bounds(b_hi, lo, Py_LE);
+				Py_CLEAR(b_hi);
+				if(result < 0)
+					goto error;
+				else if(!result)
+					break;
+				j++;
+			}
+
+			if(j >= PyList_GET_SIZE(b))
+				result = 1;
+			else if(unpack(PyList_GET_ITEM(b, j), &b_lo, &b_hi))
+				goto error;
+			else if((result = compare_bounds(hi, b_lo, Py_LE)) < 0)
+				goto error;
+			if(result > 0) {
+				/* nothing more to remove from this segment */
+				if(!seg) {
+					seg = make_segment(lo, hi);
+					lo = hi = NULL;
+					if(!seg)
+						goto error;
+				}
+				if(PyList_Append(new, seg) < 0)
+					goto error;
+				break;
+			}
+
+			if((result = compare_bounds(b_lo, lo, Py_GT)) < 0)
+				goto error;
+			else if(result > 0) {
+				/* keep the part before b's segment */
+				PyObject *piece;
+				Py_INCREF(lo);
+				Py_INCREF(b_lo);
+				piece = make_segment(lo, b_lo);
+				if(!piece)
+					goto error;
+				result = PyList_Append(new, piece);
+				Py_DECREF(piece);
+				if(result < 0)
+					goto error;
+			}
+
+			if((result = compare_bounds(b_hi, hi, Py_LT)) < 0)
+				goto error;
+			else if(!result)
+				/* the rest is removed */
+				break;
+
+			/* continue with the part after b's segment */
+			Py_DECREF(lo);
+			lo = b_hi;
+			b_hi = NULL;
+			Py_CLEAR(b_lo);
+			Py_CLEAR(seg);
+		}
+		Py_CLEAR(seg);
+		Py_CLEAR(lo);
+		Py_CLEAR(hi);
+		Py_CLEAR(b_lo);
+		Py_CLEAR(b_hi);
+	}
+
+	return new;
+
+error:
+	Py_XDECREF(seg);
+	Py_XDECREF(lo);
+	Py_XDECREF(hi);
+	Py_XDECREF(b_lo);
+	Py_XDECREF(b_hi);
+	Py_DECREF(new);
+	return NULL;
+}
+
+
 static PyObject *__isub__(PyObject *self, PyObject *other)
 {
-	PyObject *seg;
-	PyObject *olo, *ohi;
-	PyObject *lo, *hi;
+	PyObject *new;
 	int result;
-	Py_ssize_t i, j;
 	Py_ssize_t n;
-	
+
 	n = PySequence_Size(other);
 	if(n < 0)
 		return NULL;
@@ -928,159 +2396,23 @@ static PyObject *__isub__(PyObject *self, PyObject *other)
 
 	/* don't iterate over the same object twice */
 	if(other == self) {
-		PySequence_DelSlice(self, 0, n);
+		if(PySequence_DelSlice(self, 0, n) < 0)
+			return NULL;
 		Py_INCREF(self);
 		return self;
 	}
 
-	i = j = 0;
-
-	seg = PySequence_GetItem(other, j);
-	if(unpack(seg, &olo, &ohi)) {
-		Py_XDECREF(seg);
+	other = PySequence_List(other);
+	if(!other)
+		return NULL;
+	new = difference(self, other);
+	Py_DECREF(other);
+	if(!new)
+		return NULL;
+	result = PyList_SetSlice(self, 0, PyList_GET_SIZE(self), new);
+	Py_DECREF(new);
+	if(result < 0)
 		return NULL;
-	}
-	Py_DECREF(seg);
-
-	while(i < PyList_GET_SIZE(self)) {
-		if(unpack(PyList_GET_ITEM(self, i), &lo, &hi)) {
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			return NULL;
-		}
-
-		while((result = PyObject_RichCompareBool(ohi, lo, Py_LE))) {
-			if(result < 0) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				return NULL;
-			}
-			if(++j >= n) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				Py_INCREF(self);
-				return self;
-			}
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			seg = PySequence_GetItem(other, j);
-			if(unpack(seg, &olo, &ohi)) {
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				Py_XDECREF(seg);
-				return NULL;
-			}
-			Py_DECREF(seg);
-		}
-
-		if((result = PyObject_RichCompareBool(hi, olo, Py_LE)) < 0) {
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			return NULL;
-		} else if(result > 0) {
-			/* seg[1] <= otherseg[0] */
-			i++;
-		} else if((result = PyObject_RichCompareBool(olo, lo, Py_LE)) < 0) {
-			Py_DECREF(olo);
-			Py_DECREF(ohi);
-			Py_DECREF(lo);
-			Py_DECREF(hi);
-			return NULL;
-		} else if(result > 0) {
-			/* otherseg[0] <= seg[0] */
-			if((result = PyObject_RichCompareBool(ohi, hi, Py_GE)) < 0) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				return NULL;
-			} else if(result > 0) {
-				/* otherseg[1] >= seg[1] */
-				if(PySequence_DelItem(self, i) < 0) {
-					Py_DECREF(olo);
-					Py_DECREF(ohi);
-					Py_DECREF(lo);
-					Py_DECREF(hi);
-					return NULL;
-				}
-			} else {
-				/* else */
-				PyObject *newseg = make_segment(ohi, hi);
-				if(!newseg) {
-					Py_DECREF(olo);
-					Py_DECREF(lo);
-					return NULL;
-				}
-				/* _SetItem consumes a ref count */
-				if(PyList_SetItem(self, i, newseg) < 0) {
-					Py_DECREF(olo);
-					Py_DECREF(lo);
-					Py_DECREF(newseg);
-					return NULL;
-				}
-				/* make_segment() consumed references,
-				 * which we need */
-				Py_INCREF(ohi);
-				Py_INCREF(hi);
-			}
-		} else {
-			/* else */
-			PyObject *newseg = make_segment(lo, olo);
-			if(!newseg) {
-				Py_DECREF(ohi);
-				Py_DECREF(hi);
-				return NULL;
-			}
-			/* _SetItem consumes a ref count */
-			if(PyList_SetItem(self, i++, newseg) < 0) {
-				Py_DECREF(ohi);
-				Py_DECREF(hi);
-				Py_DECREF(newseg);
-				return NULL;
-			}
-			/* make_segment() consumed references, which we
-			 * need */
-			Py_INCREF(lo);
-			Py_INCREF(olo);
-			if((result = PyObject_RichCompareBool(ohi, hi, Py_LT)) < 0) {
-				Py_DECREF(olo);
-				Py_DECREF(ohi);
-				Py_DECREF(lo);
-				Py_DECREF(hi);
-				return NULL;
-			} else if(result > 0) {
-				/* otherseg[1] < seg[1] */
-				newseg = make_segment(ohi, hi);
-				if(!newseg) {
-					Py_DECREF(olo);
-					Py_DECREF(lo);
-					return NULL;
-				}
-				/* _Insert increments the ref count */
-				if(PyList_Insert(self, i, newseg) < 0) {
-					Py_DECREF(olo);
-					Py_DECREF(lo);
-					Py_DECREF(newseg);
-					return NULL;
-				}
-				Py_DECREF(newseg);
-				/* make_segment() consumed references,
-				 * which we need */
-				Py_INCREF(ohi);
-				Py_INCREF(hi);
-			}
-		}
-		Py_DECREF(lo);
-		Py_DECREF(hi);
-	}
-	Py_DECREF(olo);
-	Py_DECREF(ohi);
 
 	Py_INCREF(self);
 	return self;
@@ -1090,6 +2422,7 @@ static PyObject *__isub__(PyObject *self, PyObject *other)
 static PyObject *__sub__(PyObject *self, PyObject *other)
 {
 	PyObject *new = NULL;
+	PyObject *result;
 	PyTypeObject *ob_type;
 
 	if (PyObject_TypeCheck(self, &segments_SegmentList_Type))
@@ -1097,11 +2430,21 @@ static PyObject *__sub__(PyObject *self, PyObject *other)
 	else
 		ob_type = other->ob_type;
 
-	self = (PyObject *) segments_SegmentList_New(ob_type, self);
-	if(self) {
-		new = PyNumber_InPlaceSubtract(self, other);
-		Py_DECREF(self);
+	if(PyList_Check(self))
+		Py_INCREF(self);
+	else
+		self = PySequence_List(self);
+	other = PySequence_List(other);
+	if(self && other) {
+		result = difference(self, other);
+		if(result) {
+			new = (PyObject *) segments_SegmentList_New(ob_type, result);
+			Py_DECREF(result);
+		}
 	}
+	Py_XDECREF(self);
+	Py_XDECREF(other);
+
 	return new;
 }
 
@@ -1223,7 +2566,82 @@ static PyObject *__invert__(PyObject *self)
 		Py_DECREF(segments_PosInfinity);
 	}
 
-	return new;
+	return new;
+}
+
+
+/*
+ * Durations of the results of arithmetic operations.  Boundaries that
+ * are all floats or all ints are done with the kernels above, anything
+ * else by the Python implementation.
+ */
+
+
+static PyObject *duration(PyObject *self, PyObject *other, void (*kernel)(const struct numseg *, Py_ssize_t, const struct numseg *, Py_ssize_t, struct duration *), const char *fallback)
+{
+	struct numseg *a = NULL, *b = NULL;
+	PyObject *module, *result;
+
+	if(PyList_Check(self) && PyList_Check(other)) {
+		a = unbox_list(self, 0);
+		if(!a && PyErr_Occurred())
+			return NULL;
+		b = a ? unbox_list(other, 0) : NULL;
+		if(!b && PyErr_Occurred()) {
+			PyMem_Free(a);
+			return NULL;
+		}
+	}
+	if(a && b) {
+		Py_ssize_t n = PyList_GET_SIZE(self), m = PyList_GET_SIZE(other);
+		int kinds = numseg_kinds(a, n) | numseg_kinds(b, m);
+		if(!(kinds & KIND_OTHER) && kinds != (KIND_FLOATS | KIND_INTS)) {
+			struct duration total = {kinds == KIND_INTS, 0, 0., 0};
+			struct nogil nogil;
+			if(nogil_begin(&nogil, self, other) < 0) {
+				PyMem_Free(a);
+				PyMem_Free(b);
+				return NULL;
+			}
+			kernel(a, n, b, m, &total);
+			nogil_end(&nogil);
+			nogil_clear(&nogil);
+			PyMem_Free(a);
+			PyMem_Free(b);
+			return duration_box(&total);
+		}
+	}
+	PyMem_Free(a);
+	PyMem_Free(b);
+
+	module = PyImport_ImportModule("segments.segments");
+	if(!module)
+		return NULL;
+	result = PyObject_CallMethod(module, (char *) fallback, "OO", self, other);
+	Py_DECREF(module);
+	return result;
+}
+
+
+static PyObject *intersection_duration(PyObject *self, PyObject *other)
+{
+	/* the longer list goes first, as in __and__().  error checking on
+	 * size functions not required */
+	if(PySequence_Size(other) > PyList_GET_SIZE(self))
+		return duration(other, self, intersection_duration_segs, "_intersection_duration");
+	return duration(self, other, intersection_duration_segs, "_intersection_duration");
+}
+
+
+static PyObject *union_duration(PyObject *self, PyObject *other)
+{
+	return duration(self, other, union_duration_segs, "_union_duration");
+}
+
+
+static PyObject *difference_duration(PyObject *self, PyObject *other)
+{
+	return duration(self, other, difference_duration_segs, "_difference_duration");
 }
 
 
@@ -1343,7 +2761,19 @@ static PyObject *shift(PyObject *self, PyObject *delta)
 			Py_DECREF(shift);
 			return NULL;
 		}
-		new = PyObject_CallMethodObjArgs(seg, shift, delta, NULL);
+		if(Py_TYPE(seg) == &segments_Segment_Type) {
+			/* what segment.shift() does, without the method
+			 * call */
+			PyObject *lo = PyNumber_Add(PyTuple_GET_ITEM(seg, 0), delta);
+			PyObject *hi = lo ? PyNumber_Add(PyTuple_GET_ITEM(seg, 1), delta) : NULL;
+			if(!hi) {
+				Py_XDECREF(lo);
+				Py_DECREF(shift);
+				return NULL;
+			}
+			new = make_segment(lo, hi);
+		} else
+			new = PyObject_CallMethodObjArgs(seg, shift, delta, NULL);
 		if(!new) {
 			Py_DECREF(shift);
 			return NULL;
@@ -1362,6 +2792,721 @@ static PyObject *shift(PyObject *self, PyObject *delta)
 }
 
 
+/*
+ * Pickle Support
+ */
+
+
+/*
+ * Return the name of the byte order of this machine, as in sys.byteorder.
+ */
+
+
+static const char *native_byteorder(void)
+{
+	const int one = 1;
+	return *(const char *) &one ? "little" : "big";
+}
+
+
+#if PY_MAJOR_VERSION >= 3
+/*
+ * Pack the boundaries of the segments in a segmentlist into a bytes
+ * object of native int64 or float64 values, and set *typecode to the
+ * array module's type code for them.  Returns NULL with no error set if
+ * the elements are not all segments (not subclasses) or the boundaries
+ * are not all ints that fit in 64 bits or all floats.
+ */
+
+
+static PyObject *pack_bounds(PyObject *self, const char **typecode)
+{
+	Py_ssize_t n = PyList_GET_SIZE(self);
+	Py_ssize_t i;
+	PyObject *bytes;
+	int is_float;
+
+	if(!n || Py_TYPE(PyList_GET_ITEM(self, 0)) != &segments_Segment_Type)
+		return NULL;
+	is_float = PyFloat_CheckExact(PyTuple_GET_ITEM(PyList_GET_ITEM(self, 0), 0));
+	bytes = PyBytes_FromStringAndSize(NULL, 2 * n * 8);
+	if(!bytes)
+		return NULL;
+
+	for(i = 0; i < 2 * n; i++) {
+		PyObject *seg = PyList_GET_ITEM(self, i / 2);
+		PyObject *bound;
+		if(Py_TYPE(seg) != &segments_Segment_Type)
+			break;
+		bound = PyTuple_GET_ITEM(seg, i % 2);
+		if(is_float) {
+			if(!PyFloat_CheckExact(bound))
+				break;
+			((double *) PyBytes_AS_STRING(bytes))[i] = PyFloat_AS_DOUBLE(bound);
+		} else {
+			int overflow;
+			if(!PyLong_CheckExact(bound))
+				break;
+			((PY_LONG_LONG *) PyBytes_AS_STRING(bytes))[i] = PyLong_AsLongLongAndOverflow(bound, &overflow);
+			if(overflow)
+				break;
+		}
+	}
+	if(i < 2 * n) {
+		Py_DECREF(bytes);
+		return NULL;
+	}
+
+	*typecode = is_float ? "d" : "q";
+	return bytes;
+}
+#endif
+
+
+static PyObject *__reduce_ex__(PyObject *self, PyObject *protocol)
+{
+	long proto = PyLong_AsLong(protocol);
+	PyObject *result;
+
+	if(proto == -1 && PyErr_Occurred())
+		return NULL;
+
+	if(Py_TYPE(self) != &segments_SegmentList_Type) {
+		/* let subclasses be pickled the default way */
+		PyObject *reduce_ex = PyObject_GetAttrString((PyObject *) &PyBaseObject_Type, "__reduce_ex__");
+		if(!reduce_ex)
+			return NULL;
+		result = PyObject_CallFunctionObjArgs(reduce_ex, self, protocol, NULL);
+		Py_DECREF(reduce_ex);
+		return result;
+	}
+
+#if PY_MAJOR_VERSION >= 3
+	/* protocol 5's buffers can be sent out-of-band, otherwise the
+	 * bytes are pickled in-band */
+	if(proto >= 2) {
+		const char *typecode;
+		PyObject *bytes = pack_bounds(self, &typecode);
+		if(bytes) {
+			PyObject *module = PyImport_ImportModule(MODULE_NAME);
+			PyObject *frombuffer = module ? PyObject_GetAttrString(module, "_segmentlist_frombuffer") : NULL;
+			PyObject *buffer = NULL;
+			if(frombuffer) {
+#if PY_VERSION_HEX >= 0x03080000
+				if(proto >= 5)
+					buffer = PyPickleBuffer_FromObject(bytes);
+				else
+#endif
+				{
+					buffer = bytes;
+					Py_INCREF(buffer);
+				}
+			}
+			Py_XDECREF(module);
+			Py_DECREF(bytes);
+			if(!buffer) {
+				Py_XDECREF(frombuffer);
+				return NULL;
+			}
+			return Py_BuildValue("(N(sNs))", frombuffer, typecode, buffer, native_byteorder());
+		}
+		if(PyErr_Occurred())
+			return NULL;
+	}
+#endif
+
+	result = PyObject_GetIter(self);
+	if(!result)
+		return NULL;
+	return Py_BuildValue("(O()ON)", (PyObject *) Py_TYPE(self), Py_None, result);
+}
+
+
+/*
+ * Reconstruct a segmentlist pickled by __reduce_ex__() with protocol 2 or
+ * later from the buffer of its boundaries.  The segments hold only
+ * numbers so, as CPython does for tuples of numbers, they are untracked
+ * by the garbage collector, which would otherwise traverse the list
+ * repeatedly while it was being built.
+ */
+
+
+PyObject *segments_segmentlist_frombuffer(PyObject *module, PyObject *args)
+{
+	const char *typecode, *byteorder;
+	PyObject *obj, *list, *result = NULL;
+	Py_buffer view;
+	Py_ssize_t n, i;
+	int swap;
+
+	if(!PyArg_ParseTuple(args, "sOs:_segmentlist_frombuffer", &typecode, &obj, &byteorder))
+		return NULL;
+	if(strcmp(typecode, "q") && strcmp(typecode, "d")) {
+		PyErr_Format(PyExc_ValueError, "unsupported type code '%s'", typecode);
+		return NULL;
+	}
+	swap = strcmp(byteorder, native_byteorder()) != 0;
+	if(PyObject_GetBuffer(obj, &view, PyBUF_SIMPLE) < 0)
+		return NULL;
+	if(view.len % 16) {
+		PyErr_SetString(PyExc_ValueError, "buffer size is not a multiple of the size of a segment");
+		goto done;
+	}
+	n = view.len / 16;
+	list = PyList_New(n);
+	if(!list)
+		goto done;
+
+	for(i = 0; i < n; i++) {
+		unsigned char bytes[16];
+		PyObject *bounds[2];
+		PyObject *seg;
+		int j, k;
+		memcpy(bytes, (const unsigned char *) view.buf + 16 * i, 16);
+		for(j = 0; j < 2; j++) {
+			unsigned char *bound = bytes + 8 * j;
+			if(swap)
+				for(k = 0; k < 4; k++) {
+					unsigned char c = bound[k];
+					bound[k] = bound[7 - k];
+					bound[7 - k] = c;
+				}
+			if(*typecode == 'q') {
+				PY_LONG_LONG x;
+				memcpy(&x, bound, 8);
+				bounds[j] = PyLong_FromLongLong(x);
+			} else {
+				double x;
+				memcpy(&x, bound, 8);
+				bounds[j] = PyFloat_FromDouble(x);
+			}
+		}
+		if(!(bounds[0] && bounds[1])) {
+			Py_XDECREF(bounds[0]);
+			Py_XDECREF(bounds[1]);
+			Py_DECREF(list);
+			goto done;
+		}
+		/* consumes the references to the bounds */
+		seg = segments_Segment_New(&segments_Segment_Type, bounds[0], bounds[1]);
+		if(!seg) {
+			Py_DECREF(list);
+			goto done;
+		}
+		PyObject_GC_UnTrack(seg);
+		PyList_SET_ITEM(list, i, seg);
+	}
+
+	result = PyObject_CallFunctionObjArgs((PyObject *) &segments_SegmentList_Type, list, NULL);
+	Py_DECREF(list);
+
+done:
+	PyBuffer_Release(&view);
+	return result;
+}
+
+
+/*
+ * Coalesced inputs for the sweeps
+ */
+
+
+/*
+ * Return seglist if it is a coalesced list of segments, otherwise a new
+ * coalesced segmentlist of its segments.
+ */
+
+
+PyObject *segments_coalesced(PyObject *module, PyObject *seglist)
+{
+	PyObject *prev = NULL, *new;
+	Py_ssize_t i;
+	int result = PyList_Check(seglist);
+
+	/* each segment must be non-empty and lie above the one before */
+	for(i = 0; result > 0 && i < PyList_GET_SIZE(seglist); i++) {
+		PyObject *lo, *hi;
+		if(unpack(PyList_GET_ITEM(seglist, i), &lo, &hi) < 0) {
+			Py_XDECREF(prev);
+			return NULL;
+		}
+		result = compare_bounds(lo, hi, Py_LT);
+		if(result > 0 && prev)
+			result = compare_bounds(prev, lo, Py_LT);
+		Py_DECREF(lo);
+		Py_XDECREF(prev);
+		prev = hi;
+	}
+	Py_XDECREF(prev);
+	if(result < 0)
+		return NULL;
+	if(result) {
+		Py_INCREF(seglist);
+		return seglist;
+	}
+
+	/* coalesce() returns the list */
+	new = (PyObject *) segments_SegmentList_New(&segments_SegmentList_Type, seglist);
+	if(!new)
+		return NULL;
+	seglist = PyObject_CallMethod(new, "coalesce", NULL);
+	Py_DECREF(new);
+	return seglist;
+}
+
+
+/*
+ * Vote
+ */
+
+
+/*
+ * One entry in the heap of the k-way sweep.  Each input list has exactly
+ * one entry, holding the next boundary to be crossed in that list:  the
+ * lower bound of its current segment (delta = +1, and hi is the upper
+ * bound), or the upper bound (delta = -1, hi is NULL).  offset, if not
+ * NULL, is added to the boundaries of the list's segments as they are
+ * loaded.  All references are owned.
+ */
+
+
+struct sweep_entry {
+	PyObject *bound;
+	double x;
+	int numeric;
+	int delta;
+	Py_ssize_t index;
+	PyObject *hi;
+	PyObject *iter;
+	PyObject *offset;
+};
+
+
+static void sweep_entry_set(struct sweep_entry *entry, PyObject *bound, int delta, PyObject *hi)
+{
+	entry->bound = bound;
+	entry->numeric = unbox_bound(bound, &entry->x);
+	entry->delta = delta;
+	entry->hi = hi;
+}
+
+
+/* order by boundary, then by list.  returns -1 on error */
+
+static int sweep_entry_lt(const struct sweep_entry *a, const struct sweep_entry *b)
+{
+	int result;
+
+	if(a->numeric && b->numeric) {
+		if(a->x != b->x)
+			return a->x < b->x;
+	} else {
+		if((result = PyObject_RichCompareBool(a->bound, b->bound, Py_LT)))
+			return result;
+		if((result = PyObject_RichCompareBool(b->bound, a->bound, Py_LT)))
+			return result < 0 ? result : 0;
+	}
+	return a->index < b->index;
+}
+
+
+static int sweep_entry_eq(const struct sweep_entry *entry, PyObject *bound)
+{
+	double x;
+
+	if(entry->numeric && unbox_bound(bound, &x))
+		return entry->x == x;
+	return PyObject_RichCompareBool(entry->bound, bound, Py_EQ);
+}
+
+
+/* restore the heap property below position i, returns -1 on error */
+
+static int sweep_siftdown(struct sweep_entry *heap, Py_ssize_t n, Py_ssize_t i)
+{
+	while(1) {
+		Py_ssize_t child = 2 * i + 1;
+		struct sweep_entry tmp;
+		int result;
+		if(child >= n)
+			break;
+		if(child + 1 < n) {
+			if((result = sweep_entry_lt(&heap[child + 1], &heap[child])) < 0)
+				return -1;
+			child += result;
+		}
+		if((result = sweep_entry_lt(&heap[child], &heap[i])) < 0)
+			return -1;
+		else if(!result)
+			break;
+		tmp = heap[i];
+		heap[i] = heap[child];
+		heap[child] = tmp;
+		i = child;
+	}
+
+	return 0;
+}
+
+
+/*
+ * Load the next segment from an iterator into an entry.  Returns 1 on
+ * success, 0 if the iterator is exhausted, -1 on failure.
+ */
+
+static int sweep_next(struct sweep_entry *entry)
+{
+	PyObject *seg = PyIter_Next(entry->iter);
+	PyObject *lo, *hi;
+	int result;
+
+	if(!seg)
+		return PyErr_Occurred() ? -1 : 0;
+	result = unpack(seg, &lo, &hi);
+	Py_DECREF(seg);
+	if(result)
+		return -1;
+	if(entry->offset) {
+		PyObject *shifted_lo = PyNumber_Add(lo, entry->offset);
+		PyObject *shifted_hi = shifted_lo ? PyNumber_Add(hi, entry->offset) : NULL;
+		Py_DECREF(lo);
+		Py_DECREF(hi);
+		if(!shifted_hi) {
+			Py_XDECREF(shifted_lo);
+			return -1;
+		}
+		lo = shifted_lo;
+		hi = shifted_hi;
+	}
+	sweep_entry_set(entry, lo, +1, hi);
+	return 1;
+}
+
+
+static void sweep_entry_clear(struct sweep_entry *entry)
+{
+	Py_CLEAR(entry->bound);
+	Py_CLEAR(entry->hi);
+	Py_CLEAR(entry->iter);
+	Py_CLEAR(entry->offset);
+}
+
+
+/*
+ * Load the first segment of each list in seglists into a new heap, and
+ * heapify it.  offsets is None or a sequence of offsets, see sweep_entry.
+ * Exhausted lists are left out.  Returns the number of lists, or -1 on
+ * failure.  On success *heap must be freed with PyMem_Free() after
+ * clearing its *size entries.
+ */
+
+static Py_ssize_t sweep_load(PyObject *seglists, PyObject *offsets, struct sweep_entry **heap, Py_ssize_t *size)
+{
+	PyObject *seglist;
+	Py_ssize_t allocated = 0, index = 0, i;
+
+	*heap = NULL;
+	*size = 0;
+
+	if(offsets == Py_None)
+		offsets = NULL;
+	else {
+		offsets = PySequence_Fast(offsets, "offsets must be a sequence");
+		if(!offsets)
+			return -1;
+	}
+
+	seglists = PyObject_GetIter(seglists);
+	if(!seglists) {
+		Py_XDECREF(offsets);
+		return -1;
+	}
+	while((seglist = PyIter_Next(seglists))) {
+		struct sweep_entry entry = {NULL};
+		int loaded;
+		if(offsets && index < PySequence_Fast_GET_SIZE(offsets) && PySequence_Fast_GET_ITEM(offsets, index) != Py_None) {
+			entry.offset = PySequence_Fast_GET_ITEM(offsets, index);
+			Py_INCREF(entry.offset);
+		}
+		entry.index = index++;
+		entry.iter = PyObject_GetIter(seglist);
+		Py_DECREF(seglist);
+		if(!entry.iter) {
+			sweep_entry_clear(&entry);
+			Py_DECREF(seglists);
+			Py_XDECREF(offsets);
+			goto error;
+		}
+		loaded = sweep_next(&entry);
+		if(loaded <= 0) {
+			sweep_entry_clear(&entry);
+			if(loaded < 0) {
+				Py_DECREF(seglists);
+				Py_XDECREF(offsets);
+				goto error;
+			}
+			continue;
+		}
+		if(*size >= allocated) {
+			allocated = allocated ? 2 * allocated : 16;
+			if(!PyMem_Resize(*heap, struct sweep_entry, allocated)) {
+				sweep_entry_clear(&entry);
+				Py_DECREF(seglists);
+				Py_XDECREF(offsets);
+				PyErr_NoMemory();
+				goto error;
+			}
+		}
+		(*heap)[(*size)++] = entry;
+	}
+	Py_DECREF(seglists);
+	Py_XDECREF(offsets);
+	if(PyErr_Occurred())
+		goto error;
+
+	/* heapify */
+	for(i = *size / 2 - 1; i >= 0; i--)
+		if(sweep_siftdown(*heap, *size, i) < 0)
+			goto error;
+
+	return index;
+
+error:
+	while(*size)
+		sweep_entry_clear(&(*heap)[--*size]);
+	PyMem_Free(*heap);
+	*heap = NULL;
+	return -1;
+}
+
+
+PyObject *segments_vote(PyObject *module, PyObject *args)
+{
+	PyObject *seglists, *offsets = Py_None;
+	PyObject *new = NULL, *start = NULL, *bound = NULL;
+	struct sweep_entry *heap = NULL;
+	Py_ssize_t n, size = 0;
+	Py_ssize_t votes = 0;
+	int result = 0;
+
+	if(!PyArg_ParseTuple(args, "On|O:_vote", &seglists, &n, &offsets))
+		return NULL;
+
+	new = (PyObject *) segments_SegmentList_New(&segments_SegmentList_Type, NULL);
+	if(!new || n < 1)
+		return new;
+
+	/* load the first segment of each list */
+	if(sweep_load(seglists, offsets, &heap, &size) < 0)
+		goto error;
+
+	/* sweep */
+	while(size) {
+		Py_ssize_t before = votes;
+		bound = heap[0].bound;
+		Py_INCREF(bound);
+		do {
+			votes += heap[0].delta;
+			if(heap[0].delta > 0) {
+				/* cross into the segment */
+				PyObject *hi = heap[0].hi;
+				Py_DECREF(heap[0].bound);
+				sweep_entry_set(&heap[0], hi, -1, NULL);
+			} else {
+				/* cross out of it, and on to the next */
+				int loaded;
+				Py_CLEAR(heap[0].bound);
+				loaded = sweep_next(&heap[0]);
+				if(loaded < 0)
+					goto error;
+				else if(!loaded) {
+					sweep_entry_clear(&heap[0]);
+					heap[0] = heap[--size];
+				}
+			}
+			if(sweep_siftdown(heap, size, 0) < 0)
+				goto error;
+		} while(size && (result = sweep_entry_eq(&heap[0], bound)) > 0);
+		if(size && result < 0)
+			goto error;
+
+		if(before < n && votes >= n) {
+			start = bound;
+			bound = NULL;
+		} else if(votes < n && before >= n) {
+			PyObject *seg = make_segment(start, bound);
+			start = bound = NULL;
+			if(!seg)
+				goto error;
+			result = PyList_Append(new, seg);
+			Py_DECREF(seg);
+			if(result < 0)
+				goto error;
+		}
+		Py_CLEAR(bound);
+	}
+
+	while(size)
+		sweep_entry_clear(&heap[--size]);
+	PyMem_Free(heap);
+	return new;
+
+error:
+	while(size)
+		sweep_entry_clear(&heap[--size]);
+	PyMem_Free(heap);
+	Py_XDECREF(start);
+	Py_XDECREF(bound);
+	Py_DECREF(new);
+	return NULL;
+}
+
+
+/*
+ * Coincidences.  The segments of all the lists are merged in order of
+ * their lower bounds.  Because the lists are coalesced, a segment can
+ * only intersect a segment of another list that starts no later than it
+ * does if that is the last segment of that list to have started, so each
+ * segment need only be compared with those.
+ */
+
+
+PyObject *segments_coincidences(PyObject *module, PyObject *args)
+{
+	PyObject *seglists, *offsets = Py_None;
+	PyObject *new = NULL;
+	PyObject **current = NULL;
+	struct sweep_entry *heap = NULL;
+	Py_ssize_t n, k, size = 0, i, j;
+	int durations = 0, first = 0;
+
+	if(!PyArg_ParseTuple(args, "On|Oii:_coincidences", &seglists, &n, &offsets, &durations, &first))
+		return NULL;
+
+	k = sweep_load(seglists, offsets, &heap, &size);
+	if(k < 0)
+		return NULL;
+	if(n < 0 || n > k) {
+		PyErr_SetString(PyExc_ValueError, "n out of range");
+		goto error;
+	}
+
+	/* the result:  n rows of k - n entries */
+	new = PyList_New(n);
+	if(!new)
+		goto error;
+	for(i = 0; i < n; i++) {
+		PyObject *row = PyList_New(k - n);
+		if(!row)
+			goto error;
+		PyList_SET_ITEM(new, i, row);
+		for(j = 0; j < k - n; j++) {
+			PyObject *zero;
+			if(durations) {
+#if PY_MAJOR_VERSION < 3
+				zero = PyInt_FromLong(0);
+#else
+				zero = PyLong_FromLong(0);
+#endif
+				if(!zero)
+					goto error;
+			} else {
+				zero = Py_False;
+				Py_INCREF(zero);
+			}
+			PyList_SET_ITEM(row, j, zero);
+		}
+	}
+
+	/* the last segment of each list to have started, as (lo, hi) */
+	current = PyMem_New(PyObject *, 2 * k + 1);
+	if(!current) {
+		PyErr_NoMemory();
+		goto error;
+	}
+	memset(current, 0, (2 * k + 1) * sizeof(*current));
+
+	/* sweep */
+	while(size) {
+		struct sweep_entry *entry = &heap[0];
+		Py_ssize_t lo_j = entry->index < n ? n : 0;
+		Py_ssize_t hi_j = entry->index < n ? k : n;
+		int loaded;
+
+		for(j = lo_j; j < hi_j; j++) {
+			PyObject *row, *item;
+			Py_ssize_t col;
+			int result;
+			if(!current[2 * j])
+				continue;
+			/* current[2 * j] <= entry->bound */
+			result = compare_bounds(current[2 * j + 1], entry->bound, Py_GT);
+			if(result > 0)
+				result = compare_bounds(current[2 * j], entry->hi, Py_LT);
+			if(result < 0)
+				goto error;
+			if(!result)
+				continue;
+			row = PyList_GET_ITEM(new, entry->index < n ? entry->index : j);
+			col = (entry->index < n ? j : entry->index) - n;
+			if(durations) {
+				PyObject *hi, *overlap, *sum;
+				Py_INCREF(current[2 * j + 1]);
+				Py_INCREF(entry->hi);
+				hi = min(current[2 * j + 1], entry->hi);
+				if(!hi)
+					goto error;
+				overlap = PyNumber_Subtract(hi, entry->bound);
+				Py_DECREF(hi);
+				if(!overlap)
+					goto error;
+				sum = PyNumber_Add(PyList_GET_ITEM(row, col), overlap);
+				Py_DECREF(overlap);
+				if(!sum)
+					goto error;
+				item = sum;
+			} else {
+				item = Py_True;
+				Py_INCREF(item);
+			}
+			/* steals the reference */
+			PyList_SetItem(row, col, item);
+			if(first)
+				goto done;
+		}
+
+		/* move the segment into current, and load the next */
+		Py_XDECREF(current[2 * entry->index]);
+		Py_XDECREF(current[2 * entry->index + 1]);
+		current[2 * entry->index] = entry->bound;
+		current[2 * entry->index + 1] = entry->hi;
+		entry->bound = entry->hi = NULL;
+		loaded = sweep_next(entry);
+		if(loaded < 0)
+			goto error;
+		else if(!loaded) {
+			sweep_entry_clear(entry);
+			heap[0] = heap[--size];
+		}
+		if(sweep_siftdown(heap, size, 0) < 0)
+			goto error;
+	}
+
+done:
+	for(i = 0; current && i < 2 * k; i++)
+		Py_XDECREF(current[i]);
+	PyMem_Free(current);
+	while(size)
+		sweep_entry_clear(&heap[--size]);
+	PyMem_Free(heap);
+	return new;
+
+error:
+	Py_CLEAR(new);
+	goto done;
+}
+
+
 /*
  * Type information
  */
@@ -1388,11 +3533,17 @@ static PySequenceMethods as_sequence = {
 
 
 static struct PyMethodDef methods[] = {
+	{"__reduce_ex__", __reduce_ex__, METH_O, "Pickle support.  With pickle protocol 2 or later, a list of segments whose boundaries are all ints that fit in 64 bits or all floats is pickled as a single buffer of the boundaries, which with protocol 5 or later can be sent out-of-band.  Python 3 only."},
 	{"extent", extent, METH_NOARGS, "Return the segment whose end-points denote the maximum and minimum extent of the segmentlist.  Does not require the segmentlist to be coalesced."},
 	{"find", find, METH_O, "Return the smallest i such that i is the index of an element that wholly contains item.  Raises ValueError if no such element exists.  Does not require the segmentlist to be coalesced."},
+	{"find_many", find_many, METH_O, "Return an array of integers giving, for each item in items, the index of the segment in self that wholly contains it, or -1 if there is no such segment.  items can be a numpy array or any other object that numpy can convert to an array of floats.  If it is a two-dimensional array with two columns then each row is taken to be a segment, otherwise each element is taken to be a scalar.  The segment boundaries are converted to floats for the comparison.  If self has length n and there are m items, this operation is O(m log n), or O(n + m) if the items are in ascending order.  Unlike .find(), requires the list to be coalesced.  Requires numpy."},
 	{"intersects", intersects, METH_O, "Returns True if the intersection of self and the segmentlist other is not the null set, otherwise returns False.  The algorithm is O(n), but faster than explicit calculation of the intersection, i.e. by testing bool(self & other).  Requires both lists to be coalesced."},
+	{"contains_many", contains_many, METH_O, "Return an array of booleans of the same shape as times indicating, for each value in times, whether or not that value is contained within the segments in self.  times can be a numpy array or any other object that numpy can convert to an array of floats, and the segment boundaries are also converted to floats for the comparison.  If self has length n and there are m times, this operation is O(m log n), or O(n + m) if the times are in ascending order.  Requires the list to be coalesced.  Requires numpy."},
+	{"intersection_duration", intersection_duration, METH_O, "Return abs(self & other), the total duration of the intersection of the segmentlist and another, without building the intersection.  The algorithm is the same as for .__and__(), and requires both lists to be coalesced.  The C extension does the arithmetic on numeric boundaries without the GIL."},
+	{"union_duration", union_duration, METH_O, "Return abs(self | other), the total duration of the union of the segmentlist and another, without building the union.  For lists of length n and m this is O(n + m).  Requires both lists to be coalesced."},
+	{"difference_duration", difference_duration, METH_O, "Return abs(self - other), the total duration of the difference between the segmentlist and another, without building the difference.  For lists of length n and m this is O(n + m).  Requires both lists to be coalesced."},
 	{"intersects_segment", intersects_segment, METH_O, "Returns True if the intersection of self and the segment other is not the null set, otherwise returns False.  The algorithm is O(log n).  Requires the list to be coalesced."},
-	{"coalesce", coalesce, METH_NOARGS, "Sort the elements of a list into ascending order, and merge continuous segments into single segments.  This operation is O(n log n)."},
+	{"coalesce", (PyCFunction) (void (*)(void)) coalesce, METH_VARARGS | METH_KEYWORDS, "Sort the elements of a list into ascending order, and merge continuous segments into single segments.  This operation is O(n log n).  If parallel is an integer greater than 1, the list is split into that many chunks, which are coalesced concurrently by a pool of threads before the results are merged.  The result is the same.  The arithmetic on numeric boundaries is done without the GIL, so for long lists of them this is faster."},
 	{"protract", protract, METH_O, "Execute the .protract() method on each segment in the list and coalesce the result.  Segmentlist is modified in place."},
 	{"contract", contract, METH_O, "Execute the .contract() method on each segment in the list and coalesce the result.  Segmentlist is modified in place."},
 	{"shift", shift, METH_O, "Execute the .shift() method on each segment in the list.  The algorithm is O(n) and does not require the list to be coalesced nor does it coalesce the list.  Segmentlist is modified in place."},
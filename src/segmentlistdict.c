@@ -0,0 +1,840 @@
+/*
+ * This program is free software; you can redistribute it and/or modify it
+ * under the terms of the GNU General Public License as published by the
+ * Free Software Foundation; either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+ */
+
+
+/*
+ * ============================================================================
+ *
+ *            Segments Module Component --- segmentlistdict Support
+ *
+ * ============================================================================
+ */
+
+
+#include <Python.h>
+#include <string.h>
+
+
+#include <segments.h>
+
+
+/*
+ * ============================================================================
+ *
+ *                               _offsets Class
+ *
+ * ============================================================================
+ */
+
+
+/*
+ * Utilities
+ */
+
+
+static PyObject *dict_getitem(PyObject *dict, PyObject *key)
+{
+	/* borrowed reference, NULL with no exception set if key is not
+	 * in the dictionary */
+#if PY_MAJOR_VERSION < 3
+	int found = PyDict_Contains(dict, key);
+	if(found <= 0)
+		return NULL;
+	return PyDict_GetItem(dict, key);
+#else
+	return PyDict_GetItemWithError(dict, key);
+#endif
+}
+
+
+/*
+ * Construction and destruction
+ */
+
+
+static PyObject *__new__(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+	PyObject *parent;
+	segments_Offsets *new;
+
+	if(!PyArg_ParseTuple(args, "O:_offsets", &parent))
+		return NULL;
+	new = (segments_Offsets *) PyDict_Type.tp_new(type, args, kwds);
+	if(!new)
+		return NULL;
+	Py_INCREF(parent);
+	new->parent = parent;
+
+	return (PyObject *) new;
+}
+
+
+static int __init__(PyObject *self, PyObject *args, PyObject *kwds)
+{
+	PyObject *parent, *old;
+
+	if(!PyArg_ParseTuple(args, "O:_offsets", &parent))
+		return -1;
+	old = ((segments_Offsets *) self)->parent;
+	Py_INCREF(parent);
+	((segments_Offsets *) self)->parent = parent;
+	Py_XDECREF(old);
+
+	return 0;
+}
+
+
+static int traverse(PyObject *self, visitproc visit, void *arg)
+{
+	Py_VISIT(((segments_Offsets *) self)->parent);
+	return PyDict_Type.tp_traverse(self, visit, arg);
+}
+
+
+static int clear(PyObject *self)
+{
+	Py_CLEAR(((segments_Offsets *) self)->parent);
+	return PyDict_Type.tp_clear(self);
+}
+
+
+static void dealloc(PyObject *self)
+{
+	PyObject_GC_UnTrack(self);
+	Py_CLEAR(((segments_Offsets *) self)->parent);
+	PyDict_Type.tp_dealloc(self);
+}
+
+
+/*
+ * Accessors
+ */
+
+
+static int __setitem__(PyObject *self, PyObject *key, PyObject *value)
+{
+	PyObject *old, *delta, *new, *seglist, *result;
+	int nonzero;
+
+	if(!value) {
+		PyErr_SetNone(PyExc_NotImplementedError);
+		return -1;
+	}
+
+	old = dict_getitem(self, key);
+	if(!old)
+		return PyErr_Occurred() ? -1 : PyDict_SetItem(self, key, value);
+	Py_INCREF(old);
+
+	delta = PyNumber_Subtract(value, old);
+	if(!delta) {
+		Py_DECREF(old);
+		return -1;
+	}
+	nonzero = PyObject_IsTrue(delta);
+	if(nonzero <= 0) {
+		Py_DECREF(old);
+		Py_DECREF(delta);
+		return nonzero;
+	}
+
+	seglist = PyObject_GetItem(((segments_Offsets *) self)->parent, key);
+	if(!seglist) {
+		Py_DECREF(old);
+		Py_DECREF(delta);
+		return -1;
+	}
+	result = PyObject_CallMethod(seglist, "shift", "O", delta);
+	Py_DECREF(seglist);
+	if(!result) {
+		Py_DECREF(old);
+		Py_DECREF(delta);
+		return -1;
+	}
+	Py_DECREF(result);
+
+	new = PyNumber_Add(old, delta);
+	Py_DECREF(old);
+	Py_DECREF(delta);
+	if(!new)
+		return -1;
+	nonzero = PyDict_SetItem(self, key, new);
+	Py_DECREF(new);
+
+	return nonzero;
+}
+
+
+static PyObject *update(PyObject *self, PyObject *d)
+{
+	PyObject *items, *iter, *item;
+	PyObject *key, *value;
+	int found;
+
+	items = PyObject_CallMethod(d, "items", NULL);
+	if(!items)
+		return NULL;
+	iter = PyObject_GetIter(items);
+	Py_DECREF(items);
+	if(!iter)
+		return NULL;
+
+	while((item = PyIter_Next(iter))) {
+		if(!PyArg_ParseTuple(item, "OO", &key, &value))
+			goto error;
+		found = PyDict_Contains(self, key);
+		if(found < 0 || (found && PyObject_SetItem(self, key, value) < 0))
+			goto error;
+		Py_DECREF(item);
+	}
+	Py_DECREF(iter);
+	if(PyErr_Occurred())
+		return NULL;
+
+	Py_RETURN_NONE;
+
+error:
+	Py_DECREF(item);
+	Py_DECREF(iter);
+	return NULL;
+}
+
+
+static PyObject *clear_offsets(PyObject *self, PyObject *nul)
+{
+	PyObject *keys, *zero;
+	Py_ssize_t i;
+
+	keys = PyDict_Keys(self);
+	zero = PyFloat_FromDouble(0.0);
+	if(!keys || !zero)
+		goto error;
+
+	for(i = 0; i < PyList_GET_SIZE(keys); i++)
+		if(PyObject_SetItem(self, PyList_GET_ITEM(keys, i), zero) < 0)
+			goto error;
+	Py_DECREF(keys);
+	Py_DECREF(zero);
+
+	Py_RETURN_NONE;
+
+error:
+	Py_XDECREF(keys);
+	Py_XDECREF(zero);
+	return NULL;
+}
+
+
+/*
+ * Pickle support
+ */
+
+
+static PyObject *__reduce__(PyObject *self, PyObject *nul)
+{
+	PyObject *items, *iter;
+
+	items = PyObject_CallMethod(self, "items", NULL);
+	if(!items)
+		return NULL;
+	iter = PyObject_GetIter(items);
+	Py_DECREF(items);
+	if(!iter)
+		return NULL;
+
+	return Py_BuildValue("O(O)OON", (PyObject *) Py_TYPE(self), ((segments_Offsets *) self)->parent, Py_None, Py_None, iter);
+}
+
+
+/*
+ * Stubs to prevent bugs
+ */
+
+
+static PyObject *not_implemented(PyObject *self, PyObject *args)
+{
+	PyErr_SetNone(PyExc_NotImplementedError);
+	return NULL;
+}
+
+
+/*
+ * Type information
+ */
+
+
+static PyMappingMethods as_mapping = {
+	.mp_ass_subscript = __setitem__,
+};
+
+
+static struct PyMethodDef methods[] = {
+	{"__reduce__", __reduce__, METH_NOARGS, "Pickle support."},
+	{"update", update, METH_O, "From a dictionary of offsets, apply each offset to the corresponding segmentlist.  NOTE:  it is acceptable for the offset dictionary to contain entries for which there is no matching segmentlist; no error will be raised, but the offset will be ignored.  This simplifies the case of updating several segmentlistdict objects from a common offset dictionary, when one or more of the segmentlistdicts contains only a subset of the keys."},
+	{"clear", clear_offsets, METH_NOARGS, "Remove the offsets from all segmentlists."},
+	{"fromkeys", not_implemented, METH_VARARGS | METH_CLASS, NULL},
+	{"pop", not_implemented, METH_VARARGS, NULL},
+	{"popitem", not_implemented, METH_VARARGS, NULL},
+	{NULL,}
+};
+
+
+PyTypeObject segments_Offsets_Type = {
+	PyObject_HEAD_INIT(NULL)
+	.tp_base = &PyDict_Type,
+	.tp_basicsize = sizeof(segments_Offsets),
+	.tp_as_mapping = &as_mapping,
+	.tp_clear = clear,
+	.tp_dealloc = dealloc,
+	.tp_doc =
+"Implements the segmentlist offset book-keeping in the\n" \
+"segmentlistdict class.  Not intended for use outside of the\n" \
+"segmentlistdict class.\n" \
+"\n" \
+"Setting an offset shifts the corresponding segmentlist by the\n" \
+"difference between the new offset and the current offset.  If they\n" \
+"are the same, this is a no-op.",
+	.tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC,
+	.tp_init = __init__,
+	.tp_methods = methods,
+	.tp_name = MODULE_NAME "._offsets",
+	.tp_new = __new__,
+	.tp_traverse = traverse,
+};
+
+
+/*
+ * ============================================================================
+ *
+ *                              Module Functions
+ *
+ * ============================================================================
+ */
+
+
+/*
+ * Return the total number of segments in the segmentlists in a dictionary.
+ */
+
+
+PyObject *segments_total_length(PyObject *module, PyObject *seglists)
+{
+	PyObject *key, *value;
+	Py_ssize_t pos = 0;
+	Py_ssize_t n, total = 0;
+
+	if(!PyDict_Check(seglists)) {
+		PyObject *values = PyMapping_Values(seglists);
+		PyObject *iter;
+		if(!values)
+			return NULL;
+		iter = PyObject_GetIter(values);
+		Py_DECREF(values);
+		if(!iter)
+			return NULL;
+		while((value = PyIter_Next(iter))) {
+			n = PyObject_Size(value);
+			Py_DECREF(value);
+			if(n < 0) {
+				Py_DECREF(iter);
+				return NULL;
+			}
+			total += n;
+		}
+		Py_DECREF(iter);
+		if(PyErr_Occurred())
+			return NULL;
+		return PyLong_FromSsize_t(total);
+	}
+
+	while(PyDict_Next(seglists, &pos, &key, &value)) {
+		n = PyList_Check(value) ? PyList_GET_SIZE(value) : PyObject_Size(value);
+		if(n < 0)
+			return NULL;
+		total += n;
+	}
+
+	return PyLong_FromSsize_t(total);
+}
+
+
+/*
+ * Return a shallow copy of a segmentlist.  *copy caches the copy.copy()
+ * function, if it is needed, for the caller to release.
+ */
+
+
+static PyObject *shallow_copy(PyObject *value, PyObject **copy)
+{
+	if(Py_TYPE(value) == &segments_SegmentList_Type)
+		/* the segments are immutable, so a copy of the list is a
+		 * copy of its contents */
+		return PyObject_CallFunctionObjArgs((PyObject *) &segments_SegmentList_Type, value, NULL);
+
+	/* anything else is copied the same way as by the pure Python
+	 * implementation */
+	if(!*copy) {
+		PyObject *module = PyImport_ImportModule("copy");
+		if(!module)
+			return NULL;
+		*copy = PyObject_GetAttrString(module, "copy");
+		Py_DECREF(module);
+		if(!*copy)
+			return NULL;
+	}
+	return PyObject_CallFunctionObjArgs(*copy, value, NULL);
+}
+
+
+/*
+ * For each key in keys, set the segmentlist in the segmentlistdict dst to a
+ * shallow copy of the one in src, and its offset to the offset in src.
+ */
+
+
+PyObject *segments_segmentlistdict_copy(PyObject *module, PyObject *args)
+{
+	PyObject *src, *dst, *keys;
+	PyObject *src_offsets = NULL, *dst_offsets = NULL;
+	PyObject *copy = NULL;
+	PyObject *iter = NULL;
+	PyObject *key = NULL, *value = NULL, *new = NULL;
+
+	if(!PyArg_ParseTuple(args, "OOO:_segmentlistdict_copy", &src, &dst, &keys))
+		return NULL;
+	if(!PyDict_Check(dst)) {
+		PyErr_SetObject(PyExc_TypeError, dst);
+		return NULL;
+	}
+	src_offsets = PyObject_GetAttrString(src, "offsets");
+	dst_offsets = PyObject_GetAttrString(dst, "offsets");
+	if(!src_offsets || !dst_offsets)
+		goto error;
+	if(!PyDict_Check(dst_offsets)) {
+		PyErr_SetObject(PyExc_TypeError, dst_offsets);
+		goto error;
+	}
+	iter = PyObject_GetIter(keys);
+	if(!iter)
+		goto error;
+
+	while((key = PyIter_Next(iter))) {
+		value = PyObject_GetItem(src, key);
+		if(!value)
+			goto error;
+		new = shallow_copy(value, &copy);
+		Py_CLEAR(value);
+		if(!new || PyDict_SetItem(dst, key, new) < 0)
+			goto error;
+		Py_CLEAR(new);
+		value = PyObject_GetItem(src_offsets, key);
+		if(!value || PyDict_SetItem(dst_offsets, key, value) < 0)
+			goto error;
+		Py_CLEAR(value);
+		Py_CLEAR(key);
+	}
+	if(PyErr_Occurred())
+		goto error;
+
+	Py_DECREF(iter);
+	Py_DECREF(src_offsets);
+	Py_DECREF(dst_offsets);
+	Py_XDECREF(copy);
+	Py_RETURN_NONE;
+
+error:
+	Py_XDECREF(key);
+	Py_XDECREF(value);
+	Py_XDECREF(new);
+	Py_XDECREF(iter);
+	Py_XDECREF(src_offsets);
+	Py_XDECREF(dst_offsets);
+	Py_XDECREF(copy);
+	return NULL;
+}
+
+
+/*
+ * The in-place operators of segmentlistdict.  For each key in other, the
+ * segmentlist in self is combined in place with other's by op.  If self
+ * has no segmentlist for the key, missing says what to do:  nothing, add
+ * an empty segmentlist, or add a copy of other's.  The keys are listed
+ * first, so other can be self.
+ */
+
+
+enum missing {
+	MISSING_SKIP,
+	MISSING_EMPTY,
+	MISSING_COPY
+};
+
+
+static PyObject *inplace(PyObject *args, const char *name, binaryfunc op, enum missing missing)
+{
+	PyObject *self, *other;
+	PyObject *keys, *copy = NULL;
+	PyObject *value = NULL, *target = NULL, *result = NULL;
+	Py_ssize_t i;
+
+	if(!PyArg_UnpackTuple(args, name, 2, 2, &self, &other))
+		return NULL;
+	if(!PyDict_Check(self)) {
+		PyErr_SetObject(PyExc_TypeError, self);
+		return NULL;
+	}
+	keys = PyDict_Check(other) ? PyDict_Keys(other) : PySequence_List(other);
+	if(!keys)
+		return NULL;
+
+	for(i = 0; i < PyList_GET_SIZE(keys); i++) {
+		PyObject *key = PyList_GET_ITEM(keys, i);
+		value = PyObject_GetItem(other, key);
+		if(!value)
+			goto error;
+		target = dict_getitem(self, key);
+		if(target) {
+			/* self[key] op= value */
+			Py_INCREF(target);
+			result = op(target, value);
+			if(!result || (result != target && PyObject_SetItem(self, key, result) < 0))
+				goto error;
+			Py_CLEAR(target);
+		} else if(PyErr_Occurred())
+			goto error;
+		else if(missing != MISSING_SKIP) {
+			if(missing == MISSING_EMPTY)
+				result = PyObject_CallFunctionObjArgs((PyObject *) &segments_SegmentList_Type, NULL);
+			else
+				result = shallow_copy(value, &copy);
+			if(!result || PyObject_SetItem(self, key, result) < 0)
+				goto error;
+		}
+		Py_CLEAR(result);
+		Py_CLEAR(value);
+	}
+
+	Py_DECREF(keys);
+	Py_XDECREF(copy);
+	Py_INCREF(self);
+	return self;
+
+error:
+	Py_XDECREF(result);
+	Py_XDECREF(target);
+	Py_XDECREF(value);
+	Py_DECREF(keys);
+	Py_XDECREF(copy);
+	return NULL;
+}
+
+
+PyObject *segments_segmentlistdict_iand(PyObject *module, PyObject *args)
+{
+	return inplace(args, "_segmentlistdict_iand", PyNumber_InPlaceAnd, MISSING_EMPTY);
+}
+
+
+PyObject *segments_segmentlistdict_ior(PyObject *module, PyObject *args)
+{
+	return inplace(args, "_segmentlistdict_ior", PyNumber_InPlaceOr, MISSING_COPY);
+}
+
+
+PyObject *segments_segmentlistdict_isub(PyObject *module, PyObject *args)
+{
+	return inplace(args, "_segmentlistdict_isub", PyNumber_InPlaceSubtract, MISSING_SKIP);
+}
+
+
+/*
+ * Return a dictionary of the extents of the segmentlists in a dictionary,
+ * each computed by segmentlist.extent().
+ */
+
+
+PyObject *segments_segmentlistdict_extent(PyObject *module, PyObject *seglists)
+{
+	PyObject *extent, *result;
+	PyObject *key, *value;
+	Py_ssize_t pos = 0;
+
+	if(!PyDict_Check(seglists)) {
+		PyErr_SetObject(PyExc_TypeError, seglists);
+		return NULL;
+	}
+	extent = PyObject_GetAttrString((PyObject *) &segments_SegmentList_Type, "extent");
+	if(!extent)
+		return NULL;
+	result = PyDict_New();
+	if(!result) {
+		Py_DECREF(extent);
+		return NULL;
+	}
+
+	while(PyDict_Next(seglists, &pos, &key, &value)) {
+		PyObject *seg = PyObject_CallFunctionObjArgs(extent, value, NULL);
+		if(!seg || PyDict_SetItem(result, key, seg) < 0) {
+			Py_XDECREF(seg);
+			Py_DECREF(result);
+			Py_DECREF(extent);
+			return NULL;
+		}
+		Py_DECREF(seg);
+	}
+
+	Py_DECREF(extent);
+	return result;
+}
+
+
+/*
+ * Replace *bound with candidate if candidate compares to it by op.  Steals
+ * the reference to candidate.
+ */
+
+
+static int replace_bound(PyObject **bound, PyObject *candidate, int op)
+{
+	int result = PyObject_RichCompareBool(candidate, *bound, op);
+	if(result > 0) {
+		Py_DECREF(*bound);
+		*bound = candidate;
+	} else
+		Py_DECREF(candidate);
+	return result;
+}
+
+
+/*
+ * Return the segment spanning the extents of the non-empty segmentlists in
+ * a dictionary.  Of equal bounds, the first is kept, as by min() and max().
+ */
+
+
+PyObject *segments_segmentlistdict_extent_all(PyObject *module, PyObject *seglists)
+{
+	PyObject *lo = NULL, *hi = NULL;
+	PyObject *key, *value;
+	Py_ssize_t pos = 0;
+
+	if(!PyDict_Check(seglists)) {
+		PyErr_SetObject(PyExc_TypeError, seglists);
+		return NULL;
+	}
+
+	while(PyDict_Next(seglists, &pos, &key, &value)) {
+		PyObject *seg, *a, *b;
+		int nonempty = PyObject_IsTrue(value);
+		if(nonempty < 0)
+			goto error;
+		if(!nonempty)
+			continue;
+		seg = PyObject_CallMethod(value, "extent", NULL);
+		if(!seg)
+			goto error;
+		a = PySequence_GetItem(seg, 0);
+		b = a ? PySequence_GetItem(seg, 1) : NULL;
+		Py_DECREF(seg);
+		if(!b) {
+			Py_XDECREF(a);
+			goto error;
+		}
+		if(!lo) {
+			lo = a;
+			hi = b;
+			continue;
+		}
+		if(replace_bound(&lo, a, Py_LT) < 0) {
+			Py_DECREF(b);
+			goto error;
+		}
+		if(replace_bound(&hi, b, Py_GT) < 0)
+			goto error;
+	}
+
+	if(!lo) {
+		PyErr_SetString(PyExc_ValueError, "empty list");
+		return NULL;
+	}
+	return segments_Segment_New(&segments_Segment_Type, lo, hi);
+
+error:
+	Py_XDECREF(lo);
+	Py_XDECREF(hi);
+	return NULL;
+}
+
+
+/*
+ * Return the total length of the intersection of k coalesced lists of
+ * segments, each given as an array of n[i] (lo, hi) pairs, shifted by the
+ * amounts in shift.  idx is scratch space for k indexes.  The segment that
+ * ends first can't intersect anything after the segments it is compared
+ * with, so each step moves past it:  O(N k) for N segments in k lists.
+ */
+
+
+static double coincident_livetime(double **bounds, const Py_ssize_t *n, const double *shift, Py_ssize_t k, Py_ssize_t *idx)
+{
+	double total = 0.0;
+	Py_ssize_t i;
+
+	if(!k)
+		return total;
+	for(i = 0; i < k; i++)
+		idx[i] = 0;
+
+	while(1) {
+		double lo = -Py_HUGE_VAL, hi = +Py_HUGE_VAL;
+		Py_ssize_t first = 0;
+		for(i = 0; i < k; i++) {
+			double a, b;
+			if(idx[i] >= n[i])
+				return total;
+			a = bounds[i][2 * idx[i]] + shift[i];
+			b = bounds[i][2 * idx[i] + 1] + shift[i];
+			if(a > lo)
+				lo = a;
+			if(b < hi) {
+				hi = b;
+				first = i;
+			}
+		}
+		if(lo < hi)
+			total += hi - lo;
+		idx[first]++;
+	}
+}
+
+
+PyObject *segments_coincident_livetimes(PyObject *module, PyObject *args)
+{
+	PyObject *bounds_seq, *shifts_seq;
+	PyObject *result = NULL;
+	Py_buffer *views = NULL;
+	double **bounds = NULL;
+	double *shifts = NULL, *livetimes = NULL;
+	Py_ssize_t *n = NULL, *idx = NULL;
+	Py_ssize_t k, m, nviews = 0, i, j;
+
+	if(!PyArg_ParseTuple(args, "OO:_coincident_livetimes", &bounds_seq, &shifts_seq))
+		return NULL;
+	bounds_seq = PySequence_Fast(bounds_seq, "bounds must be a sequence");
+	if(!bounds_seq)
+		return NULL;
+	shifts_seq = PySequence_Fast(shifts_seq, "shifts must be a sequence");
+	if(!shifts_seq) {
+		Py_DECREF(bounds_seq);
+		return NULL;
+	}
+	k = PySequence_Fast_GET_SIZE(bounds_seq);
+	m = PySequence_Fast_GET_SIZE(shifts_seq);
+
+	/* +1 so that none is empty */
+	views = PyMem_New(Py_buffer, k + 1);
+	bounds = PyMem_New(double *, k + 1);
+	n = PyMem_New(Py_ssize_t, k + 1);
+	idx = PyMem_New(Py_ssize_t, k + 1);
+	shifts = PyMem_New(double, k * m + 1);
+	livetimes = PyMem_New(double, m + 1);
+	if(!views || !bounds || !n || !idx || !shifts || !livetimes) {
+		PyErr_NoMemory();
+		goto done;
+	}
+
+	/* the boundaries of each list, as arrays of doubles */
+	for(i = 0; i < k; i++) {
+		PyObject *obj = PySequence_Fast_GET_ITEM(bounds_seq, i);
+		Py_buffer *view = &views[i];
+#if PY_MAJOR_VERSION < 3
+		/* Python 2's array.array has only the old buffer interface,
+		 * which gives no format, so the contents are taken to be
+		 * doubles */
+		if(!PyObject_CheckBuffer(obj)) {
+			const void *buf;
+			Py_ssize_t len;
+			if(PyObject_AsReadBuffer(obj, &buf, &len) < 0)
+				goto done;
+			memset(view, 0, sizeof(*view));
+			view->buf = (void *) buf;
+			view->len = len;
+			view->itemsize = sizeof(double);
+		} else
+#endif
+		if(PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+			goto done;
+		nviews++;
+		if(view->itemsize != sizeof(double) || (view->format && strcmp(view->format, "d") && strcmp(view->format, "=d") && strcmp(view->format, "@d")) || (view->len / view->itemsize) % 2) {
+			PyErr_SetString(PyExc_ValueError, "bounds must be arrays of doubles holding (lo, hi) pairs");
+			goto done;
+		}
+		bounds[i] = (double *) view->buf;
+		n[i] = view->len / view->itemsize / 2;
+	}
+
+	/* the shifts, one row of k for each offset vector */
+	for(j = 0; j < m; j++) {
+		PyObject *row = PySequence_Fast(PySequence_Fast_GET_ITEM(shifts_seq, j), "shifts must be a sequence of sequences");
+		if(!row)
+			goto done;
+		if(PySequence_Fast_GET_SIZE(row) != k) {
+			Py_DECREF(row);
+			PyErr_SetString(PyExc_ValueError, "each row of shifts must have one entry for each list of bounds");
+			goto done;
+		}
+		for(i = 0; i < k; i++) {
+			shifts[j * k + i] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(row, i));
+			if(shifts[j * k + i] == -1.0 && PyErr_Occurred()) {
+				Py_DECREF(row);
+				goto done;
+			}
+		}
+		Py_DECREF(row);
+	}
+
+	/* the buffers stay exported, so the arrays can't be resized while
+	 * the GIL is released */
+	Py_BEGIN_ALLOW_THREADS
+	for(j = 0; j < m; j++)
+		livetimes[j] = coincident_livetime(bounds, n, &shifts[j * k], k, idx);
+	Py_END_ALLOW_THREADS
+
+	result = PyList_New(m);
+	if(!result)
+		goto done;
+	for(j = 0; j < m; j++) {
+		PyObject *livetime = PyFloat_FromDouble(livetimes[j]);
+		if(!livetime) {
+			Py_CLEAR(result);
+			goto done;
+		}
+		PyList_SET_ITEM(result, j, livetime);
+	}
+
+done:
+	while(nviews)
+		PyBuffer_Release(&views[--nviews]);
+	PyMem_Free(views);
+	PyMem_Free(bounds);
+	PyMem_Free(n);
+	PyMem_Free(idx);
+	PyMem_Free(shifts);
+	PyMem_Free(livetimes);
+	Py_DECREF(bounds_seq);
+	Py_DECREF(shifts_seq);
+	return result;
+}
@@ -40,12 +40,29 @@
  */
 
 
-#define MODULE_DOC "C implementations of the infinity, segment, and segmentlist classes from the segments module."
+#define MODULE_DOC "C implementations of the infinity, segment, and segmentlist classes, and of parts of the segmentlistdict class, from the segments module."
+
+
+static struct PyMethodDef methods[] = {
+	{"_segmentlist_frombuffer", segments_segmentlist_frombuffer, METH_VARARGS, "_segmentlist_frombuffer(typecode, buffer, byteorder)\n\nReconstruct a segmentlist pickled with pickle protocol 2 or later from the\nbuffer of its boundaries, an array of int64 (typecode \"q\") or float64\n(typecode \"d\") values in the given byte order (\"little\" or \"big\")."},
+	{"_coalesced", segments_coalesced, METH_O, "_coalesced(seglist)\n\nReturn seglist if it is a coalesced list of segments, otherwise a new\ncoalesced segmentlist of its segments."},
+	{"_coincidences", segments_coincidences, METH_VARARGS, "_coincidences(seglists, n, offsets = None, durations = False, first = False)\n\nCompare each of the first n coalesced segmentlists in seglists with each\nof the rest, and return a list of n rows of len(seglists) - n entries\ngiving, for each pair, whether or not the two lists intersect, or if\ndurations is true the length of their intersection.  One sweep over the\nlists merged in order of the segments' lower bounds.  seglists and the\nlists in it are only iterated over once, they can be generators.  offsets\nis as for _vote().  If first is true the sweep stops at the first\nintersection found."},
+	{"_coincident_livetimes", segments_coincident_livetimes, METH_VARARGS, "_coincident_livetimes(bounds, shifts)\n\nReturn a list of the total lengths of the intersection of the coalesced\nsegment lists whose boundaries are in bounds, a sequence of arrays of\ndoubles (lo, hi, lo, hi, ...), for each row of shifts, a sequence of\nsequences of the amounts by which to shift each list.  O(N k) per row for\nN segments in k lists.  The GIL is released during the computation."},
+	{"_segmentlistdict_copy", segments_segmentlistdict_copy, METH_VARARGS, "_segmentlistdict_copy(src, dst, keys)\n\nFor each key in keys, set the segmentlist in the segmentlistdict dst to a\nshallow copy of the one in src, and its offset to the offset in src.  dst's\n__setitem__() is not used."},
+	{"_segmentlistdict_extent", segments_segmentlistdict_extent, METH_O, "_segmentlistdict_extent(seglists)\n\nReturn a dictionary of the results of segmentlist.extent() for each of the\nsegmentlists in the dictionary seglists."},
+	{"_segmentlistdict_extent_all", segments_segmentlistdict_extent_all, METH_O, "_segmentlistdict_extent_all(seglists)\n\nReturn the segment spanning the .extent() of each of the non-empty\nsegmentlists in the dictionary seglists.  ValueError is raised if they are\nall empty."},
+	{"_segmentlistdict_iand", segments_segmentlistdict_iand, METH_VARARGS, "_segmentlistdict_iand(self, other)\n\nsegmentlistdict.__iand__() without an executor:  for each key in other,\nself[key] &= other[key], or self[key] = segmentlist() if self has no such\nkey.  Returns self."},
+	{"_segmentlistdict_ior", segments_segmentlistdict_ior, METH_VARARGS, "_segmentlistdict_ior(self, other)\n\nsegmentlistdict.__ior__() without an executor:  for each key in other,\nself[key] |= other[key], or self[key] = a shallow copy of other[key] if\nself has no such key.  Returns self."},
+	{"_segmentlistdict_isub", segments_segmentlistdict_isub, METH_VARARGS, "_segmentlistdict_isub(self, other)\n\nsegmentlistdict.__isub__() without an executor:  for each key in other\nthat is in self, self[key] -= other[key].  Returns self."},
+	{"_total_length", segments_total_length, METH_O, "_total_length(seglists)\n\nReturn the total number of segments in the segmentlists in the dictionary\nseglists."},
+	{"_vote", segments_vote, METH_VARARGS, "_vote(seglists, n, offsets = None)\n\nReturn the segmentlist of the intervals during which at least n of the\ncoalesced segmentlists in seglists intersect.  A k-way sweep over the\nlists, O(N log k) for N segments in k lists.  seglists and the lists in it\nare only iterated over once, they can be generators.  If offsets is not\nNone it is a sequence giving, for each list, an amount to add to the\nboundaries of its segments as they are read, or None."},
+	{NULL,}
+};
 
 
 static PyModuleDef moduledef = {
 	PyModuleDef_HEAD_INIT,
-	MODULE_NAME, MODULE_DOC, -1, NULL
+	MODULE_NAME, MODULE_DOC, -1, methods
 };
 
 
@@ -65,6 +82,9 @@ PyMODINIT_FUNC PyInit___segments(void)
 	if(PyType_Ready(&segments_SegmentList_Type) < 0)
 		goto done;
 
+	if(PyType_Ready(&segments_Offsets_Type) < 0)
+		goto done;
+
 	/*
 	 * Initialize module
 	 */
@@ -110,6 +130,21 @@ PyMODINIT_FUNC PyInit___segments(void)
 	Py_INCREF(&segments_SegmentList_Type);
 	PyModule_AddObject(module, "segmentlist", (PyObject *) &segments_SegmentList_Type);
 
+	/*
+	 * Create the offsets class used by segmentlistdict
+	 */
+
+	Py_INCREF(&segments_Offsets_Type);
+	PyModule_AddObject(module, "_offsets", (PyObject *) &segments_Offsets_Type);
+
+	/*
+	 * The numeric fast paths of the segmentlist arithmetic release the
+	 * GIL, see segmentlist.c
+	 */
+
+	Py_INCREF(Py_True);
+	PyModule_AddObject(module, "_releases_gil", Py_True);
+
 done:
 	return module;
 }
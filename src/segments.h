@@ -122,4 +122,59 @@ typedef PyListObject segments_SegmentList;
 extern PyTypeObject segments_SegmentList_Type;
 
 
+/*
+ * Module functions
+ */
+
+
+PyObject *segments_segmentlist_frombuffer(PyObject *, PyObject *);
+PyObject *segments_coalesced(PyObject *, PyObject *);
+PyObject *segments_vote(PyObject *, PyObject *);
+PyObject *segments_coincidences(PyObject *, PyObject *);
+
+
+/*
+ * ============================================================================
+ *
+ *                           segmentlistdict Support
+ *
+ * ============================================================================
+ */
+
+
+/*
+ * Structure
+ */
+
+
+typedef struct {
+	PyDictObject dict;
+	/* the segmentlistdict whose offsets these are */
+	PyObject *parent;
+} segments_Offsets;
+
+
+/*
+ * Type
+ */
+
+
+extern PyTypeObject segments_Offsets_Type;
+
+
+/*
+ * Module functions
+ */
+
+
+PyObject *segments_total_length(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_copy(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_iand(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_ior(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_isub(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_extent(PyObject *, PyObject *);
+PyObject *segments_segmentlistdict_extent_all(PyObject *, PyObject *);
+PyObject *segments_coincident_livetimes(PyObject *, PyObject *);
+
+
 #endif /* __SEGMENTS_H__ */
@@ -0,0 +1,133 @@
+import pickle
+import random
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from segments import segments
+from segments.arrays import segmentarray
+from six.moves import range
+
+import verifyutils
+verifyutils.segments = segments
+
+
+#
+#  How many times to repeat the algebraic tests
+#
+
+
+algebra_repeats = 8000
+algebra_listlength = 200
+
+
+def random_pair():
+    a = verifyutils.random_coalesced_list(
+        random.randint(1, algebra_listlength))
+    b = verifyutils.random_coalesced_list(
+        random.randint(1, algebra_listlength))
+    return a, b
+
+
+#
+# Define the components of the test suite.
+#
+
+
+class TestSegmentarray(object):
+    def test_conversion(self):
+        a = segments.segmentlist([segments.segment(0, 10),
+                                  segments.segment(20, 30)])
+        x = segmentarray(a)
+        assert x.bounds.dtype == numpy.int64
+        assert segments.segmentlist(x) == a
+        assert all(type(bound) is int for seg in x for bound in seg)
+
+        a = segments.segmentlist([segments.segment(0.5, 10),
+                                  segments.segment(20, segments.infinity())])
+        x = segmentarray(a)
+        assert x.bounds.dtype == numpy.float64
+        assert segments.segmentlist(x) == a
+        assert x[-1][1] is segments.PosInfinity
+
+        assert len(segmentarray()) == 0
+        assert segmentarray(numpy.array([[0, 10], [20, 30]])) == [
+            segments.segment(0, 10), segments.segment(20, 30)]
+        with pytest.raises(ValueError):
+            segmentarray(numpy.arange(3))
+
+    def test_and(self):
+        for i in range(algebra_repeats):
+            a, b = random_pair()
+            assert segmentarray(a) & segmentarray(b) == a & b
+
+    def test_or(self):
+        for i in range(algebra_repeats):
+            a, b = random_pair()
+            assert segmentarray(a) | segmentarray(b) == a | b
+
+    def test_sub(self):
+        for i in range(algebra_repeats):
+            a, b = random_pair()
+            assert segmentarray(a) - segmentarray(b) == a - b
+            assert segmentarray(b) - segmentarray(a) == b - a
+
+    def test_invert(self):
+        assert ~segmentarray() == segments.segmentlist(
+            [segments.segment(-segments.infinity(), segments.infinity())])
+        for i in range(algebra_repeats):
+            a = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            assert ~segmentarray(a) == ~a
+
+    def test_intersects(self):
+        for i in range(algebra_repeats):
+            a, b = random_pair()
+            assert segmentarray(a).intersects(segmentarray(b)) == a.intersects(b)
+            seg = b[0]
+            assert segmentarray(a).intersects_segment(seg) == a.intersects_segment(seg)
+
+    def test_contains(self):
+        for i in range(algebra_repeats // 10):
+            a, b = random_pair()
+            x = segmentarray(a)
+            for seg in b:
+                assert (seg in x) == (seg in a)
+                assert (seg[0] in x) == (seg[0] in a)
+            assert (b in x) == (b in a)
+            assert (a & b) in x
+
+    def test_coalesce(self):
+        for i in range(algebra_repeats):
+            a = verifyutils.random_uncoalesced_list(
+                random.randint(1, algebra_listlength))
+            assert segmentarray(a).coalesce() == a.coalesce()
+
+    def test_protract_contract_shift(self):
+        a = segments.segmentlist([segments.segment(3, 7),
+                                  segments.segment(13, 17)])
+        assert segmentarray(a).protract(3) == segments.segmentlist(
+            [segments.segment(0, 20)])
+        assert segmentarray(a).contract(1) == segments.segmentlist(
+            [segments.segment(4, 6), segments.segment(14, 16)])
+        assert segmentarray(a).shift(10) == segments.segmentlist(
+            [segments.segment(13, 17), segments.segment(23, 27)])
+        for i in range(algebra_repeats // 10):
+            a = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            x = random.random() / 100.
+            assert segmentarray(a).protract(x) == segments.segmentlist(a).protract(x)
+            assert segmentarray(a).contract(x) == segments.segmentlist(a).contract(x)
+
+    def test_accessors(self):
+        a = verifyutils.random_uncoalesced_list(algebra_listlength)
+        x = segmentarray(a)
+        assert abs(x) == pytest.approx(abs(a))
+        assert x.extent() == a.extent()
+        with pytest.raises(ValueError):
+            segmentarray().extent()
+
+    def test_pickle(self):
+        x = segmentarray(verifyutils.random_coalesced_list(10))
+        assert pickle.loads(pickle.dumps(x)) == x
@@ -1,5 +1,6 @@
 import doctest
 import math
+import operator
 import pickle
 import random
 import sys
@@ -377,6 +378,21 @@ class TestSegmentlist(object):
             assert c == a - (a - b)
             assert c == b - (b - a)
 
+        # a few segments against a long list
+        a = verifyutils.random_coalesced_list(algebra_listlength * 50)
+        for i in range(algebra_repeats // 10):
+            b = verifyutils.random_coalesced_list(random.randint(1, 4))
+            assert a & b == a - (a - b)
+            assert b & a == a - (a - b)
+
+        # segments not cut are kept, and other can be any sequence
+        a = segments.segmentlist([segments.segment(0, 10), segments.segment(20, 30)])
+        c = a & segments.segmentlist([segments.segment(-5, 15), segments.segment(25, 35)])
+        assert c == segments.segmentlist([segments.segment(0, 10), segments.segment(25, 30)])
+        assert c[0] is a[0]
+        a &= [(5, 25)]
+        assert a == segments.segmentlist([segments.segment(5, 10), segments.segment(20, 25)])
+
     def test_or(self):
         for i in range(algebra_repeats):
             a = verifyutils.random_coalesced_list(
@@ -394,6 +410,17 @@ class TestSegmentlist(object):
             # make sure c contains nothing except a and b
             assert segments.segmentlist([]) == c - a - b
 
+        # lists of similar size are merged, keeping the segments that
+        # don't overlap anything
+        a = segments.segmentlist([segments.segment(0, 1), segments.segment(4, 5), segments.segment(8, 9)])
+        b = segments.segmentlist([segments.segment(1, 2), segments.segment(6, 7)])
+        c = a | b
+        assert c == segments.segmentlist([segments.segment(0, 2), segments.segment(4, 5), segments.segment(6, 7), segments.segment(8, 9)])
+        assert c[1] is a[1] and c[2] is b[1] and c[3] is a[2]
+        a |= [(2, 3), (5, 6)]
+        assert a == segments.segmentlist([segments.segment(0, 1), segments.segment(2, 3), segments.segment(4, 6), segments.segment(8, 9)])
+        assert all(type(seg) is segments.segment for seg in a)
+
     def test_xor(self):
         for i in range(algebra_repeats):
             a = verifyutils.random_coalesced_list(
@@ -414,6 +441,28 @@ class TestSegmentlist(object):
             assert segments.segmentlist([]) == a - (c | a & b)
             assert segments.segmentlist([]) == b - (c | a & b)
 
+    def test_durations(self):
+        for i in range(algebra_repeats // 10):
+            a = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            b = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            assert a.intersection_duration(b) == abs(a & b)
+            assert a.union_duration(b) == abs(a | b)
+            assert a.difference_duration(b) == abs(a - b)
+
+        # the results are the same type as abs() gives
+        a = segments.segmentlist([segments.segment(0.5, 10.0), segments.segment(20.0, 30.0)])
+        b = segments.segmentlist([segments.segment(5.0, 25.0)])
+        for x, y in ((a, b), (a, segments.segmentlist()), (segments.segmentlist(), b)):
+            for op, duration in ((operator.and_, x.intersection_duration), (operator.or_, x.union_duration), (operator.sub, x.difference_duration)):
+                assert duration(y) == abs(op(x, y))
+                assert type(duration(y)) is type(abs(op(x, y)))
+        b = segments.segmentlist([segments.segment(5, segments.infinity())])
+        assert a.intersection_duration(b) == abs(a & b) == 15.0
+        assert a.union_duration(b) == abs(a | b)
+        assert a.difference_duration([(5, 25)]) == 9.5
+
     def test_protract(self):
         assert segments.segmentlist([segments.segment(0, 20)]) == (
             segments.segmentlist([segments.segment(3, 7),
@@ -464,6 +513,39 @@ class TestSegmentlist(object):
                 assert d.intersects(b)
                 assert a.intersects(b)
 
+    def test_contains_many(self):
+        numpy = pytest.importorskip("numpy")
+        assert segments.segmentlist().contains_many([0., 1.]).tolist() == [False, False]
+        for i in range(algebra_repeats // 10):
+            a = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            times = numpy.concatenate((
+                numpy.random.uniform(a[0][0] - 1, a[-1][1] + 1, 100),
+                [bound for seg in a for bound in seg]))
+            expected = [t in a for t in times.tolist()]
+            assert a.contains_many(times).tolist() == expected
+            numpy.random.shuffle(times)
+            expected = [t in a for t in times.tolist()]
+            assert a.contains_many(times).tolist() == expected
+
+    def test_find_many(self):
+        numpy = pytest.importorskip("numpy")
+        assert segments.segmentlist().find_many([0., 1.]).tolist() == [-1, -1]
+        for i in range(algebra_repeats // 10):
+            a = verifyutils.random_coalesced_list(
+                random.randint(1, algebra_listlength))
+            times = numpy.random.uniform(a[0][0] - 1, a[-1][1] + 1, 100)
+            expected = [a.find(t) if t in a else -1 for t in times.tolist()]
+            assert a.find_many(times).tolist() == expected
+            times.sort()
+            expected = [a.find(t) if t in a else -1 for t in times.tolist()]
+            assert a.find_many(times).tolist() == expected
+            segs = numpy.concatenate((
+                numpy.random.uniform(a[0][0] - 1, a[-1][1] + 1, (100, 2)),
+                list(a)))
+            expected = [a.find(segments.segment(seg)) if segments.segment(seg) in a else -1 for seg in segs.tolist()]
+            assert a.find_many(segs).tolist() == expected
+
     def test_extent(self):
         assert segments.segmentlist([(1, 0)]).extent() == (
             segments.segment(0, 1))
@@ -489,6 +571,31 @@ class TestSegmentlist(object):
                 b -= segments.segmentlist([seg])
             assert b == segments.segmentlist([])
 
+    def test_coalesce_parallel(self):
+        pytest.importorskip("concurrent.futures")
+        for i in range(algebra_repeats // 100):
+            a = verifyutils.random_uncoalesced_list(random.randint(1, 5000))
+            n = random.randint(1, 8)
+            assert segments.segmentlist(a).coalesce(parallel = n) == segments.segmentlist(a).coalesce()
+        with pytest.raises(TypeError):
+            segments.segmentlist().coalesce(parallel = 2.5)
+
+    def test_numeric_boundaries(self):
+        # mixing ints, floats, infinities and ints too large to be
+        # represented exactly as floats must give the same answers, and
+        # keep the same boundary objects, whatever the implementation
+        big = 2**60
+        x = segments.segmentlist([segments.segment(2.0, 3), segments.segment(1, 2), segments.segment(-segments.infinity(), -5)]).coalesce()
+        assert x == segments.segmentlist([segments.segment(-segments.infinity(), -5), segments.segment(1, 3)])
+        assert [tuple(map(type, seg)) for seg in x] == [(segments.infinity, int), (int, int)]
+        x = segments.segmentlist([segments.segment(big, big + 2), segments.segment(big + 1, big + 3)]).coalesce()
+        assert x == segments.segmentlist([segments.segment(big, big + 3)])
+        x = segments.segmentlist([segments.segment(0, 10)]) - segments.segmentlist([segments.segment(2.5, 5), segments.segment(5, 6)])
+        assert x == segments.segmentlist([segments.segment(0, 2.5), segments.segment(6, 10)])
+        assert [tuple(map(type, seg)) for seg in x] == [(int, float), (int, int)]
+        x = segments.segmentlist([segments.segment(big, big + 3)]) - segments.segmentlist([segments.segment(big + 1, big + 2)])
+        assert x == segments.segmentlist([segments.segment(big, big + 1), segments.segment(big + 2, big + 3)])
+
     def test_typesafety(self):
         w = "segments.segmentlist([segments.segment(0, 10), segments.segment(20, 30)])"
         x = "segments.segment(10, 20)"
@@ -511,13 +618,82 @@ class TestSegmentlist(object):
             [segments.segment(0, 30)])
 
 
+    def test_threads(self):
+        # long enough for the C extension to release the GIL
+        futures = pytest.importorskip("concurrent.futures")
+        pairs = [(verifyutils.random_uncoalesced_list(5000), verifyutils.random_coalesced_list(2000)) for i in range(8)]
+
+        def evaluate(pair):
+            a, b = segments.segmentlist(pair[0]), pair[1]
+            a.coalesce()
+            return a & b, a | b, a - b
+
+        expected = list(map(evaluate, pairs))
+        with futures.ThreadPoolExecutor(4) as executor:
+            assert list(executor.map(evaluate, pairs)) == expected
+
+    def test_pickle(self):
+        lists = [segments.segmentlist(),
+                 segments.segmentlist([segments.segment(0, 10), segments.segment(20, 30)]),
+                 segments.segmentlist([segments.segment(0.5, 10.), segments.segment(20.25, 30.)]),
+                 segments.segmentlist([segments.segment(0, 10.5)]),
+                 segments.segmentlist([segments.segment(0, 2**70)]),
+                 segments.segmentlist([segments.segment(0, segments.infinity())])]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for a in lists:
+                b = pickle.loads(pickle.dumps(a, protocol = protocol))
+                assert type(b) is type(a)
+                assert b == a
+                assert [tuple(map(type, seg)) for seg in b] == [tuple(map(type, seg)) for seg in a]
+
+        if pickle.HIGHEST_PROTOCOL >= 5:
+            # the boundaries are sent out-of-band
+            a = verifyutils.random_coalesced_list(algebra_listlength)
+            buffers = []
+            data = pickle.dumps(a, protocol = 5, buffer_callback = buffers.append)
+            assert len(buffers) == 1
+            assert len(data) < 100
+            assert pickle.loads(data, buffers = buffers) == a
+
+
 class TestSegmentlistdict(object):
     def test_extent_all(self):
         a = segments.segmentlistdict({
             "H1": segments.segmentlist(),
             "L1": segments.segmentlist([segments.segment(25, 35)])})
         assert a.extent_all() == segments.segment(25, 35)
-
+        a["V1"] = segments.segmentlist([segments.segment(30, 40), segments.segment(-5, 0)])
+        assert a.extent_all() == segments.segment(-5, 40)
+        with pytest.raises(ValueError):
+            a.extent()
+        del a["H1"]
+        assert a.extent() == {"L1": segments.segment(25, 35), "V1": segments.segment(-5, 40)}
+        with pytest.raises(ValueError):
+            segments.segmentlistdict({"H1": segments.segmentlist()}).extent_all()
+
+    def test_inplace(self):
+        keys = ("H1", "H2", "L1", "V1")
+        for i in range(algebra_repeats // 10):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys[:3])
+            b = dict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys[1:])
+            for op in (operator.iand, operator.ior, operator.isub):
+                c = a.copy()
+                lists = dict(c)
+                expected = dict((key, op(segments.segmentlist(value), b[key]) if key in b else value) for key, value in a.items())
+                if op is operator.iand:
+                    expected["V1"] = segments.segmentlist()
+                elif op is operator.ior:
+                    expected["V1"] = b["V1"]
+                assert op(c, b) is c
+                assert c == expected
+                # the segmentlists are modified in place, and those
+                # added are not other's
+                assert all(c[key] is lists[key] for key in lists)
+                assert "V1" not in c or c["V1"] is not b["V1"]
+                assert c.offsets == dict((key, 0.0) for key in c)
+                # self is other, and aliased segmentlists
+                c["G1"] = c["H1"]
+                assert op(c, c) is c
     def test_intersects(self):
         a = segments.segmentlistdict({
             "H1": segments.segmentlist([segments.segment(0, 10),
@@ -544,6 +720,77 @@ class TestSegmentlistdict(object):
 
         assert not a.all_intersects_all(b)
 
+    def test_vote(self):
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 15)]),
+            "L1": segments.segmentlist([segments.segment(5, 20),
+                                        segments.segment(30, 40)]),
+            "V1": segments.segmentlist([segments.segment(10, 25),
+                                        segments.segment(35, segments.infinity())])})
+        assert a.union(a) == segments.segmentlist([segments.segment(0, 25), segments.segment(30, segments.infinity())])
+        assert a.intersection(a) == segments.segmentlist([segments.segment(10, 15)])
+        assert a.vote(a, 2) == segments.segmentlist([segments.segment(5, 20), segments.segment(35, 40)])
+        assert a.vote(("H1", "L1"), 3) == segments.segmentlist()
+        assert a.union(()) == a.intersection(()) == segments.segmentlist()
+        with pytest.raises(KeyError):
+            a.union(("H1", "G1"))
+
+        for i in range(algebra_repeats // 10):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in ("H1", "H2", "L1", "V1"))
+            union = segments.segmentlist()
+            intersection = segments.segmentlist(a["H1"])
+            for key in a:
+                union |= a[key]
+                intersection &= a[key]
+            assert a.union(a) == union
+            assert a.intersection(a) == intersection
+            assert a.vote(a, 3) == (a.vote(("H1", "H2", "L1"), 3) | a.vote(("H1", "H2", "V1"), 3) | a.vote(("H1", "L1", "V1"), 3) | a.vote(("H2", "L1", "V1"), 3))
+
+        # uncoalesced lists are swept as coalesced copies, and the
+        # result is of the lists' type
+        class seglist(segments.segmentlist):
+            pass
+        for i in range(algebra_repeats // 10):
+            a = segments.segmentlistdict((key, seglist(verifyutils.random_uncoalesced_list(random.randint(1, algebra_listlength)))) for key in ("H1", "H2", "L1"))
+            b = segments.segmentlistdict((key, segments.segmentlist(value)) for key, value in a.items())
+            union = segments.segmentlist()
+            intersection = segments.segmentlist(b["H1"]).coalesce()
+            for key in b:
+                union |= segments.segmentlist(b[key]).coalesce()
+                intersection &= segments.segmentlist(b[key]).coalesce()
+            assert a.union(a) == union
+            assert a.intersection(a) == intersection
+            assert type(a.union(a)) is type(a.intersection(a)) is type(a.vote(a, 2)) is seglist
+            assert a == b
+
+    def test_parallel(self):
+        futures = pytest.importorskip("concurrent.futures")
+        keys = ("H1", "H2", "L1", "V1")
+        pairs = []
+        for i in range(20):
+            a = segments.segmentlistdict((key, verifyutils.random_uncoalesced_list(random.randint(1, algebra_listlength))) for key in keys)
+            b = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys[1:])
+            pairs.append((a, b))
+
+        def evaluate(a, b):
+            a = a.copy()
+            lists = dict(a)
+            results = [dict(a.coalesce()), dict(a & b), dict(a | b), dict(a - b), a.map(abs)]
+            a.protract(3).contract(5)
+            a &= b
+            results.append(dict(a))
+            # in-place operations keep the segmentlist objects
+            assert all(a[key] is lists[key] for key in keys)
+            # aliased segmentlists are modified in turn
+            a["G1"] = a["H1"]
+            results.append(dict(a.protract(1)))
+            return results
+
+        expected = [evaluate(a, b) for a, b in pairs]
+        for executor in (futures.ThreadPoolExecutor(4), futures.ProcessPoolExecutor(2)):
+            with executor, segments.segmentlistdict.parallel(executor):
+                assert [evaluate(a, b) for a, b in pairs] == expected
+
     def test_pickle(self):
         a = segments.segmentlistdict({
             "H1": segments.segmentlist([segments.segment(0, 10),
@@ -552,3 +799,188 @@ class TestSegmentlistdict(object):
         assert a == pickle.loads(pickle.dumps(a, protocol = 0))
         assert a == pickle.loads(pickle.dumps(a, protocol = 1))
         assert a == pickle.loads(pickle.dumps(a, protocol = 2))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            b = pickle.loads(pickle.dumps(a, protocol = protocol))
+            assert b.offsets == a.offsets
+            b.offsets.clear()
+            assert b["H1"] == segments.segmentlist([segments.segment(0, 10), segments.segment(20, 30)])
+
+    def test_offsets(self):
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 10)]),
+            "L1": segments.segmentlist([segments.segment(5, 15)])})
+        b = a.copy()
+        a.offsets["H1"] = 6
+        assert a["H1"] == segments.segmentlist([segments.segment(6, 16)])
+        a.offsets.update({"H1": 1, "L1": -5, "V1": 2})
+        assert a == {"H1": [segments.segment(1, 11)], "L1": [segments.segment(0, 10)]}
+        assert a.offsets == {"H1": 1, "L1": -5}
+        # copies are independent
+        assert b == {"H1": [segments.segment(0, 10)], "L1": [segments.segment(5, 15)]}
+        c = a.copy(["H1"])
+        assert c.offsets == {"H1": 1}
+        c.offsets.clear()
+        assert c == {"H1": [segments.segment(0, 10)]}
+        assert a["H1"] == segments.segmentlist([segments.segment(1, 11)])
+        for method in ("pop", "popitem", "__delitem__"):
+            with pytest.raises(NotImplementedError):
+                getattr(a.offsets, method)("H1")
+        with pytest.raises(TypeError):
+            a.offsets["H1"] = None
+        assert a.offsets["H1"] == 1
+
+        # offsets shift the lists, including references held to them
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 10)]),
+            "L1": segments.segmentlist([segments.segment(5, 15)])})
+        h1 = a["H1"]
+        a.offsets["H1"] = 10
+        a.offsets["H1"] = 5
+        assert h1 == segments.segmentlist([segments.segment(5, 15)])
+        assert a["H1"] is h1
+
+        # offset vectors are applied as the lists are read, leaving
+        # them alone
+        for i in range(algebra_repeats // 100):
+            keys = ("H1", "L1", "V1")
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys)
+            a.offsets["L1"] = random.uniform(-1, 1)
+            other = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, 5))) for key in keys[:2])
+            b = a.copy()
+            offsets = dict((key, random.uniform(-1, 1)) for key in keys[1:])
+            results = (a.vote(keys, 2, offsets), a.intersection(keys, offsets), a.union(keys, offsets),
+                       a.intersects(other, offsets), a.intersects(a, offsets),
+                       a.is_coincident(other, keys = ["H1", "L1"], offsets = offsets), a.is_coincident(a, keys = ["H1", "V1"], offsets = offsets))
+            assert a == b and a.offsets == b.offsets
+            b.offsets.update(offsets)
+            assert results == (b.vote(keys, 2), b.intersection(keys), b.union(keys),
+                               b.intersects(other), b.intersects(b),
+                               b.is_coincident(other, keys = ["H1", "L1"]), b.is_coincident(b, keys = ["H1", "V1"]))
+
+        # the smaller operand is copied
+        for i in range(algebra_repeats // 100):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in ("H1", "L1"))
+            b = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in ("L1", "V1"))
+            small, large = (a, b) if sum(map(len, a.values())) <= sum(map(len, b.values())) else (b, a)
+            assert dict(a & b) == dict(small.copy().__iand__(large))
+            assert dict(a | b) == dict(large.copy().__ior__(small))
+
+    def test_livetime_over_offsets(self):
+        futures = pytest.importorskip("concurrent.futures")
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 10), segments.segment(20, 30)]),
+            "L1": segments.segmentlist([segments.segment(5, 15)])})
+        assert a.livetime_over_offsets([{"H1": 0, "L1": 0}, {"L1": 10}, {"L1": -5}, {"L1": 100}]) == [5.0, 5.0, 10.0, 0.0]
+        assert a.offsets == {"H1": 0, "L1": 0}
+
+        keys = ("H1", "L1", "V1")
+        for i in range(algebra_repeats // 400):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys)
+            a.offsets["V1"] = random.randint(-10, 10)
+            offset_vectors = [dict((key, random.randint(-100, 100)) for key in keys[random.randint(0, 2):]) for j in range(10)]
+            expected = []
+            for offset_vector in offset_vectors:
+                b = a.copy()
+                b.offsets.update(offset_vector)
+                expected.append(float(abs(b.intersection(["H1", "V1"]))))
+            assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"]) == pytest.approx(expected)
+            with futures.ThreadPoolExecutor(4) as executor, segments.segmentlistdict.parallel(executor):
+                assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"]) == pytest.approx(expected)
+                assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"], chunksize = 3) == pytest.approx(expected)
+
+        # process pools read the boundaries from shared memory
+        with futures.ProcessPoolExecutor(2) as executor, segments.segmentlistdict.parallel(executor, workers = 2):
+            for chunksize in (None, 1):
+                assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"], chunksize = chunksize) == pytest.approx(expected)
+            with segments.segmentlistdict.parallel(workers = 3) as inner:
+                assert inner is not executor
+                assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"]) == pytest.approx(expected)
+            a["V1"] = segments.segmentlist()
+            assert a.livetime_over_offsets(offset_vectors, ["H1", "V1"]) == [0.0] * len(offset_vectors)
+
+    def test_durations(self):
+        keys = ("H1", "L1", "V1")
+        for i in range(algebra_repeats // 100):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys[:random.randint(0, 3)])
+            b = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength))) for key in keys[random.randint(0, 3):])
+            b.offsets.update(dict((key, random.randint(-10, 10)) for key in b))
+            assert a.intersection_duration(b) == abs(a & b)
+            assert b.intersection_duration(a) == abs(b & a)
+            assert a.union_duration(b) == abs(a | b)
+            assert a.difference_duration(b) == abs(a - b)
+            assert b.difference_duration(a) == abs(b - a)
+
+    def test_coincidence_matrix(self):
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 10)]),
+            "L1": segments.segmentlist([segments.segment(20, 30)])})
+        b = segments.segmentlistdict({
+            "V1": segments.segmentlist([segments.segment(5, 25)]),
+            "K1": segments.segmentlist([segments.segment(10, 20)])})
+        assert a.coincidence_matrix(b) == {"H1": {"V1": True, "K1": False}, "L1": {"V1": True, "K1": False}}
+        assert a.coincidence_matrix(b, durations = True) == {"H1": {"V1": 5, "K1": 0}, "L1": {"V1": 5, "K1": 0}}
+        assert a.coincidence_matrix(b, keys = ["H1", "K1", "G1"]) == {"H1": {"K1": False}}
+        assert not a.is_coincident(b, keys = ["H1", "K1"])
+        b.offsets["K1"] = 5
+        assert a.coincidence_matrix(b, durations = True) == {"H1": {"V1": 5, "K1": 0}, "L1": {"V1": 5, "K1": 5}}
+
+        keys = ("H1", "L1", "V1")
+        for i in range(algebra_repeats // 10):
+            a = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength // 10))) for key in keys[:random.randint(0, 3)])
+            b = segments.segmentlistdict((key, verifyutils.random_coalesced_list(random.randint(1, algebra_listlength // 10))) for key in keys[random.randint(0, 3):])
+            b.offsets.update(dict((key, random.uniform(-1, 1)) for key in b))
+            assert a.coincidence_matrix(b) == dict((x, dict((y, a[x].intersects(b[y])) for y in b)) for x in a)
+            assert a.coincidence_matrix(b, durations = True) == dict((x, dict((y, abs(a[x] & b[y])) for y in b)) for x in a)
+            assert a.is_coincident(b) == any(a[x].intersects(b[y]) for x in a for y in b)
+
+
+class TestSegmentindex(object):
+    def test_find_all(self):
+        x = segments.segmentindex([segments.segment(0, 10),
+                                   segments.segment(5, 15),
+                                   segments.segment(5, 15),
+                                   segments.segment(10, 10),
+                                   segments.segment(20, segments.infinity())])
+        assert sorted(x.find_all(5)) == [0, 1, 2]
+        assert sorted(x.find_all(10)) == [1, 2]
+        assert sorted(x.find_all(segments.segment(10, 20))) == [1, 2]
+        assert sorted(x.find_all(segments.segment(15, 20))) == []
+        assert sorted(x.find_all(1e100)) == [4]
+        assert x.overlapping(segments.segment(-5, 5)) == segments.segmentlist([segments.segment(0, 10)])
+        assert segments.segmentindex().find_all(0) == []
+
+        for i in range(algebra_repeats // 100):
+            segs = verifyutils.random_uncoalesced_list(random.randint(1, 10 * algebra_listlength))
+            x = segments.segmentindex(segs)
+            for seg in verifyutils.random_uncoalesced_list(20):
+                assert sorted(x.find_all(seg)) == [j for j, s in enumerate(segs) if s.intersects(seg)]
+                assert sorted(x.find_all(seg[0])) == [j for j, s in enumerate(segs) if seg[0] in s]
+
+    def test_pickle(self):
+        x = segments.segmentindex(verifyutils.random_uncoalesced_list(algebra_listlength))
+        y = pickle.loads(pickle.dumps(x, protocol = 2))
+        assert tuple(y) == tuple(x)
+        for seg in verifyutils.random_uncoalesced_list(20):
+            assert sorted(y.find_all(seg)) == sorted(x.find_all(seg))
+
+
+class TestSegmentlistbuilder(object):
+    def test_append(self):
+        x = segments.segmentlistbuilder([(0, 10), (5, 15), (15, 15), (20, 30)], buffer_size = 2)
+        x.append(segments.segment(14, 20))
+        assert x.coalesced == segments.segmentlist([segments.segment(0, 30)])
+        x.append(segments.segment(40, segments.infinity()))
+        assert x.coalesced == segments.segmentlist([segments.segment(0, 30), segments.segment(40, segments.infinity())])
+
+        for i in range(algebra_repeats // 100):
+            # mostly time-ordered, with some late segments
+            segs = sorted(verifyutils.random_uncoalesced_list(random.randint(1, 10 * algebra_listlength)))
+            for j in range(len(segs) // 10):
+                k = random.randrange(len(segs))
+                segs.insert(random.randrange(k, len(segs)), segs.pop(k))
+            x = segments.segmentlistbuilder(buffer_size = random.randint(1, 20))
+            for j, seg in enumerate(segs):
+                x.append(seg)
+                if random.random() < 0.01:
+                    assert x.coalesced == segments.segmentlist(segs[:j + 1]).coalesce()
+            assert x.coalesced == segments.segmentlist(segs).coalesce()
@@ -1,8 +1,11 @@
+import io
 import itertools
 import random
 import sys
 import unittest
 
+import pytest
+
 from segments import segments
 from segments import utils
 from six.moves import range
@@ -62,6 +65,207 @@ class TestSegwizard(object):
         data.seek(0)
         assert utils.fromsegwizard(data, strict=True) == correct
 
+    def test_fromsegwizard_bulk(self, monkeypatch):
+        """
+        Check that files parsed in bulk give the same results as files
+        parsed line by line, whole or in blocks, and that anything the
+        bulk parser can't reproduce is handed to the line parser.
+        """
+        for text, block_size in itertools.product(("# seg\tstart\tstop\tduration\n0\t10\t100\t90\n1\t110\t120\t10\n",
+                     "10 100\n 120 110 ; reversed\n\n1e1 2e1\n",
+                     "10.5 100 89.5\n110 120 10\n",
+                     "0 10 100 90\n+1 110 120 10\n",
+                     "0 10 100 90\n1 110 120 10\ngarbage\n2 130 140 10\n",
+                     "10 inf\n",
+                     "10 100\r\n110 120\r\n"), (1 << 22, 1, 16)):
+            monkeypatch.setattr(utils, "_bulk_block_size", block_size)
+            for coltype in (int, float):
+                for strict in (True, False):
+                    data = StringIO(text)
+                    result = utils.fromsegwizard(data, coltype=coltype, strict=strict)
+                    expected = utils.fromsegwizard(iter(text.splitlines(True)), coltype=coltype, strict=strict)
+                    assert result == expected
+                    assert [tuple(map(type, seg)) for seg in result] == [tuple(map(type, seg)) for seg in expected]
+        data = StringIO("0 10 100 90\n1 110 120 15\n")
+        with pytest.raises(ValueError):
+            utils.fromsegwizard(data, strict=True)
+        assert utils.fromsegwizard(StringIO(""), strict=True) == segments.segmentlist()
+
+        # blocks in different formats
+        text = "10 100\n0 110 120 10\n"
+        assert utils.fromsegwizard(StringIO(text), strict=False) == segments.segmentlist([
+            segments.segment(10, 100), segments.segment(110, 120)])
+        with pytest.raises(ValueError):
+            utils.fromsegwizard(StringIO(text), strict=True)
+
+    def test_iter_segwizard(self):
+        """
+        Check that iter_segwizard() yields the segments lazily and can
+        coalesce them.
+        """
+        lines = iter(["0 0 10 10\n", "1 5 20 15\n", "2 20 30 10\n", "garbage\n", "3 40 50 10\n"])
+        segs = utils.iter_segwizard(lines)
+        assert next(segs) == segments.segment(0, 10)
+        assert next(lines) == "1 5 20 15\n"
+        assert list(segs) == [segments.segment(20, 30)]
+        assert list(lines) == ["3 40 50 10\n"]
+
+        data = StringIO("0 0 10 10\n1 5 20 15\n2 20 30 10\n3 40 50 10\n")
+        assert list(utils.iter_segwizard(data, coalesce=True)) == [
+            segments.segment(0, 30), segments.segment(40, 50)]
+        data = StringIO("0 10 20 10\n1 0 5 5\n")
+        with pytest.raises(ValueError):
+            list(utils.iter_segwizard(data, coalesce=True))
+
+
+class TestTama(object):
+    def test_fromtama(self, monkeypatch):
+        """
+        Test TAMA parsing, in bulk, whole or in blocks, and line by
+        line.
+        """
+        for (text, correct), block_size in itertools.product((
+                ("a b c 10.5 100.25\nd e f 110.5 120 x\n",
+                 [segments.segment(10.5, 100.25), segments.segment(110.5, 120.)]),
+                ("a b c 10.5 100.25\n\nd e f 110.5 120\n",
+                 [segments.segment(10.5, 100.25)]),
+                ("a b c 10.5 100.25\nd e f inf 120\n",
+                 [segments.segment(10.5, 100.25)])), (1 << 22, 1, 16)):
+            monkeypatch.setattr(utils, "_bulk_block_size", block_size)
+            assert utils.fromtama(StringIO(text)) == segments.segmentlist(correct)
+            assert utils.fromtama(iter(text.splitlines(True))) == segments.segmentlist(correct)
+
+
+class TestBinary(object):
+    def test_tofrombinary(self, tmpdir):
+        """
+        Check that segment lists and dictionaries survive the binary
+        format, with and without memory mapping.
+        """
+        numpy = pytest.importorskip("numpy")
+        a = segments.segmentlistdict({
+            "H1": segments.segmentlist([segments.segment(0, 10),
+                                        segments.segment(20, 30)]),
+            "L1": segments.segmentlist([segments.segment(1.5, 2.5),
+                                        segments.segment(5, segments.infinity())]),
+            "V1": segments.segmentlist()})
+        a.offsets["L1"] = 3.0
+        filename = str(tmpdir.join("segments.bin"))
+        with open(filename, "wb") as f:
+            utils.tobinary(f, a)
+        for memmap in (True, False):
+            b = utils.frombinary(filename, memmap=memmap)
+            assert isinstance(b, segments.segmentlistdict)
+            assert dict((key, segments.segmentlist(value)) for key, value in b.items()) == a
+            assert b.offsets == a.offsets
+            assert [type(seg[0]) for seg in b["H1"]] == [int, int]
+            b.offsets.clear()
+            assert segments.segmentlist(b["L1"]) == segments.segmentlist([segments.segment(1.5, 2.5), segments.segment(5, segments.infinity())])
+
+        c = verifyutils.random_coalesced_list(algebra_listlength)
+        with open(filename, "wb") as f:
+            utils.tobinary(f, c)
+        assert segments.segmentlist(utils.frombinary(filename)) == c
+
+        # file objects that cannot be memory-mapped are read
+        f = io.BytesIO()
+        utils.tobinary(f, a)
+        b = utils.frombinary(f)
+        assert dict((key, segments.segmentlist(value)) for key, value in b.items()) == a
+        assert b.offsets == a.offsets
+
+        # offsets are not rounded
+        a.offsets["H1"] = numpy.longdouble(0.5)
+        f = io.BytesIO()
+        utils.tobinary(f, a)
+        assert utils.frombinary(f).offsets == a.offsets
+        if numpy.finfo(numpy.longdouble).nmant > numpy.finfo(float).nmant:
+            a.offsets["H1"] = numpy.longdouble(2**60) + 1
+            with pytest.raises(ValueError):
+                utils.tobinary(io.BytesIO(), a)
+
+        with open(filename, "wb") as f:
+            f.write(b"0 10 100 90\n")
+        with pytest.raises(ValueError):
+            utils.frombinary(filename)
+
+
+class TestBitstream(object):
+    def test_from_bitstream(self):
+        """
+        Check that arrays and buffers give the same segments as
+        iterators, and that bitstreamdecoder joins blocks that span
+        chunks.
+        """
+        numpy = pytest.importorskip("numpy")
+        assert list(utils.from_bitstream(iter([True, True, False, True]), 0, 1)) == [
+            segments.segment(0, 2), segments.segment(3, 4)]
+        for i in range(algebra_repeats // 10):
+            bits = [random.random() < 0.5 for j in range(random.randint(0, 50))]
+            minlen = random.randint(1, 3)
+            expected = list(utils.from_bitstream(iter(bits), 10, 0.5, minlen))
+            for bitstream in (numpy.array(bits), numpy.array(bits, dtype=numpy.uint8), bytes(bytearray(bits))):
+                result = utils.from_bitstream(bitstream, 10, 0.5, minlen)
+                assert isinstance(result, segments.segmentlist)
+                assert result == expected
+
+            decoder = utils.bitstreamdecoder(10, 0.5, minlen)
+            result = segments.segmentlist()
+            for j in range(0, len(bits), 7):
+                result.extend(decoder.append(numpy.array(bits[j:j + 7])))
+            result.extend(decoder.close())
+            assert result == expected
+
+        with pytest.raises(ValueError):
+            utils.from_bitstream(numpy.zeros((2, 2)), 0, 1)
+
+    def test_from_statevector(self):
+        """
+        Check that each bit of a state vector is decoded as
+        from_bitstream() would, in one piece and in chunks.
+        """
+        numpy = pytest.importorskip("numpy")
+        x = numpy.array([1, 3, 3, 2, 0, 1], dtype=numpy.uint8)
+        assert utils.from_statevector(x, 0, 1, bits=["locked", None, "unused"]) == {
+            "locked": segments.segmentlist([segments.segment(0, 3), segments.segment(5, 6)]),
+            "unused": segments.segmentlist()}
+        assert utils.from_statevector(x, 0, 1, bits={"observing": 1})["observing"] == segments.segmentlist([segments.segment(1, 4)])
+        assert sorted(utils.from_statevector(x, 0, 1)) == list(range(8))
+        with pytest.raises(ValueError):
+            utils.from_statevector(x, 0, 1, bits={"x": 8})
+        with pytest.raises(TypeError):
+            utils.from_statevector(x.astype(float), 0, 1)
+
+        for i in range(algebra_repeats // 10):
+            x = numpy.cumsum(numpy.array([random.random() < 0.2 for j in range(random.randint(1, 50))])) * 5 + (-1) ** i
+            x = x.astype(numpy.int16)
+            minlen = random.randint(1, 3)
+            bits = dict(("bit%d" % bit, bit) for bit in random.sample(range(16), 4))
+            expected = dict((name, segments.segmentlist(utils.from_bitstream(iter((x >> bit) & 1), 10, 0.5, minlen))) for name, bit in bits.items())
+            assert utils.from_statevector(x, 10, 0.5, bits=bits, minlen=minlen) == expected
+
+            decoder = utils.statevectordecoder(10, 0.5, bits=bits, minlen=minlen)
+            result = segments.segmentlistdict()
+            for j in range(0, len(x), 7):
+                result.extend(decoder.append(x[j:j + 7]))
+            result.extend(decoder.close())
+            assert result == expected
+            assert decoder.bits == bits
+
+        # a state vector with no samples
+        decoder = utils.statevectordecoder(0, 1, bits=["locked", None, "observing"])
+        assert decoder.close() == {"locked": segments.segmentlist(), "observing": segments.segmentlist()}
+        assert utils.statevectordecoder(0, 1).close() == {}
+        with pytest.raises(ValueError):
+            utils.statevectordecoder(0, 1, bits={"x": -1}).close()
+
+        # the samples' width can't change
+        decoder = utils.statevectordecoder(0, 1)
+        decoder.append(numpy.array([1, 3], dtype=numpy.uint8))
+        with pytest.raises(ValueError):
+            decoder.append(numpy.array([1, 3], dtype=numpy.uint16))
+        decoder.append(numpy.array([1, 3], dtype=numpy.int8))
+
 
 class TestVote(object):
     def test_vote(self):
@@ -80,3 +284,24 @@ class TestVote(object):
                     segments.segmentlist() for votes in
                     itertools.combinations(seglists, n)),
                 segments.segmentlist())
+
+    def test_vote_generators(self):
+        """
+        Test that vote() iterates over its inputs only once.
+        """
+        for i in range(algebra_repeats // 10):
+            seglists = [verifyutils.random_coalesced_list(algebra_listlength) for j in range(random.randint(0, 10))]
+            n = random.randint(0, len(seglists))
+            assert utils.vote((iter(seglist) for seglist in seglists), n) == utils.vote(seglists, n)
+
+
+class TestCoalesceSorted(object):
+    def test_coalesce_sorted(self):
+        """
+        Check coalesce_sorted() against segmentlist.coalesce().
+        """
+        assert list(utils.coalesce_sorted([])) == []
+        for i in range(algebra_repeats // 10):
+            seglist = verifyutils.random_uncoalesced_list(random.randint(1, algebra_listlength))
+            seglist.sort()
+            assert list(utils.coalesce_sorted(iter(seglist))) == segments.segmentlist(seglist).coalesce()